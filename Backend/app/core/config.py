@@ -20,13 +20,105 @@ class Settings(BaseSettings):
         "/api/v1/openapi.json",
         "/api/v1/auth/register", 
         "/api/v1/auth/token",
-        "/api/v1/sync/webhook"
+        "/api/v1/sync/webhook",
+        "/api/v1/templates/stats/global"
     ]
     
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama3-8b-8192"
+    GROQ_API_URL: str = "https://api.groq.com/openai/v1/chat/completions"
+    EXTRACTION_BATCH_SIZE: int = 10  # Emails packed into one Groq request (1 = one request per email)
+    EXTRACTION_CONCURRENCY: int = 4  # Groq requests in flight per sync
+    LLM_WINDOW_ENABLED: bool = True  # Send only the transaction-looking lines of an email to Groq
+    LLM_WINDOW_MAX_CHARS: int = 800
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 30000
+    GROQ_MAX_RETRIES: int = 3
+    GROQ_BACKOFF_SECONDS: float = 1.0
+    
+    # Sync pipeline (fetch -> dedup -> sanitize -> extract -> categorize -> persist); extract uses EXTRACTION_CONCURRENCY
+    SYNC_QUEUE_SIZE: int = 4  # Chunks buffered between stages before upstream stages wait
+    SYNC_DEDUP_CONCURRENCY: int = 1
+    SYNC_SANITIZE_CONCURRENCY: int = 1
+    SYNC_CATEGORIZE_CONCURRENCY: int = 1
+    SYNC_PERSIST_CONCURRENCY: int = 1
+    SYNC_REORDER_WINDOW: int = 16  # Chunks past dedup ahead of the next one to persist, bounds the reorder buffer (0 = no limit)
+    
+    # Sync dedup: per-user Bloom filter over stored raw_content_hash values
+    DEDUP_BLOOM_ENABLED: bool = True
+    DEDUP_BLOOM_ERROR_RATE: float = 0.01
+    DEDUP_BLOOM_MAX_USERS: int = 1000  # Filters kept in memory (LRU)
+    
+    # Durable sync job queue (sync_jobs table)
+    SYNC_WORKER_IN_PROCESS: bool = True  # Also run a worker inside the API process (disable on serverless)
+    SYNC_WORKER_CONCURRENCY: int = 2  # Jobs one worker runs at a time
+    SYNC_WORKER_POLL_SECONDS: float = 2.0
+    SYNC_JOB_LEASE_SECONDS: int = 300  # A job whose worker stops heartbeating is requeued after this
+    SYNC_JOB_MAX_ATTEMPTS: int = 3
+    SYNC_JOB_BACKOFF_SECONDS: float = 30.0  # Doubles with each failed attempt
+    SYNC_MAX_RUNNING_JOBS: int = 8  # Across all workers
+    SYNC_LLM_TOKENS_PER_HOUR: int = 1_000_000  # Groq prompt tokens all syncs may spend per hour (0 = no cap)
+    SYNC_DEFAULT_JOB_TOKENS: int = 2000  # Fair-queuing cost of a user with no sync history
+    SYNC_MANUAL_WEIGHT: float = 4.0  # Fair-queuing weight of user-triggered syncs vs. webhook/scheduled ones
+    
+    # Periodic sync of every connected mailbox
+    SYNC_SCHEDULER_ENABLED: bool = True
+    SYNC_SCHEDULE_INTERVAL_SECONDS: int = 3600
+    SYNC_SCHEDULE_JITTER_SECONDS: int = 300  # Scheduled jobs start at a random point in this window
+    SYNC_SCHEDULER_TICK_SECONDS: float = 60.0
+    SYNC_SCHEDULE_MAX_BACKOFF_SECONDS: int = 86400  # Cap on the extra wait of a mailbox whose syncs keep failing
+    
+    # Extraction cache (keyed by a hash of sanitized text)
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 10000  # In-process LRU size
+    EXTRACTION_CACHE_MAX_ROWS: int = 100000  # extraction_cache table size
+    EXTRACTION_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    EXTRACTION_CACHE_EVICT_SECONDS: float = 300  # How often a writer trims expired/excess rows
+    
+    # Merchant mapping cache (read-mostly; invalidated via the cache_versions table)
+    MERCHANT_CACHE_MAX_ENTRIES: int = 5000
+    MERCHANT_CACHE_TTL_SECONDS: int = 3600
+    MERCHANT_CACHE_VERSION_CHECK_SECONDS: float = 1.0  # Max staleness after another worker writes
+    MERCHANT_MATCH_THRESHOLD: float = 0.5  # Trigram similarity needed to reuse a mapping of a differently spelled merchant
+
+    # Dashboard response cache (ETags; invalidated via per-user rows in cache_versions)
+    DASHBOARD_CACHE_MAX_USERS: int = 1000
+    DASHBOARD_VERSION_CHECK_SECONDS: float = 2.0  # Max staleness after another process writes
+    ANALYTICS_MAX_BUCKETS: int = 1000  # Longest range /dashboard/analytics serves, in buckets
+    ANALYTICS_DEFAULT_DAYS: int = 365
+    
+    # Learned per-user extraction templates (skip the LLM for known bank formats)
+    TEMPLATE_EXTRACTION_ENABLED: bool = True
+    TEMPLATE_MAX_PER_USER: int = 200
+    TEMPLATE_MIN_CONFIRMATIONS: int = 2  # Verified emails that must yield the same template before it replaces the LLM
+    TEMPLATE_SAMPLES_PER_USER: int = 500  # Sanitized texts kept (newest first) for transactions awaiting verification
+    TEMPLATE_SAMPLE_TTL_DAYS: int = 30
+    
+    # Shared outbound HTTP client (see app/core/http_client.py)
+    HTTP2_ENABLED: bool = True
+    HTTP_TIMEOUT_SECONDS: float = 20.0
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
+    GOOGLE_TOKEN_URI: str = "https://oauth2.googleapis.com/token"
+    GMAIL_API_URL: str = "https://gmail.googleapis.com/"
+    GMAIL_BATCH_URL: str = "https://gmail.googleapis.com/batch/gmail/v1"
+    GMAIL_BATCH_SIZE: int = 100  # Messages per Gmail HTTP batch request (API maximum is 100)
+    GMAIL_PAGE_SIZE: int = 100  # Message ids per search/history page
+    GMAIL_FULL_SYNC_LOOKBACK_DAYS: int = 30  # Search window when there is no usable historyId
+    BLOCKING_IO_WORKERS: int = 8  # Thread pool for blocking Google client calls
+    EMAIL_BODY_MAX_CHARS: int = 6000  # Email text kept per message before sanitizing and extraction
+    EMAIL_PART_MAX_BYTES: int = 512_000  # Decoded bytes of a MIME part considered (bounds HTML conversion time)
+
+    # Streamed NDJSON ingest endpoint (POST /api/v1/sync/webhook/messages)
+    INGEST_PAGE_SIZE: int = 100  # Pushed messages handed to the sync pipeline at a time
+    INGEST_MAX_RECORD_BYTES: int = 1_000_000  # Longer lines are rejected without being buffered
+
+    # Offline mbox/.eml import (import_mail.py)
+    IMPORT_WORKERS: int = 0  # Parser processes (0 = one per core)
+    IMPORT_BATCH_SIZE: int = 200  # Raw messages per process pool task, and per checkpoint step
+    IMPORT_GMAIL_DATES: bool = True  # Ask Gmail (when linked) for the exact internalDate of archived messages, so they dedup against Gmail syncs
     
     @property
     def ASYNC_DATABASE_URL(self) -> str:
@@ -7,7 +7,11 @@ settings = get_settings()
 engine = create_async_engine(
     settings.ASYNC_DATABASE_URL, 
     echo=True,
-    connect_args={"statement_cache_size": 0}
+    # Needed behind pgbouncer; other drivers (e.g. aiosqlite for local runs) don't accept it.
+    # SQLAlchemy's own statement cache must go too: it would hand a streamed query the unnamed
+    # statement a later query on the same connection has already replaced.
+    connect_args={"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    if settings.ASYNC_DATABASE_URL.startswith("postgresql+asyncpg") else {}
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -0,0 +1,45 @@
+import logging
+from typing import Optional
+import httpx
+from app.core.config import get_settings
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the pooled client used for outbound API calls (Groq)."""
+    http2 = settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+    if settings.HTTP2_ENABLED and not HTTP2_AVAILABLE:
+        logger.warning("HTTP/2 requested but h2 is not installed. Falling back to HTTP/1.1.")
+
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the app-lifetime client, creating it lazily outside the lifespan (scripts, workers)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,51 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Optional, Tuple
+
+async def iter_ndjson(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """
+    Parse a streamed NDJSON body as it arrives, yielding (line number, value, error) per
+    non-blank line. Only the current line is buffered; lines longer than max_line_bytes
+    are skipped (reported as an error) instead of being held in memory.
+    """
+    buffer = bytearray()
+    too_long = False
+    line_no = 0
+
+    def finish_line() -> Optional[Tuple[int, Any, Optional[str]]]:
+        nonlocal too_long
+        if too_long:
+            too_long = False
+            buffer.clear()
+            return line_no, None, f"Line exceeds {max_line_bytes} bytes"
+        line = bytes(buffer).strip()
+        buffer.clear()
+        if not line:
+            return None
+        try:
+            return line_no, json.loads(line), None
+        except ValueError as e:
+            return line_no, None, f"Invalid JSON: {e}"
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            if not too_long:
+                buffer += piece
+                if len(buffer) > max_line_bytes:
+                    too_long = True
+                    buffer.clear()
+            if end == -1:
+                break
+            line_no += 1
+            parsed = finish_line()
+            if parsed:
+                yield parsed
+            start = end + 1
+
+    if buffer or too_long:
+        line_no += 1
+        parsed = finish_line()
+        if parsed:
+            yield parsed
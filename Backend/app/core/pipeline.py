@@ -0,0 +1,210 @@
+import asyncio
+import time
+import logging
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input; one is queued per downstream worker
+_DONE = object()
+# Stands in the reorder buffer for a numbered item that was dropped on the way
+_SKIPPED = object()
+
+class Stage:
+    """One step of a Pipeline: `concurrency` workers applying `func` to items from a bounded queue."""
+    def __init__(self, name: str, func: Callable[[Any], Awaitable[Any]], concurrency: int, queue_size: int,
+                 fan_out: bool = False, ordered_by: Optional[Callable[[Any], int]] = None, window: int = 0):
+        self.name = name
+        self.func = func
+        self.fan_out = fan_out
+        self.ordered_by = ordered_by
+        # An ordered stage hands items to func one at a time, in key order
+        self.concurrency = 1 if ordered_by else max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        # Reorder buffer: items that arrived ahead of the next key
+        self.held: Dict[int, Any] = {}
+        self.next_key = 0
+        # How far past next_key an item may be numbered before it is held back (0 = no limit)
+        self.window = window if ordered_by else 0
+        self._advanced = asyncio.Event()
+        self.processed = 0
+        self.dropped = 0
+        self.units = 0
+        self.busy_seconds = 0.0
+
+    async def admit(self, item: Any):
+        """Wait until `item`'s key is within the window of the next key."""
+        key = self.ordered_by(item)
+        while key >= self.next_key + self.window:
+            await self._advanced.wait()
+
+    def skip(self, item: Any):
+        """Let the keys after `item`'s go on without it (it was dropped upstream)."""
+        self.held[self.ordered_by(item)] = _SKIPPED
+        self._advance()
+
+    def release(self, item: Any) -> List[Any]:
+        """Items ready for func once `item` has arrived: in key order, stopping at the first gap."""
+        if not self.ordered_by:
+            return [item]
+        self.held[self.ordered_by(item)] = item
+        return self._advance()
+
+    def flush(self) -> List[Any]:
+        """All held items in key order, once no more will arrive."""
+        ready = [self.held.pop(key) for key in sorted(self.held)]
+        return [item for item in ready if item is not _SKIPPED]
+
+    def _advance(self) -> List[Any]:
+        ready = []
+        while self.next_key in self.held:
+            item = self.held.pop(self.next_key)
+            if item is not _SKIPPED:
+                ready.append(item)
+            self.next_key += 1
+        if self.window:
+            self._advanced.set()
+            self._advanced = asyncio.Event()
+        return ready
+
+    def snapshot(self, elapsed: float) -> dict:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "held": len(self.held),
+            "window": self.window,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "units": self.units,
+            "units_per_second": round(self.units / elapsed, 2) if elapsed else 0.0,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+class Pipeline:
+    """
+    Async producer/consumer chain: source -> stage -> stage -> ...
+    Every stage reads from its own bounded queue, so a slow stage blocks its upstream
+    instead of letting work pile up in memory. A stage returning None drops the item.
+    """
+    def __init__(self, name: str, source: AsyncIterable, weight: Callable[[Any], int] = lambda item: 1):
+        self.name = name
+        self.source = source
+        self.weight = weight
+        self.stages: List[Stage] = []
+        self.produced = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Ordered stage with a window, by the stage numbering its items (None: the source)
+        self._windows: Dict[Optional[str], Stage] = {}
+
+    def stage(self, name: str, func: Callable[[Any], Awaitable[Any]], concurrency: int = 1, queue_size: int = 4,
+              fan_out: bool = False, ordered_by: Optional[Callable[[Any], int]] = None,
+              window: int = 0, numbered_in: Optional[str] = None) -> "Pipeline":
+        """
+        Append a stage. With fan_out, `func` returns a list of items, each passed on separately.
+        With ordered_by, items reach `func` in the order of that key (0, 1, 2, ... without gaps),
+        whatever order concurrent upstream stages finish them in; the stage runs one worker.
+        A window bounds the reorder buffer: the items come out of the source (or of the stage
+        named numbered_in, which gives them their keys) only while their key is less than
+        `window` past the next one; the stages in between must not fan out.
+        """
+        stage = Stage(name, func, concurrency, queue_size, fan_out, ordered_by, window)
+        if stage.window:
+            self._windows[numbered_in] = stage
+        self.stages.append(stage)
+        return self
+
+    async def run(self):
+        self.started_at = time.monotonic()
+        tasks = [asyncio.create_task(self._produce())]
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            remaining = [stage.concurrency]
+            tasks.extend(
+                asyncio.create_task(self._work(stage, downstream, remaining))
+                for _ in range(stage.concurrency)
+            )
+        try:
+            # Fail fast: one broken stage must not leave the others blocked on full queues
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception():
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.finished_at = time.monotonic()
+
+    async def _produce(self):
+        first = self.stages[0] if self.stages else None
+        window = self._windows.get(None)
+        async for item in self.source:
+            self.produced += 1
+            if window:
+                await window.admit(item)
+            if first:
+                await first.queue.put(item)
+        if first:
+            for _ in range(first.concurrency):
+                await first.queue.put(_DONE)
+
+    async def _work(self, stage: Stage, downstream: Optional[Stage], remaining: List[int]):
+        while True:
+            item = await stage.queue.get()
+            if item is _DONE:
+                break
+            for ready in stage.release(item):
+                await self._process(stage, downstream, ready)
+        # A key that never arrived (dropped upstream) must not strand the ones after it
+        for ready in stage.flush():
+            await self._process(stage, downstream, ready)
+
+        # The last worker of a stage to finish closes the next stage
+        remaining[0] -= 1
+        if remaining[0] == 0 and downstream:
+            for _ in range(downstream.concurrency):
+                await downstream.queue.put(_DONE)
+
+    async def _process(self, stage: Stage, downstream: Optional[Stage], item: Any):
+        started = time.monotonic()
+        result = await stage.func(item)
+        stage.busy_seconds += time.monotonic() - started
+        stage.processed += 1
+        if result is None:
+            stage.dropped += 1
+            window = self._window_over(stage)
+            if window:
+                window.skip(item)
+            return
+        window = self._windows.get(stage.name)
+        for output in result if stage.fan_out else [result]:
+            stage.units += self.weight(output)
+            if window:
+                await window.admit(output)
+            if downstream:
+                await downstream.queue.put(output)
+
+    def _window_over(self, stage: Stage) -> Optional[Stage]:
+        """The windowed stage whose numbered items pass through `stage` on their way to it, if any."""
+        index = self.stages.index(stage)
+        for numbered_in, ordered in self._windows.items():
+            first = 0 if numbered_in is None else [s.name for s in self.stages].index(numbered_in) + 1
+            if first <= index < self.stages.index(ordered):
+                return ordered
+        return None
+
+    def snapshot(self) -> dict:
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "name": self.name,
+            "running": self.started_at is not None and self.finished_at is None,
+            "elapsed_seconds": round(elapsed, 3),
+            "produced": self.produced,
+            "stages": [stage.snapshot(elapsed) for stage in self.stages],
+        }
@@ -0,0 +1,65 @@
+import asyncio
+import random
+import time
+from typing import Optional
+from app.core.config import get_settings
+
+settings = get_settings()
+
+class TokenBucket:
+    """Async token bucket: holds up to `capacity` tokens, refilled continuously at `rate` per second."""
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        # Requests larger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= amount
+
+class GroqRateLimiter:
+    """Process-wide limiter for Groq requests-per-minute and tokens-per-minute quotas."""
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._paused_until = 0.0
+
+    async def acquire(self, tokens: int):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every caller, e.g. after a 429 from Groq."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Jittered backoff, never shorter than the server's Retry-After."""
+    try:
+        base = float(retry_after)
+    except (TypeError, ValueError):
+        base = settings.GROQ_BACKOFF_SECONDS * (2 ** attempt)
+    return base + random.uniform(0, settings.GROQ_BACKOFF_SECONDS)
+
+_groq_limiter = None
+
+def get_groq_rate_limiter() -> GroqRateLimiter:
+    global _groq_limiter
+    if _groq_limiter is None:
+        _groq_limiter = GroqRateLimiter(settings.GROQ_REQUESTS_PER_MINUTE, settings.GROQ_TOKENS_PER_MINUTE)
+    return _groq_limiter
@@ -0,0 +1,132 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Awaitable, Callable, Iterable, Optional
+from uuid import UUID
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.features.transactions.models import CacheVersion
+
+settings = get_settings()
+
+# Session.info key: {DashboardCache: user ids} bumped by the session's open transaction
+BUMPED = "dashboard_cache_bumped"
+
+def version_name(user_id: UUID) -> str:
+    return f"dashboard:{user_id}"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+class DashboardCache:
+    """
+    Per-process cache of rendered dashboard responses. Every write that changes a user's
+    figures bumps the user's row in cache_versions within the same transaction. Responses
+    are keyed by that version (and the day, since windows like the forecast's move daily).
+    Each process re-reads a user's version at most every DASHBOARD_VERSION_CHECK_SECONDS,
+    so a cache hit or a 304 is not free: a dashboard polled more often than that costs one
+    primary-key lookup per interval, and only requests in between skip the database.
+    Writes from another process show up within the interval; this process's own show up
+    as soon as they commit.
+    """
+    def __init__(self, max_users: int, version_check_seconds: float):
+        self.max_users = max_users
+        self.version_check_seconds = version_check_seconds
+        # user_id -> {"version", "checked_at", "responses": {endpoint: (version, day, etag, body)}}
+        self._users: OrderedDict[UUID, dict] = OrderedDict()
+        self.stats = {"hits": 0, "not_modified": 0, "misses": 0}
+
+    async def get_version(self, db: AsyncSession, user_id: UUID) -> int:
+        entry = self._entry(user_id)
+        now = time.monotonic()
+        if entry["version"] is None or now - entry["checked_at"] >= self.version_check_seconds:
+            entry["version"] = await db.scalar(
+                select(CacheVersion.version).where(CacheVersion.name == version_name(user_id))
+            ) or 0
+            entry["checked_at"] = now
+        return entry["version"]
+
+    async def bump(self, db: AsyncSession, user_ids: Iterable[UUID]):
+        """Mark users' dashboards as changed. Runs inside the writer's transaction; the caller commits."""
+        user_ids = set(user_ids)
+        names = sorted(version_name(user_id) for user_id in user_ids)
+        if not names:
+            return
+        stmt = insert(CacheVersion).values([{"name": name, "version": 1} for name in names])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CacheVersion.name],
+            set_={"version": CacheVersion.version + 1}
+        )
+        await db.execute(stmt)
+        # Dropping the cached version now would let a request re-read (and cache) it before the
+        # write is visible; _forget_bumped does it once the transaction commits
+        db.info.setdefault(BUMPED, {}).setdefault(self, set()).update(user_ids)
+
+    def forget_versions(self, user_ids: Iterable[UUID]):
+        """Re-read these users' versions on their next request instead of waiting for the check interval."""
+        for user_id in user_ids:
+            if user_id in self._users:
+                self._users[user_id]["version"] = None
+
+    async def respond(self, request: Request, db: AsyncSession, user_id: UUID, endpoint: str,
+                      compute: Callable[[], Awaitable[dict]]) -> Response:
+        """Serve `endpoint` for the user from cache, as a 304 when the client's ETag is current."""
+        version = await self.get_version(db, user_id)
+        today = date.today()
+        responses = self._users[user_id]["responses"]
+        cached = responses.get(endpoint)
+        if cached and cached[:2] == (version, today):
+            etag, body = cached[2:]
+            self.stats["hits"] += 1
+        else:
+            body = JSONResponse(jsonable_encoder(await compute())).body
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            responses[endpoint] = (version, today, etag, body)
+            self.stats["misses"] += 1
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def _entry(self, user_id: UUID) -> dict:
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = {"version": None, "checked_at": 0.0, "responses": {}}
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return entry
+
+@event.listens_for(Session, "after_commit")
+def _forget_bumped(session: Session):
+    for cache, user_ids in session.info.pop(BUMPED, {}).items():
+        cache.forget_versions(user_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bumped(session: Session):
+    session.info.pop(BUMPED, None)
+
+_dashboard_cache = None
+
+def get_dashboard_cache() -> DashboardCache:
+    global _dashboard_cache
+    if _dashboard_cache is None:
+        _dashboard_cache = DashboardCache(
+            max_users=settings.DASHBOARD_CACHE_MAX_USERS,
+            version_check_seconds=settings.DASHBOARD_VERSION_CHECK_SECONDS,
+        )
+    return _dashboard_cache
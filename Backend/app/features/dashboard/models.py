@@ -0,0 +1,19 @@
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+from sqlalchemy import String, Integer, Numeric, Date, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+class DailyUserRollup(Base):
+    __tablename__ = "daily_user_rollups"
+
+    # One row per user, day (of created_at) and category/sub-category/account type; kept in
+    # step with transactions by app/features/dashboard/rollups.py
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(String, primary_key=True)
+    sub_category: Mapped[str] = mapped_column(String, primary_key=True)
+    account_type: Mapped[str] = mapped_column(String, primary_key=True)
+    total: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    txn_count: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,62 @@
+import logging
+from typing import Iterable, Optional
+from uuid import UUID
+from sqlalchemy import select, delete, func, cast, Date, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.features.dashboard.cache import get_dashboard_cache
+from app.features.dashboard.models import DailyUserRollup
+from app.features.transactions.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = ["user_id", "day", "category", "sub_category", "account_type"]
+
+def _grouped(sign: int = 1):
+    day = cast(Transaction.created_at, Date)
+    key = [Transaction.user_id, day, Transaction.category, Transaction.sub_category, Transaction.account_type]
+    return (
+        select(*key, func.sum(Transaction.amount) * sign, func.count() * sign)
+        .group_by(*key)
+        # Upserting in key order keeps concurrent writers from deadlocking on rollup rows
+        .order_by(*key)
+    )
+
+async def apply_to_rollups(db: AsyncSession, transaction_ids: Iterable[UUID], sign: int = 1):
+    """
+    Add stored transactions to daily_user_rollups (sign=-1 takes them out, before they change).
+    Runs inside the caller's transaction so rollups commit together with the rows.
+    """
+    transaction_ids = list(transaction_ids)
+    if not transaction_ids:
+        return
+    stmt = insert(DailyUserRollup).from_select(
+        ROLLUP_KEY + ["total", "txn_count"],
+        _grouped(sign).where(Transaction.id.in_(transaction_ids))
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=ROLLUP_KEY,
+        set_={
+            "total": DailyUserRollup.total + stmt.excluded.total,
+            "txn_count": DailyUserRollup.txn_count + stmt.excluded.txn_count,
+        }
+    )
+    await db.execute(stmt)
+
+async def rebuild_rollups(db: AsyncSession, user_id: Optional[UUID] = None) -> int:
+    """Recompute rollups from transactions (all users, or one) for backfills and repairs. Returns rows written."""
+    # Writers wait for the rebuild instead of upserting into rows it is replacing
+    await db.execute(text("LOCK TABLE daily_user_rollups IN EXCLUSIVE MODE"))
+    clear = delete(DailyUserRollup)
+    source = _grouped()
+    if user_id is not None:
+        clear = clear.where(DailyUserRollup.user_id == user_id)
+        source = source.where(Transaction.user_id == user_id)
+    await db.execute(clear)
+    result = await db.execute(insert(DailyUserRollup).from_select(ROLLUP_KEY + ["total", "txn_count"], source))
+    user_ids = [user_id] if user_id is not None else (await db.execute(select(Transaction.user_id).distinct())).scalars().all()
+    await get_dashboard_cache().bump(db, user_ids)
+    await db.commit()
+    logger.info(f"Rebuilt {result.rowcount} daily rollup rows" + (f" for {user_id}" if user_id else ""))
+    return result.rowcount
@@ -1,105 +1,90 @@
-from typing import Annotated, Dict
-from fastapi import APIRouter, Depends
+import json
+from datetime import date, timedelta
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, case
+from app.core.config import get_settings
 from app.core.database import get_db
 from app.features.auth.deps import get_current_user
 from app.features.auth.models import User
-from app.features.transactions.models import Transaction
-from app.features.dashboard.service import get_daily_expenses
+from app.features.dashboard.cache import get_dashboard_cache
+from app.features.dashboard.schemas import Bucket, Dimension
+from app.features.dashboard.service import get_daily_expenses, get_liquidity, get_investments, bucket_count, iter_analytics
 from app.features.forecasting.service import ForecastingService
-from app.features.transactions.enums import Category, SubCategory, AccountType
 
 router = APIRouter()
+settings = get_settings()
+
+# Responses carry a strong ETag and are served from the per-user cache until the user's data changes;
+# a matching If-None-Match gets a 304 without running the dashboard queries.
 
 @router.get("/liquidity")
 async def get_liquidity_dashboard(
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    p2p_res = await db.execute(
-        select(func.sum(Transaction.amount))
-        .where(Transaction.user_id == current_user.id)
-        .where(Transaction.category == Category.INCOME)
-        .where(Transaction.sub_category == SubCategory.P2P_RECEIVE)
-    )
-    p2p_in = p2p_res.scalar() or 0
-    
-    income_res = await db.execute(
-        select(func.sum(Transaction.amount))
-        .where(Transaction.user_id == current_user.id)
-        .where(Transaction.category == Category.INCOME)
-    )
-    total_income = income_res.scalar() or 0
-    
-    expense_res = await db.execute(
-        select(func.sum(Transaction.amount))
-        .where(Transaction.user_id == current_user.id)
-        .where(Transaction.category.not_in([Category.INCOME, Category.INVESTMENT]))
-        .where(Transaction.account_type.in_([AccountType.CASH, AccountType.SAVINGS]))
-    )
-    non_cc_expenses = expense_res.scalar() or 0
-    
-    balance = total_income - non_cc_expenses
-    
-    cc_res = await db.execute(
-        select(func.sum(Transaction.amount))
-        .where(Transaction.user_id == current_user.id)
-        .where(Transaction.category != Category.INCOME)
-        .where(Transaction.account_type == AccountType.CREDIT_CARD)
+    return await get_dashboard_cache().respond(
+        request, db, current_user.id, "liquidity", lambda: get_liquidity(db, current_user.id)
     )
-    unbilled_cc = cc_res.scalar() or 0
-    
-    bills_res = await db.execute(
-        select(func.sum(Transaction.amount))
-        .where(Transaction.user_id == current_user.id)
-        .where(Transaction.sub_category.in_([SubCategory.RENT, SubCategory.UTILITIES, SubCategory.MAINTENANCE, SubCategory.CREDIT_CARD_PAYMENT]))
-    )
-    bills = bills_res.scalar() or 0
-    
-    return {
-        "liquidity": (balance + p2p_in) - (unbilled_cc + bills),
-        "breakdown": {
-            "balance": balance,
-            "p2p_in": p2p_in,
-            "unbilled_cc": unbilled_cc,
-            "bills": bills
-        }
-    }
 
 @router.get("/investments")
 async def get_investments_dashboard(
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    # Aggregate by SubCategory for Investment Category
-    stmt = (
-        select(Transaction.sub_category, func.sum(Transaction.amount))
-        .where(Transaction.user_id == current_user.id)
-        .where(Transaction.category == Category.INVESTMENT)
-        .group_by(Transaction.sub_category)
+    return await get_dashboard_cache().respond(
+        request, db, current_user.id, "investments", lambda: get_investments(db, current_user.id)
     )
-    result = await db.execute(stmt)
-    breakdown = {row[0]: row[1] for row in result.all()}
-    
-    total = sum(breakdown.values())
-    
-    return {
-        "total_investments": total,
-        "breakdown": breakdown
-    }
 
 @router.get("/forecast")
 async def get_financial_forecast(
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)],
     service: Annotated[ForecastingService, Depends()]
 ):
-    history = await get_daily_expenses(db, current_user.id, days=90)
-    predicted_burden = service.calculate_safe_to_spend(history)
-    
-    return {
-        "predicted_burden_30d": predicted_burden,
-        "confidence": "high" if len(history) > 60 else "medium",
-        "description": "Predicted outflows for the next 30 days based on historical trends."
-    }
+    async def forecast():
+        history = await get_daily_expenses(db, current_user.id, days=90)
+        predicted_burden = service.calculate_safe_to_spend(history)
+
+        return {
+            "predicted_burden_30d": predicted_burden,
+            "confidence": "high" if len(history) > 60 else "medium",
+            "description": "Predicted outflows for the next 30 days based on historical trends."
+        }
+
+    return await get_dashboard_cache().respond(request, db, current_user.id, "forecast", forecast)
+
+@router.get("/analytics")
+async def get_analytics(
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: Bucket = Bucket.MONTH,
+    group_by: Annotated[List[Dimension], Query()] = []
+):
+    """
+    Totals per day/week/month between start and end (inclusive, default the last
+    ANALYTICS_DEFAULT_DAYS days), optionally split by ?group_by=category etc., with running
+    totals. Streams one JSON object per line, in bucket order.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=settings.ANALYTICS_DEFAULT_DAYS)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if bucket_count(start, end, bucket) > settings.ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans more than {settings.ANALYTICS_MAX_BUCKETS} {bucket.value} buckets"
+        )
+    group_by = list(dict.fromkeys(group_by))
+
+    async def lines():
+        async for row in iter_analytics(db, current_user.id, start, end, bucket, group_by):
+            yield json.dumps(row) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,11 @@
+from enum import Enum
+
+class Bucket(str, Enum):
+    DAY = "day"
+    WEEK = "week"  # ISO weeks, starting Monday
+    MONTH = "month"
+
+class Dimension(str, Enum):
+    CATEGORY = "category"
+    SUB_CATEGORY = "sub_category"
+    ACCOUNT_TYPE = "account_type"
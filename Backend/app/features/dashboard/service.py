@@ -1,23 +1,34 @@
-from datetime import datetime, timedelta
-from sqlalchemy import select, func, cast, Date
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List
+from sqlalchemy import select, func, cast, Date, DateTime
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.features.transactions.models import Transaction
-from app.features.transactions.enums import Category
+from app.features.dashboard.models import DailyUserRollup
+from app.features.dashboard.schemas import Bucket, Dimension
+from app.features.transactions.enums import Category, SubCategory, AccountType, CATEGORY_MAP
+
+# Recurring obligations counted against liquidity: housing, utility bills and card repayments
+BILL_SUB_CATEGORIES = [
+    SubCategory.RENT,
+    SubCategory.MAINTENANCE,
+    SubCategory.CREDIT_CARD_PAYMENT,
+    *CATEGORY_MAP[Category.BILLS_UTILITIES],
+]
 
 async def get_daily_expenses(db: AsyncSession, user_id: str, days: int = 90):
     """Return daily aggregated expenses for forecasting."""
-    start_date = datetime.now() - timedelta(days=days)
+    start_date = (datetime.now() - timedelta(days=days)).date()
     
     stmt = (
         select(
-            cast(Transaction.created_at, Date).label("day"),
-            func.sum(Transaction.amount).label("total")
+            DailyUserRollup.day,
+            func.sum(DailyUserRollup.total).label("total")
         )
-        .where(Transaction.user_id == user_id)
-        .where(Transaction.category != Category.INCOME)
-        .where(Transaction.created_at >= start_date)
-        .group_by("day")
-        .order_by("day")
+        .where(DailyUserRollup.user_id == user_id)
+        .where(DailyUserRollup.category != Category.INCOME)
+        .where(DailyUserRollup.day >= start_date)
+        .group_by(DailyUserRollup.day)
+        .having(func.sum(DailyUserRollup.txn_count) > 0)
+        .order_by(DailyUserRollup.day)
     )
     
     result = await db.execute(stmt)
@@ -27,3 +38,103 @@ async def get_daily_expenses(db: AsyncSession, user_id: str, days: int = 90):
         {"ds": row.day.isoformat(), "y": float(row.total)}
         for row in rows
     ]
+
+async def get_liquidity(db: AsyncSession, user_id: str) -> dict:
+    """Liquidity and its breakdown from one pass over the user's daily rollups (one SUM ... FILTER per figure)."""
+    def total(*conditions):
+        return func.coalesce(func.sum(DailyUserRollup.total).filter(*conditions), 0)
+
+    stmt = (
+        select(
+            total(
+                DailyUserRollup.category == Category.INCOME,
+                DailyUserRollup.sub_category == SubCategory.P2P_RECEIVE
+            ).label("p2p_in"),
+            total(DailyUserRollup.category == Category.INCOME).label("income"),
+            total(
+                DailyUserRollup.category.not_in([Category.INCOME, Category.INVESTMENT]),
+                DailyUserRollup.account_type.in_([AccountType.CASH, AccountType.SAVINGS])
+            ).label("non_cc_expenses"),
+            total(
+                DailyUserRollup.category != Category.INCOME,
+                DailyUserRollup.account_type == AccountType.CREDIT_CARD
+            ).label("unbilled_cc"),
+            total(DailyUserRollup.sub_category.in_(BILL_SUB_CATEGORIES)).label("bills"),
+        )
+        .where(DailyUserRollup.user_id == user_id)
+    )
+    row = (await db.execute(stmt)).one()
+
+    balance = row.income - row.non_cc_expenses
+    return {
+        "liquidity": (balance + row.p2p_in) - (row.unbilled_cc + row.bills),
+        "breakdown": {
+            "balance": balance,
+            "p2p_in": row.p2p_in,
+            "unbilled_cc": row.unbilled_cc,
+            "bills": row.bills
+        }
+    }
+
+async def get_investments(db: AsyncSession, user_id: str) -> dict:
+    stmt = (
+        select(DailyUserRollup.sub_category, func.sum(DailyUserRollup.total))
+        .where(DailyUserRollup.user_id == user_id)
+        .where(DailyUserRollup.category == Category.INVESTMENT)
+        .group_by(DailyUserRollup.sub_category)
+        .having(func.sum(DailyUserRollup.txn_count) > 0)
+    )
+    result = await db.execute(stmt)
+    breakdown = {row[0]: row[1] for row in result.all()}
+    
+    return {
+        "total_investments": sum(breakdown.values()),
+        "breakdown": breakdown
+    }
+
+def bucket_count(start: date, end: date, bucket: Bucket) -> int:
+    if bucket == Bucket.DAY:
+        return (end - start).days + 1
+    if bucket == Bucket.WEEK:
+        return ((end - timedelta(days=end.weekday())) - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+def analytics_query(user_id: str, start: date, end: date, bucket: Bucket, group_by: List[Dimension]):
+    """
+    Totals per bucket (and per group_by dimension) between start and end inclusive, with a
+    running total per group, all computed by Postgres from the daily rollups. Buckets
+    without transactions are left out.
+    """
+    # Truncating a plain timestamp keeps buckets independent of the session time zone
+    period = cast(func.date_trunc(bucket.value, cast(DailyUserRollup.day, DateTime)), Date).label("bucket")
+    dimensions = [getattr(DailyUserRollup, dimension.value) for dimension in group_by]
+    buckets = (
+        select(
+            period,
+            *dimensions,
+            func.sum(DailyUserRollup.total).label("total"),
+            func.sum(DailyUserRollup.txn_count).label("txn_count")
+        )
+        .where(DailyUserRollup.user_id == user_id)
+        .where(DailyUserRollup.day.between(start, end))
+        .group_by(period, *dimensions)
+        .having(func.sum(DailyUserRollup.txn_count) > 0)
+        .subquery()
+    )
+    groups = [buckets.c[dimension.value] for dimension in group_by]
+    running_total = func.sum(buckets.c.total).over(partition_by=groups or None, order_by=buckets.c.bucket)
+    return select(buckets, running_total.label("running_total")).order_by(buckets.c.bucket, *groups)
+
+async def iter_analytics(db: AsyncSession, user_id: str, start: date, end: date, bucket: Bucket,
+                         group_by: List[Dimension]) -> AsyncIterator[dict]:
+    """Rows of analytics_query as they arrive from a server-side cursor."""
+    result = await db.stream(analytics_query(user_id, start, end, bucket, group_by))
+    async for row in result.mappings():
+        item = {"bucket": row["bucket"].isoformat()}
+        item.update({dimension.value: row[dimension.value] for dimension in group_by})
+        item.update({
+            "total": float(row["total"]),
+            "txn_count": int(row["txn_count"]),
+            "running_total": float(row["running_total"])
+        })
+        yield item
@@ -1,8 +1,36 @@
 import re
+import string
+from itertools import groupby
+from typing import Iterable, Iterator, List
+
+# Every mask contains a digit or an '@', and no mask can run across a character
+# outside ALLOWED_CHARS or across a full stop followed by whitespace. Text between
+# such breaks can therefore be masked independently of the rest of the body.
+ALLOWED_CHARS = r'\w\s@%+\-()|'
+BREAK = rf'[^{ALLOWED_CHARS}.]|\.(?=\s)'
+
+# Whitespace between two letters is also never inside a mask, which gives frequent
+# places to cut a body (see mime.clip_text) or a stream of chunks without splitting one.
+SAFE_CUT = rf'{BREAK}|(?<=[^\W\d_])\s(?=[^\W\d_])'
+
+# Bodies shorter than this are cheaper to mask directly than to split into windows.
+SMALL_TEXT_LENGTH = 1024
+# Bodies whose first DENSE_PROBE_LENGTH characters are mostly candidate windows (PII-dense
+# statements) are masked directly: per-window bookkeeping would cost more than it skips.
+DENSE_PROBE_LENGTH = 1024
+DENSE_FRACTION = 0.5
+# Upper bound on text held back by StreamingSanitizer while waiting for a safe cut.
+STREAM_MAX_BUFFER = 64 * 1024
+
+# Characters of a UPI id before the '@', and of either kind of address
+UPI_CHARS = frozenset(string.ascii_letters + string.digits + '.-_')
+AT_RUN_CHARS = UPI_CHARS | frozenset('%+@')
+# A digit at a word boundary, where most masks start
+WORD_DIGIT = r'\d(?<!\w\d)'
 
 class SanitizerService:
     def __init__(self):
-        # Regex Patterns
+        # Regex Patterns (order matters: earlier labels are masked first)
         self.patterns = {
             'PHONE': re.compile(r'\b(?:\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4,}\b'),
             'UPI': re.compile(r'[a-zA-Z0-9.\-_]{2,256}@[a-zA-Z]{2,64}'),
@@ -12,13 +40,216 @@ class SanitizerService:
             'PAN': re.compile(r'\b[A-Z]{5}[0-9]{4}[A-Z]{1}\b'),
             'AADHAAR': re.compile(r'\b\d{4}\s\d{4}\s\d{4}\b'),
         }
+        self.masks = {label: f'<{label}>' for label in self.patterns}
+        # The same patterns for the single-scan engine, split by the character a match starts with.
+        # Every branch then begins with a plain character class (the \b in front of it becomes a
+        # lookbehind), which the regex engine can reject without entering the branch; one scan
+        # over all labels costs less than a pass per label. The empty group names the branch.
+        # AADHAAR goes before PAN, which starts with a letter, so that the digit branches after
+        # UPI and EMAIL can share one test for a digit at a word boundary.
+        branches = [
+            ('PHONE', r'\+(?<=\w\+)\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4,}\b'),
+            ('PHONE', r'\((?<=\w\()\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4,}\b'),
+            ('PHONE', WORD_DIGIT + r'(?:\d{0,2}[-.\s]?\(?\d{3}|\d{2})\)?[-.\s]?\d{3}[-.\s]?\d{4,}\b'),
+            ('UPI', r'[a-zA-Z0-9.\-_][a-zA-Z0-9.\-_]{1,255}@[a-zA-Z]{2,64}'),
+            ('EMAIL', r'[A-Za-z0-9_](?<!\w[A-Za-z0-9_])[A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+            ('EMAIL', r'[.%+-](?<=\w[.%+-])[A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+            ('CARD', WORD_DIGIT + r'[ -]*?(?:\d[ -]*?){12,15}\b'),
+            ('IP', WORD_DIGIT + r'\d{0,2}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'),
+            ('AADHAAR', WORD_DIGIT + r'\d{3}\s\d{4}\s\d{4}\b'),
+            ('PAN', r'[A-Z](?<!\w[A-Z])[A-Z]{4}[0-9]{4}[A-Z]\b'),
+        ]
+        self._branch_labels = {f'{label}_{index}': label for index, (label, _) in enumerate(branches)}
+        alternatives = []
+        for shared, group in groupby(enumerate(branches), key=lambda branch: branch[1][1].startswith(WORD_DIGIT)):
+            marked = [f'{pattern.removeprefix(WORD_DIGIT) if shared else pattern}(?P<{label}_{index}>)'
+                      for index, (label, pattern) in group]
+            alternatives.append(f'{WORD_DIGIT}(?:{"|".join(marked)})' if shared else '|'.join(marked))
+        self.combined = re.compile('|'.join(alternatives))
+        # For each label, the labels masked before it; None for the first
+        labels = list(self.patterns)
+        self._earlier = {
+            label: re.compile('|'.join(self.patterns[first].pattern for first in labels[:index])) if index else None
+            for index, label in enumerate(labels)
+        }
+        # For labels whose matches hold no '@' (and for UPI, which only PHONE precedes): hop over
+        # the words and separators such a match is made of, stopping where an earlier label
+        # without an '@' could start. Those all start at a word boundary, so after a separator.
+        span_chars = {'UPI': (r'[a-zA-Z0-9_]', r'.\-'), 'CARD': (r'\d', r' \-'), 'IP': (r'\d', r'.'), 'AADHAAR': (r'\d', r'\s')}
+        self._overtaking = {
+            label: re.compile(rf'(?:{word}*[{separators}]+)*?(?=%s)' % '|'.join(
+                pattern for first, pattern in branches
+                if labels.index(first) < labels.index(label) and first not in ('UPI', 'EMAIL')
+            ))
+            for label, (word, separators) in span_chars.items()
+        }
+        # Where a mask can begin: a word boundary, or the start of a run of UPI characters
+        self._starts = re.compile(r'\b|(?<![a-zA-Z0-9.\-_])(?=[a-zA-Z0-9.\-_])')
+        self._hot = re.compile(rf'[\d@](?:[{ALLOWED_CHARS}]|\.(?!\s))*')
+        self._last_break = re.compile(rf'.*(?:{BREAK})', re.S)
+
     def sanitize(self, text: str) -> str:
+        """
+        Mask PII, producing the same output as applying each pattern in label order. Long bodies
+        only run the patterns over the windows around digits and '@' that can hold a mask.
+        """
         if not text:
             return text
+        if len(text) < SMALL_TEXT_LENGTH or self._is_dense(text):
+            return self._mask(text)
+
+        out = []
+        cursor = 0
+        for hit in self._hot.finditer(text):
+            head = self._last_break.match(text, cursor, hit.start())
+            start = head.end() if head else cursor
+            window = text[start:hit.end()]
+            masked = self._mask(window)
+            if masked is window:
+                continue
+            out.append(text[cursor:start])
+            out.append(masked)
+            cursor = hit.end()
+
+        if not out:
+            return text
+        out.append(text[cursor:])
+        return ''.join(out)
+
+    def _is_dense(self, text: str) -> bool:
+        probe = min(len(text), DENSE_PROBE_LENGTH)
+        covered = sum(hit.end() - hit.start() for hit in self._hot.finditer(text, 0, probe))
+        return covered > probe * DENSE_FRACTION
+
+    def sanitize_many(self, texts: Iterable[str]) -> List[str]:
+        """Sanitize a batch of texts (e.g. one sync chunk)."""
+        return [self.sanitize(text) for text in texts]
+
+    def sanitize_stream(self, chunks: Iterable[str], max_buffer: int = STREAM_MAX_BUFFER) -> Iterator[str]:
+        """Sanitize an iterable of text chunks, yielding masked chunks with bounded memory."""
+        stream = StreamingSanitizer(self, max_buffer)
+        for chunk in chunks:
+            masked = stream.feed(chunk)
+            if masked:
+                yield masked
+        masked = stream.flush()
+        if masked:
+            yield masked
+
+    def _mask(self, text: str) -> str:
+        """
+        Mask in one scan of the combined pattern. A plain alternation picks the leftmost match,
+        while the label order lets e.g. PHONE win over an overlapping CARD, and a mask changes
+        the word boundaries next to it; when a match could be affected by either, the text is
+        masked label by label instead. Returns `text` itself when nothing matched.
+        """
+        last_end = -1
+        conflict = False
+        labels, masks, glued, overtaken = self._branch_labels, self.masks, self._glued, self._overtaken
+        upi = self.patterns['UPI']
+
+        def replace(match: re.Match) -> str:
+            nonlocal last_end, conflict
+            start, end = match.span()
+            label = labels[match.lastgroup]
+            if conflict or start == last_end:
+                conflict = True
+            elif label == 'UPI':
+                conflict = glued(text, start) or glued(text, end) or overtaken(text, label, start, end)
+            else:
+                # The other branches start and end at word boundaries, so only a run of UPI
+                # characters can be glued there
+                conflict = bool(
+                    (start and text[start - 1] in UPI_CHARS and text[start] in UPI_CHARS and upi.match(text, start))
+                    or (end < len(text) and text[end - 1] in UPI_CHARS and text[end] in UPI_CHARS and upi.match(text, end))
+                    or (label != 'PHONE' and overtaken(text, label, start, end))
+                )
+            last_end = end
+            return masks[label]
+
+        masked = self.combined.sub(replace, text)
+        return self._mask_in_order(text) if conflict else masked
+
+    def _glued(self, text: str, index: int) -> bool:
+        """Whether masking up to or from `index` could let another mask start or end there."""
+        if index == 0 or index == len(text):
+            return False
+        before, after = text[index - 1], text[index]
+        # A mask between two word characters creates a word boundary that wasn't there,
+        if (before.isalnum() or before == '_') and (after.isalnum() or after == '_'):
+            return True
+        # and one ending inside a run of UPI characters lets a UPI id start right after it
+        return before in UPI_CHARS and after in UPI_CHARS and self.patterns['UPI'].match(text, index) is not None
+
+    def _overtaken(self, text: str, label: str, start: int, end: int) -> bool:
+        """Whether a label masked before `label` could match starting inside its match."""
+        if label == 'PHONE':
+            return False
+        # UPI ids and emails contain an '@', so one can't start inside a match without one
+        # unless it runs on past the end
+        at_free = label != 'EMAIL' and not (end < len(text) and text[end] in AT_RUN_CHARS)
+        if label == 'PAN' and at_free:
+            # and nothing else starts inside a word
+            return False
+        if label == 'UPI' and text.find('.', start, end) < 0 and text.find('-', start, end) < 0:
+            # PHONE needs a word boundary before its first digit
+            return False
+        if label == 'UPI' or at_free:
+            found = self._overtaking[label].match(text, start + 1)
+            return found is not None and found.end() < end
+        earlier = self._earlier[label]
+        return any(
+            position.start() > start and earlier.match(text, position.start())
+            for position in self._starts.finditer(text, start, end)
+        )
+
+    def _mask_in_order(self, text: str) -> str:
         for label, pattern in self.patterns.items():
-            text = pattern.sub(f'<{label}>', text)
+            text = pattern.sub(self.masks[label], text)
         return text
 
+class StreamingSanitizer:
+    """
+    Incremental sanitizer for large bodies.
+
+    Text after the last position no mask can span is held back and rejoined with the next
+    chunk, so PII split across two chunks is masked exactly as if the body had arrived in
+    one piece.
+    """
+    def __init__(self, sanitizer: SanitizerService, max_buffer: int = STREAM_MAX_BUFFER):
+        self.sanitizer = sanitizer
+        self.max_buffer = max_buffer
+        self._buffer = ""
+        self._scanned = 0
+        self._last_cut = re.compile(rf'.*(?:{SAFE_CUT})', re.S)
+        self._last_space = re.compile(r'.*\s', re.S)
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self._buffer += chunk
+        # Cuts before the previous end were already ruled out, except one that
+        # depended on the character that has just arrived.
+        match = self._last_cut.match(self._buffer, max(0, self._scanned - 1))
+        if not match and len(self._buffer) > self.max_buffer:
+            # Pathological input with no safe cut: prefer whitespace to keep memory bounded
+            match = self._last_space.match(self._buffer)
+            cut = match.end() if match else len(self._buffer)
+        elif match:
+            cut = match.end()
+        else:
+            self._scanned = len(self._buffer)
+            return ""
+
+        head, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        self._scanned = len(self._buffer)
+        return self.sanitizer.sanitize(head)
+
+    def flush(self) -> str:
+        head, self._buffer = self._buffer, ""
+        self._scanned = 0
+        return self.sanitizer.sanitize(head)
+
 _sanitizer = None
 
 def get_sanitizer_service():
@@ -0,0 +1,132 @@
+import hashlib
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.features.sync.models import ExtractionCacheEntry
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class ExtractionCache:
+    """
+    Two-tier cache of LLM extractions: an in-process LRU in front of the
+    extraction_cache table. Keys are hashes of *sanitized* text only.
+    Table rows are evicted at most every evict_seconds, by created_at cutoffs.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: int, max_rows: int, evict_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.evict_seconds = evict_seconds
+        self._next_eviction = 0.0
+        # Rows upserted since the last eviction, on top of the planner's row estimate
+        self._written = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0}
+
+    def key(self, clean_text: str) -> str:
+        # The model is part of the key so switching models doesn't serve stale extractions
+        return hashlib.sha256(f"{settings.GROQ_MODEL}:{clean_text}".encode()).hexdigest()
+
+    async def get_many(self, db: AsyncSession, keys: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        missing = []
+        now = time.monotonic()
+        for key in set(keys):
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                found[key] = dict(entry[1])
+                self.stats["memory_hits"] += 1
+            else:
+                missing.append(key)
+
+        if missing:
+            stmt = (
+                select(ExtractionCacheEntry)
+                .where(ExtractionCacheEntry.key.in_(missing))
+                .where(ExtractionCacheEntry.created_at >= self._cutoff())
+            )
+            result = await db.execute(stmt)
+            rows = result.scalars().all()
+            for row in rows:
+                found[row.key] = dict(row.result)
+                age = (datetime.now(timezone.utc) - row.created_at).total_seconds()
+                self._remember(row.key, row.result, self.ttl_seconds - age)
+            self.stats["db_hits"] += len(rows)
+            self.stats["misses"] += len(missing) - len(rows)
+
+        return found
+
+    async def put_many(self, db: AsyncSession, results: Dict[str, dict]):
+        if not results:
+            return
+        for key, value in results.items():
+            self._remember(key, value)
+
+        stmt = insert(ExtractionCacheEntry).values([
+            {"key": key, "result": value} for key, value in results.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ExtractionCacheEntry.key],
+            set_={"result": stmt.excluded.result, "created_at": func.now()}
+        )
+        await db.execute(stmt)
+        self._written += len(results)
+        now = time.monotonic()
+        if now >= self._next_eviction:
+            self._next_eviction = now + self.evict_seconds
+            await self._evict_rows(db)
+        await db.commit()
+
+    def _remember(self, key: str, value: dict, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, dict(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def _evict_rows(self, db: AsyncSession):
+        created_at = ExtractionCacheEntry.created_at
+        expired = await db.execute(delete(ExtractionCacheEntry).where(created_at < self._cutoff()))
+
+        # reltuples is kept current by autovacuum; counting rows would scan the table
+        estimate = await db.scalar(text(
+            f"SELECT reltuples::bigint FROM pg_class WHERE oid = '{ExtractionCacheEntry.__tablename__}'::regclass"
+        ))
+        estimate = max(estimate or 0, 0) + self._written
+        self._written = 0
+        if estimate <= self.max_rows:
+            return
+
+        # Walks the created_at index from the newest row; only runs when the table is over the cap
+        oldest_kept = await db.scalar(
+            select(created_at).order_by(created_at.desc()).offset(self.max_rows).limit(1)
+        )
+        if oldest_kept is not None:
+            trimmed = await db.execute(delete(ExtractionCacheEntry).where(created_at <= oldest_kept))
+            logger.info(f"Extraction cache: evicted {expired.rowcount} expired and {trimmed.rowcount} oldest rows")
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+
+_cache = None
+
+def get_extraction_cache() -> ExtractionCache:
+    global _cache
+    if _cache is None:
+        _cache = ExtractionCache(
+            max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.EXTRACTION_CACHE_TTL_SECONDS,
+            max_rows=settings.EXTRACTION_CACHE_MAX_ROWS,
+            evict_seconds=settings.EXTRACTION_CACHE_EVICT_SECONDS
+        )
+    return _cache
@@ -0,0 +1,101 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+from uuid import UUID
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bloom import BloomFilter
+from app.core.config import get_settings
+from app.features.transactions.models import Transaction
+from app.features.transactions.service import TransactionService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Rows committed slightly out of created_at order are still picked up by the next top-up
+WATERMARK_OVERLAP = timedelta(minutes=1)
+MIN_CAPACITY = 10000
+
+class UserHashFilter:
+    def __init__(self, capacity: int):
+        self.bloom = BloomFilter(capacity, settings.DEDUP_BLOOM_ERROR_RATE)
+        self.watermark: Optional[datetime] = None
+
+class DedupFilter:
+    """
+    Answers "which of these raw_content_hash values are new?" for a user's sync.
+    A per-user Bloom filter, warmed from the transactions table, clears definitely-new
+    hashes in memory; only possible duplicates are checked with one bulk query.
+    """
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._filters: OrderedDict[UUID, UserHashFilter] = OrderedDict()
+        self.stats = {"warmed": 0, "topped_up": 0}
+
+    async def prepare(self, db: AsyncSession, user_id: UUID):
+        """Warm the user's filter, or top it up with rows other processes added since the last sync."""
+        if not settings.DEDUP_BLOOM_ENABLED:
+            return
+        entry = self._filters.get(user_id)
+        if entry and not entry.bloom.full:
+            self._filters.move_to_end(user_id)
+            await self._load(db, user_id, entry)
+            self.stats["topped_up"] += 1
+            return
+
+        count = await db.scalar(
+            select(func.count()).select_from(Transaction).where(Transaction.user_id == user_id)
+        )
+        entry = UserHashFilter(max(MIN_CAPACITY, count * 2))
+        await self._load(db, user_id, entry)
+        self._filters[user_id] = entry
+        self._filters.move_to_end(user_id)
+        while len(self._filters) > self.max_users:
+            self._filters.popitem(last=False)
+        self.stats["warmed"] += 1
+
+    async def _load(self, db: AsyncSession, user_id: UUID, entry: UserHashFilter):
+        stmt = (
+            select(Transaction.raw_content_hash, Transaction.created_at)
+            .where(Transaction.user_id == user_id)
+        )
+        if entry.watermark:
+            stmt = stmt.where(Transaction.created_at > entry.watermark - WATERMARK_OVERLAP)
+        result = await db.stream(stmt.execution_options(yield_per=5000))
+        async for content_hash, created_at in result:
+            entry.bloom.add(content_hash)
+            if entry.watermark is None or created_at > entry.watermark:
+                entry.watermark = created_at
+
+    async def new_hashes(self, db: AsyncSession, user_id: UUID, hashes: List[str], stats: dict) -> Set[str]:
+        entry = self._filters.get(user_id) if settings.DEDUP_BLOOM_ENABLED else None
+        if entry:
+            maybe_seen = [h for h in hashes if h in entry.bloom]
+        else:
+            maybe_seen = list(hashes)
+
+        existing = await TransactionService(db).get_existing_hashes(maybe_seen) if maybe_seen else set()
+        stats["checked"] += len(hashes)
+        stats["bloom_new"] += len(hashes) - len(maybe_seen)
+        stats["db_checked"] += len(maybe_seen)
+        stats["duplicates"] += len(existing)
+        return set(hashes) - existing
+
+    def add(self, user_id: UUID, hashes: Iterable[str]):
+        """Record hashes this process just stored."""
+        entry = self._filters.get(user_id)
+        if entry:
+            entry.bloom.update(hashes)
+
+def new_dedup_stats() -> dict:
+    return {"checked": 0, "bloom_new": 0, "db_checked": 0, "duplicates": 0}
+
+_dedup_filter = None
+
+def get_dedup_filter() -> DedupFilter:
+    global _dedup_filter
+    if _dedup_filter is None:
+        _dedup_filter = DedupFilter(max_users=settings.DEDUP_BLOOM_MAX_USERS)
+    return _dedup_filter
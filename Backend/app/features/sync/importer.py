@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set
+from uuid import UUID
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.core.config import get_settings
+from app.core.executor import run_blocking, shutdown_executor
+from app.core.http_client import close_http_client
+from app.features.auth.models import User
+from app.features.sync.archive import iter_archive, prepare_archive_batch
+from app.features.sync.service import SyncService, message_hash
+from app.features.transactions.service import TransactionService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+def next_batch(items, size: int) -> list:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+class MailImporter:
+    """
+    Bulk import of a Google Takeout mbox or a directory of .eml files into one user's
+    transactions. Raw messages are parsed and sanitized in a process pool, then run through
+    the regular sync pipeline (same dedup hash, bulk inserts). The checkpoint file records
+    how far into the archive every message has been stored or found to be a duplicate,
+    so an interrupted import resumes there.
+    """
+    def __init__(self, source: str, checkpoint_path: Optional[str] = None, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.source = os.path.abspath(source)
+        self.checkpoint_path = checkpoint_path or f"{self.source.rstrip(os.sep)}.import-checkpoint.json"
+        self.workers = max(1, workers or settings.IMPORT_WORKERS or os.cpu_count() or 1)
+        self.batch_size = max(1, batch_size or settings.IMPORT_BATCH_SIZE)
+        self.position = 0
+        self.stats = Counter()
+        # Pages handed to the pipeline in archive order: seq -> [messages not yet settled, position after the page]
+        self._pages: OrderedDict[int, list] = OrderedDict()
+        self._page_of: Dict[str, int] = {}
+        self._seen: Set[str] = set()
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("source") != self.source:
+            logger.warning(f"Ignoring checkpoint {self.checkpoint_path}: it belongs to {checkpoint.get('source')}")
+            return
+        self.position = checkpoint["position"]
+        logger.info(f"Resuming import of {self.source} at position {self.position}")
+
+    def save_checkpoint(self):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "source": self.source,
+                "position": self.position,
+                "stats": dict(self.stats),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    async def run(self, email: str) -> bool:
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+            if not user:
+                logger.error(f"No user with email {email}")
+                return False
+            self.load_checkpoint()
+            service = SyncService(db=db, transaction_service=TransactionService(db))
+            success = await service.import_messages(user.id, self._read_pages(service, user.id), self._settled)
+        self.save_checkpoint()
+        logger.info(f"Import of {self.source} {'finished' if success else 'failed'} at position {self.position}: {dict(self.stats)}")
+        return success
+
+    async def _read_pages(self, service: SyncService, user_id: UUID) -> AsyncIterator[List[dict]]:
+        """Read the archive in batches, keep the process pool busy and yield parsed pages in archive order."""
+        loop = asyncio.get_running_loop()
+        items = iter_archive(self.source, self.position)
+        # spawn: workers must not inherit the event loop, DB connections and threads
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        in_flight = deque()
+        exhausted = False
+        seq = 0
+        try:
+            while True:
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    batch = await run_blocking(next_batch, items, self.batch_size)
+                    if not batch:
+                        exhausted = True
+                        break
+                    self.stats["read"] += len(batch)
+                    raw = [message for _, message in batch]
+                    in_flight.append((batch[-1][0], loop.run_in_executor(pool, prepare_archive_batch, raw)))
+                if not in_flight:
+                    break
+
+                end, future = in_flight.popleft()
+                messages, unreadable = await future
+                self.stats["unreadable"] += unreadable
+                await self._use_gmail_dates(service, user_id, messages)
+                page = []
+                for msg in messages:
+                    content_hash = message_hash(msg)
+                    if content_hash in self._seen:
+                        continue
+                    self._seen.add(content_hash)
+                    self._page_of[content_hash] = seq
+                    page.append(msg)
+                self.stats["relevant"] += len(page)
+                self._pages[seq] = [len(page), end]
+                seq += 1
+                self._advance()
+                if page:
+                    yield page
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _use_gmail_dates(self, service: SyncService, user_id: UUID, messages: List[dict]):
+        """Replace the archive's second-precision dates with Gmail's, so the dedup hash matches a Gmail sync."""
+        dates = await service.gmail_internal_dates(user_id, [msg["id"] for msg in messages if msg["gmail"]])
+        for msg in messages:
+            if msg["id"] in dates:
+                msg["internalDate"] = dates[msg["id"]]
+        self.stats["gmail_dates"] += len(dates)
+
+    def _settled(self, hashes: List[str], status: str):
+        self.stats[status] += len(hashes)
+        for content_hash in hashes:
+            seq = self._page_of.pop(content_hash, None)
+            if seq is not None:
+                self._pages[seq][0] -= 1
+        self._advance()
+
+    def _advance(self):
+        moved = False
+        while self._pages:
+            seq, (remaining, end) = next(iter(self._pages.items()))
+            if remaining:
+                break
+            del self._pages[seq]
+            self.position = end
+            moved = True
+        if moved:
+            self.save_checkpoint()
+
+async def run_import(email: str, source: str, checkpoint_path: Optional[str] = None,
+                     workers: Optional[int] = None) -> bool:
+    """Standalone entry point: `uv run import_mail.py you@example.com Takeout/Mail/All.mbox`."""
+    try:
+        return await MailImporter(source, checkpoint_path, workers).run(email)
+    finally:
+        await close_http_client()
+        shutdown_executor()
@@ -0,0 +1,223 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+from sqlalchemy import select, update, exists, or_, func, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from fastapi import Depends
+
+from app.core.database import get_db
+from app.core.config import get_settings
+from app.features.sync.models import SyncJob
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "QUEUED", "RUNNING", "DONE", "FAILED"
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def job_backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.SYNC_JOB_BACKOFF_SECONDS * (2 ** max(0, attempts - 1)))
+
+class SyncJobService:
+    """
+    DB-backed sync queue. Enqueueing coalesces per user (partial unique indexes on
+    sync_jobs), workers lease with FOR UPDATE SKIP LOCKED and keep the lease alive
+    with heartbeats; jobs of dead workers are requeued once their lease runs out.
+    Works on Postgres and, for local runs, SQLite (which serializes writers instead).
+
+    Leasing is weighted fair queuing across users: each job gets a finish tag
+    max(V, user's last tag) + cost / weight, where V is the tag of the latest job
+    started and cost is the user's recent LLM tokens per sync, so one heavy mailbox
+    can't crowd everyone else out of the shared Groq quota.
+    """
+    def __init__(self, db: AsyncSession = Depends(get_db)):
+        self.db = db
+
+    def _insert(self):
+        dialect = postgresql if self.db.bind.dialect.name == "postgresql" else sqlite
+        return dialect.insert(SyncJob)
+
+    async def enqueue(self, user_id: UUID, source: str, run_after: datetime = None,
+                      lag_seconds: float = None) -> int:
+        """
+        Queue a sync for the user. If one is already waiting it absorbs this request,
+        moving up to the earlier start and finish tag of the two. Returns the waiting job's id.
+        """
+        stmt = self._insert().values(
+            user_id=user_id,
+            trigger_source=source,
+            status=QUEUED,
+            attempts=0,
+            run_after=run_after or utcnow(),
+            virtual_finish=await self._finish_tag(user_id, source),
+            lag_seconds=lag_seconds
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncJob.user_id],
+            index_where=SyncJob.status == QUEUED,
+            set_={
+                "run_after": case(
+                    (stmt.excluded.run_after < SyncJob.run_after, stmt.excluded.run_after), else_=SyncJob.run_after
+                ),
+                "virtual_finish": case(
+                    (stmt.excluded.virtual_finish < SyncJob.virtual_finish, stmt.excluded.virtual_finish),
+                    else_=SyncJob.virtual_finish
+                ),
+            }
+        ).returning(SyncJob.id)
+        job_id = await self.db.scalar(stmt)
+        await self.db.commit()
+        return job_id
+
+    async def _finish_tag(self, user_id: UUID, source: str) -> float:
+        virtual_time = await self.db.scalar(
+            select(func.max(SyncJob.virtual_finish)).where(SyncJob.status != QUEUED)
+        ) or 0.0
+        # Not the user's waiting job: this request coalesces into it rather than queueing behind it
+        user_tag = await self.db.scalar(
+            select(func.max(SyncJob.virtual_finish)).where(SyncJob.user_id == user_id, SyncJob.status != QUEUED)
+        ) or 0.0
+        recent = (
+            select(SyncJob.llm_tokens)
+            .where(SyncJob.user_id == user_id, SyncJob.llm_tokens.is_not(None))
+            .order_by(SyncJob.id.desc())
+            .limit(5)
+            .subquery()
+        )
+        cost = await self.db.scalar(select(func.avg(recent.c.llm_tokens)))
+        cost = max(1.0, float(cost if cost is not None else settings.SYNC_DEFAULT_JOB_TOKENS))
+        weight = settings.SYNC_MANUAL_WEIGHT if source == "MANUAL" else 1.0
+        return max(virtual_time, user_tag) + cost / weight
+
+    async def _at_capacity(self, now: datetime) -> bool:
+        """Global caps shared by every worker: jobs running and LLM tokens spent in the last hour."""
+        running = await self.db.scalar(select(func.count()).select_from(SyncJob).where(SyncJob.status == RUNNING))
+        if running >= settings.SYNC_MAX_RUNNING_JOBS:
+            return True
+        if settings.SYNC_LLM_TOKENS_PER_HOUR:
+            spent = await self.db.scalar(
+                select(func.coalesce(func.sum(SyncJob.llm_tokens), 0))
+                .where(SyncJob.finished_at >= now - timedelta(hours=1))
+            )
+            if spent >= settings.SYNC_LLM_TOKENS_PER_HOUR:
+                logger.info(f"Sync LLM budget spent ({spent} tokens in the last hour), holding queued jobs")
+                return True
+        return False
+
+    async def lease(self, worker_id: str) -> Optional[SyncJob]:
+        """Claim the due job with the smallest finish tag whose user has nothing running."""
+        now = utcnow()
+        if await self._at_capacity(now):
+            await self.db.rollback()
+            return None
+        running = aliased(SyncJob)
+        stmt = (
+            select(SyncJob)
+            .where(SyncJob.status == QUEUED, SyncJob.run_after <= now)
+            .where(~exists().where(running.user_id == SyncJob.user_id, running.status == RUNNING))
+            .order_by(SyncJob.virtual_finish, SyncJob.run_after, SyncJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True, of=SyncJob)
+        )
+        job = await self.db.scalar(stmt)
+        if job is None:
+            await self.db.rollback()
+            return None
+
+        # The status guard keeps the claim atomic where row locks aren't available (SQLite)
+        result = await self.db.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job.id, SyncJob.status == QUEUED)
+            .values(
+                status=RUNNING,
+                attempts=SyncJob.attempts + 1,
+                leased_until=now + timedelta(seconds=settings.SYNC_JOB_LEASE_SECONDS),
+                locked_by=worker_id
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        if result.rowcount != 1:
+            return None
+        await self.db.refresh(job)
+        return job
+
+    async def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        result = await self.db.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.locked_by == worker_id, SyncJob.status == RUNNING)
+            .values(leased_until=utcnow() + timedelta(seconds=settings.SYNC_JOB_LEASE_SECONDS))
+        )
+        await self.db.commit()
+        return result.rowcount == 1
+
+    async def complete(self, job: SyncJob, success: bool, error: str = None, llm_tokens: int = None):
+        """Finish a leased job; failures are retried with backoff unless a newer job already covers the user."""
+        now = utcnow()
+        values = {
+            "status": DONE if success else FAILED,
+            "finished_at": now,
+            "last_error": error,
+            "leased_until": None,
+            "llm_tokens": (job.llm_tokens or 0) + (llm_tokens or 0)
+        }
+        if not success and job.attempts < settings.SYNC_JOB_MAX_ATTEMPTS:
+            waiting = await self.db.scalar(
+                select(exists().where(SyncJob.user_id == job.user_id, SyncJob.status == QUEUED))
+            )
+            if not waiting:
+                values.update(status=QUEUED, finished_at=None, locked_by=None, run_after=now + job_backoff(job.attempts))
+
+        stmt = update(SyncJob).where(SyncJob.id == job.id, SyncJob.status == RUNNING).values(**values)
+        try:
+            await self.db.execute(stmt)
+            await self.db.commit()
+        except IntegrityError:
+            # A webhook queued a new job in the meantime; it will do the retry
+            await self.db.rollback()
+            values.update(status=FAILED, finished_at=now, run_after=job.run_after)
+            await self.db.execute(update(SyncJob).where(SyncJob.id == job.id).values(**values))
+            await self.db.commit()
+
+    async def requeue_expired(self) -> int:
+        """Return jobs whose worker stopped heartbeating to the queue (or fail them when out of attempts)."""
+        now = utcnow()
+        queued = aliased(SyncJob)
+        expired = (SyncJob.status == RUNNING, SyncJob.leased_until < now)
+        await self.db.execute(
+            update(SyncJob)
+            .where(*expired)
+            .where(or_(
+                SyncJob.attempts >= settings.SYNC_JOB_MAX_ATTEMPTS,
+                exists().where(queued.user_id == SyncJob.user_id, queued.status == QUEUED)
+            ))
+            .values(status=FAILED, finished_at=now, last_error="Lease expired")
+        )
+        try:
+            result = await self.db.execute(
+                update(SyncJob)
+                .where(*expired)
+                .values(status=QUEUED, run_after=now, locked_by=None, leased_until=None)
+            )
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            return 0
+        if result.rowcount:
+            logger.warning(f"Requeued {result.rowcount} sync jobs with expired leases")
+        return result.rowcount
+
+    async def get_recent_jobs(self, user_id: UUID, limit: int = 20) -> List[SyncJob]:
+        result = await self.db.execute(
+            select(SyncJob)
+            .where(SyncJob.user_id == user_id)
+            .order_by(SyncJob.id.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
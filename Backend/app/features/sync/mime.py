@@ -0,0 +1,160 @@
+import base64
+import re
+from email.message import Message
+from html import unescape
+from typing import Callable, Optional
+
+from app.core.config import get_settings
+from app.features.sanitizer.service import SAFE_CUT
+
+settings = get_settings()
+
+# Tags whose content is never visible text
+SKIPPED_TAGS = {"script", "style", "head", "title", "noscript", "template", "xml"}
+# Tags that break a line (tables are rows of cells in bank alerts)
+BLOCK_TAGS = {
+    "br", "p", "div", "tr", "li", "ul", "ol", "table", "tbody", "thead", "tfoot", "section",
+    "article", "header", "footer", "blockquote", "pre", "hr", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+CELL_TAGS = {"td", "th"}
+TAG_NAME = re.compile(r'/?\s*([a-zA-Z][a-zA-Z0-9]*)')
+CHARSET = re.compile(r'charset\s*=\s*"?([\w.:\-]+)', re.IGNORECASE)
+LOOKS_LIKE_HTML = re.compile(r'<(?:html|head|body|div|p|br|table|span|td|a)\b', re.IGNORECASE)
+SPACES = re.compile(r'[ \t\r\f\v\xa0]+')
+SAFE_CUT_RE = re.compile(SAFE_CUT)
+
+def html_to_text(html: str, max_chars: Optional[int] = None) -> str:
+    """
+    Visible text of an HTML document in one left-to-right scan (str.find only, so time is
+    linear even for unterminated tags or comments). Stops once max_chars of text is out.
+    """
+    out = []
+    size = 0
+    pos, end = 0, len(html)
+    skipping = None
+    while pos < end:
+        lt = html.find("<", pos)
+        if lt == -1:
+            lt = end
+        if skipping is None and lt > pos:
+            text = unescape(html[pos:lt])
+            out.append(text)
+            size += len(text)
+            if max_chars and size >= max_chars:
+                break
+        if lt == end:
+            break
+        if html.startswith("<!--", lt):
+            close = html.find("-->", lt + 4)
+            pos = end if close == -1 else close + 3
+            continue
+        gt = html.find(">", lt + 1)
+        if gt == -1:
+            break
+        tag = html[lt + 1:gt]
+        match = TAG_NAME.match(tag)
+        name = match.group(1).lower() if match else ""
+        closing = tag.startswith("/")
+        if skipping:
+            if closing and name == skipping:
+                skipping = None
+        elif name in SKIPPED_TAGS and not closing and not tag.endswith("/"):
+            skipping = name
+        elif name in BLOCK_TAGS:
+            out.append("\n")
+        elif name in CELL_TAGS:
+            out.append(" ")
+        pos = gt + 1
+    return normalize_whitespace("".join(out))
+
+def normalize_whitespace(text: str) -> str:
+    lines = (SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+def clip_text(text: str, max_chars: Optional[int] = None) -> str:
+    """
+    Cap a body at max_chars (EMAIL_BODY_MAX_CHARS), preferring a cut the sanitizer
+    considers safe so a card or account number is never left half outside the window.
+    """
+    max_chars = max_chars or settings.EMAIL_BODY_MAX_CHARS
+    if len(text) <= max_chars:
+        return text
+    cut = max_chars
+    for match in SAFE_CUT_RE.finditer(text, max(0, max_chars - 512), max_chars):
+        cut = match.start()
+    return text[:cut]
+
+def body_text(text: str, max_chars: Optional[int] = None) -> str:
+    """Capped plain text of a body that may be HTML (e.g. pushed by Apps Script's getBody())."""
+    max_chars = max_chars or settings.EMAIL_BODY_MAX_CHARS
+    if LOOKS_LIKE_HTML.search(text, 0, 4096):
+        text = html_to_text(text, max_chars)
+    return clip_text(text, max_chars)
+
+def _choose_body(plain: Optional[Callable[[], str]], html: Optional[Callable[[], str]], max_chars: Optional[int]) -> str:
+    # Decode only the part that is used: plain text, or the HTML alternative when plain is empty
+    max_chars = max_chars or settings.EMAIL_BODY_MAX_CHARS
+    text = plain() if plain else ""
+    if not text.strip() and html:
+        text = html_to_text(html(), max_chars)
+    return clip_text(text, max_chars)
+
+def _decode(raw: bytes, charset: Optional[str]) -> str:
+    try:
+        return raw.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return raw.decode("utf-8", errors="replace")
+
+def _gmail_part_text(part: dict) -> str:
+    # body.data is base64url of the already transfer-decoded part; decode at most EMAIL_PART_MAX_BYTES of it
+    data = part["body"]["data"][:(settings.EMAIL_PART_MAX_BYTES // 3 + 1) * 4]
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    content_type = next(
+        (h["value"] for h in part.get("headers", []) if h["name"].lower() == "content-type"), ""
+    )
+    charset = CHARSET.search(content_type)
+    return _decode(raw, charset.group(1) if charset else None)
+
+def extract_gmail_body(payload: dict, max_chars: Optional[int] = None) -> str:
+    """Walk a Gmail API payload (nested multiparts included) for its text, skipping attachments."""
+    plain = html = None
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get("parts"):
+            stack.extend(reversed(part["parts"]))
+            continue
+        if part.get("filename") or not part.get("body", {}).get("data"):
+            continue
+        mime_type = part.get("mimeType", "")
+        if mime_type == "text/plain" and plain is None:
+            plain = part
+        elif mime_type == "text/html" and html is None:
+            html = part
+    return _choose_body(
+        (lambda: _gmail_part_text(plain)) if plain else None,
+        (lambda: _gmail_part_text(html)) if html else None,
+        max_chars
+    )
+
+def _email_part_text(part: Message) -> str:
+    # get_payload(decode=True) undoes base64/quoted-printable
+    raw = part.get_payload(decode=True) or b""
+    return _decode(raw[:settings.EMAIL_PART_MAX_BYTES], part.get_content_charset())
+
+def extract_email_body(msg: Message, max_chars: Optional[int] = None) -> str:
+    """Same as extract_gmail_body for a parsed RFC 822 message (mbox/.eml archives)."""
+    plain = html = None
+    for part in msg.walk():
+        if part.is_multipart() or part.get_content_disposition() == "attachment":
+            continue
+        content_type = part.get_content_type()
+        if content_type == "text/plain" and plain is None:
+            plain = part
+        elif content_type == "text/html" and html is None:
+            html = part
+    return _choose_body(
+        (lambda: _email_part_text(plain)) if plain else None,
+        (lambda: _email_part_text(html)) if html else None,
+        max_chars
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 from uuid import UUID
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Text, JSON, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -20,5 +20,47 @@ class SyncLog(Base):
     
     # Store the historyId used for this sync to know where to start next time
     history_id_used: Mapped[str] = mapped_column(String, nullable=True) 
+    
+    # Per-run counters (LLM requests/tokens saved, etc.)
+    stats: Mapped[dict] = mapped_column(JSON, nullable=True)
 
     # Relationship to user if needed, or just ID
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+
+    # sha256 of the model name + sanitized text; the text itself is never stored
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    result: Mapped[dict] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+    # Coalescing: at most one queued and one running job per user
+    __table_args__ = (
+        Index("uq_sync_jobs_user_queued", "user_id", unique=True,
+              postgresql_where=text("status = 'QUEUED'"), sqlite_where=text("status = 'QUEUED'")),
+        Index("uq_sync_jobs_user_running", "user_id", unique=True,
+              postgresql_where=text("status = 'RUNNING'"), sqlite_where=text("status = 'RUNNING'")),
+        Index("ix_sync_jobs_status_run_after", "status", "run_after"),
+        Index("ix_sync_jobs_user_id", "user_id"),
+        Index("ix_sync_jobs_virtual_finish", "virtual_finish"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    status: Mapped[str] = mapped_column(String, default="QUEUED") # QUEUED, RUNNING, DONE, FAILED
+    trigger_source: Mapped[str] = mapped_column(String) # WEBHOOK, MANUAL, SCHEDULED
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    leased_until: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    locked_by: Mapped[str] = mapped_column(String, nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    # Weighted fair queuing tag; workers lease the smallest first
+    virtual_finish: Mapped[float] = mapped_column(Float, default=0.0)
+    llm_tokens: Mapped[int] = mapped_column(Integer, nullable=True)
+    # Seconds since the user's last successful sync when the scheduler queued this job
+    lag_seconds: Mapped[float] = mapped_column(Float, nullable=True)
@@ -0,0 +1,69 @@
+import re
+from typing import List
+
+from app.core.config import get_settings
+from app.features.sync.mime import clip_text
+from app.features.transactions.enums import CATEGORY_MAP
+
+settings = get_settings()
+
+# Lines, or sentences when a bank packs the whole alert into one line ("Rs. 500" is not a break)
+SEGMENT_BREAK = re.compile(r'\n|(?<=[\w)][.!?])\s+(?=[A-Z])')
+CURRENCY = re.compile(r'₹|\b(?:Rs|INR|USD|EUR|GBP)\b|[$€£]', re.IGNORECASE)
+AMOUNT = re.compile(r'\d[\d,]*\.\d{1,2}\b|\b\d{1,3}(?:,\d{2,3})+\b')
+TXN_WORDS = re.compile(
+    r'\b(?:debited|credited|spent|paid|payment|purchase|transaction|txn|withdrawn|transferred|'
+    r'received|refund(?:ed)?|charged|emi|sent)\b', re.IGNORECASE
+)
+MERCHANT_CUES = re.compile(r'\b(?:at|to|towards|from|merchant|vpa|upi|info|ref)\b', re.IGNORECASE)
+BOILERPLATE = re.compile(
+    r'\b(?:unsubscribe|disclaimer|do not reply|confidential|copyright|privacy|terms and conditions|'
+    r'customer care|never share|click here|download|app store|follow us|intended recipient)\b', re.IGNORECASE
+)
+# A segment needs at least two kinds of cue to anchor a window
+MIN_SCORE = 3
+
+# "Category: Sub|Sub; ..." carries the same choices as the two full enum lists in far fewer tokens
+CATEGORY_CATALOG = "; ".join(
+    f"{category.value}: {'|'.join(sub.value for sub in subs)}" for category, subs in CATEGORY_MAP.items()
+)
+
+def score_segment(segment: str) -> int:
+    score = 2 * bool(CURRENCY.search(segment)) + 2 * bool(AMOUNT.search(segment)) \
+        + 2 * bool(TXN_WORDS.search(segment)) + bool(MERCHANT_CUES.search(segment))
+    if BOILERPLATE.search(segment):
+        score -= 3
+    return score
+
+def relevant_window(text: str, max_chars: int = None, context: int = 1) -> str:
+    """
+    The part of a sanitized email worth sending to the LLM: the best-scoring segments
+    (currency, amount, transaction and merchant cues) with `context` neighbours each, in
+    their original order and within max_chars. Falls back to the head of the text when
+    nothing looks like a transaction.
+    """
+    max_chars = max_chars or settings.LLM_WINDOW_MAX_CHARS
+    if len(text) <= max_chars:
+        return text
+    segments: List[str] = [s.strip() for s in SEGMENT_BREAK.split(text)]
+    segments = [s for s in segments if s]
+    scores = [score_segment(s) for s in segments]
+    ranked = sorted(range(len(segments)), key=lambda i: -scores[i])
+    if not ranked or scores[ranked[0]] < MIN_SCORE:
+        return clip_text(text, max_chars)
+
+    keep = set()
+    size = 0
+    for index in ranked:
+        if scores[index] < MIN_SCORE:
+            break
+        # The segment itself first, then its neighbours nearest first, so context never crowds it out
+        for neighbour in sorted(range(index - context, index + context + 1), key=lambda n: abs(n - index)):
+            if 0 <= neighbour < len(segments) and neighbour not in keep:
+                length = len(segments[neighbour]) + 1
+                if size + length <= max_chars:
+                    keep.add(neighbour)
+                    size += length
+    if not keep:
+        return clip_text(segments[ranked[0]], max_chars)
+    return "\n".join(segments[index] for index in sorted(keep))
@@ -1,15 +1,19 @@
 from typing import Annotated
 import logging
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Header, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from google_auth_oauthlib.flow import Flow
 
 from app.core.database import get_db
 from app.core.config import get_settings
+from app.core.executor import run_blocking
+from app.core.ndjson import iter_ndjson
 from app.features.auth.deps import get_current_user
 from app.features.auth.models import User
-from app.features.sync.service import SyncService
+from app.features.sync.service import SyncService, get_sync_progress
+from app.features.sync.jobs import SyncJobService
+from app.features.sync.scheduler import get_sync_lag
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -22,7 +26,7 @@ def get_google_flow(redirect_uri: str = "postmessage"):
                 "client_id": settings.GOOGLE_CLIENT_ID,
                 "client_secret": settings.GOOGLE_CLIENT_SECRET,
                 "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
+                "token_uri": settings.GOOGLE_TOKEN_URI,
             }
         },
         scopes=["https://www.googleapis.com/auth/gmail.readonly"]
@@ -50,7 +54,7 @@ async def google_callback(
         
     flow = get_google_flow(redirect_uri)
     try:
-        flow.fetch_token(code=code)
+        await run_blocking(flow.fetch_token, code=code)
         creds = flow.credentials
         current_user.gmail_credentials = {
             "token": creds.token,
@@ -66,8 +70,7 @@ async def google_callback(
 @router.post("/webhook", status_code=status.HTTP_202_ACCEPTED)
 async def webhook_ingress(
     payload: dict, 
-    background_tasks: BackgroundTasks, 
-    service: Annotated[SyncService, Depends()],
+    jobs: Annotated[SyncJobService, Depends()],
     db: Annotated[AsyncSession, Depends(get_db)],
     x_pfie_secret: Annotated[str | None, Header()] = None
 ):
@@ -84,14 +87,50 @@ async def webhook_ingress(
     if not user:
         return {"status": "user_not_found"}
         
-    background_tasks.add_task(service.execute_sync, user.id, "WEBHOOK")
-    return {"status": "accepted"}
+    job_id = await jobs.enqueue(user.id, "WEBHOOK")
+    return {"status": "accepted", "job_id": job_id}
+
+@router.post("/webhook/messages")
+async def webhook_messages(
+    request: Request,
+    emailAddress: str,
+    sync_service: Annotated[SyncService, Depends()],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    x_pfie_secret: Annotated[str | None, Header()] = None
+):
+    """
+    Push ingestion: the body is NDJSON, one {"id", "internalDate", "body"} message per line.
+    Messages are processed while the body streams in; every line gets an ack in the response.
+    """
+    if x_pfie_secret != settings.PFIE_SECRET:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    result = await db.execute(select(User).where(User.email == emailAddress))
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    records = iter_ndjson(request.stream(), settings.INGEST_MAX_RECORD_BYTES)
+    return await sync_service.ingest_messages(user.id, records)
 
 @router.post("/manual")
 async def manual_sync(
     current_user: Annotated[User, Depends(get_current_user)],
-    background_tasks: BackgroundTasks,
-    service: Annotated[SyncService, Depends()]
+    jobs: Annotated[SyncJobService, Depends()]
+):
+    job_id = await jobs.enqueue(current_user.id, "MANUAL")
+    return {"status": "queued", "job_id": job_id}
+
+@router.get("/progress")
+async def sync_progress(current_user: Annotated[User, Depends(get_current_user)]):
+    """Per-stage throughput and queue depth of the user's running sync."""
+    progress = get_sync_progress(current_user.id)
+    return progress or {"running": False}
+
+@router.get("/lag")
+async def sync_lag(
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    background_tasks.add_task(service.execute_sync, current_user.id, "MANUAL")
-    return {"status": "started"}
+    """How far behind the user's mailbox is, and the state of its latest sync job."""
+    return await get_sync_lag(db, current_user.id)
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from uuid import UUID
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.core.config import get_settings
+from app.features.auth.models import User
+from app.features.sync.jobs import SyncJobService, utcnow, job_backoff, QUEUED, RUNNING, DONE, FAILED
+from app.features.sync.models import SyncJob, SyncLog
+from app.features.sync.service import NON_GMAIL_SOURCES
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite hands timestamps back without a timezone; they are stored as UTC
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+def seconds_since(moment: datetime, now: datetime) -> float:
+    return (now - as_utc(moment)).total_seconds()
+
+class SyncScheduler:
+    """
+    Periodically queues a SCHEDULED sync for every connected mailbox whose last Gmail sync
+    attempt (pushes and imports don't count), successful or not, is older than
+    SYNC_SCHEDULE_INTERVAL_SECONDS. Mailboxes with a job queued or running are left alone,
+    and ones whose jobs keep failing wait longer, continuing the jobs' retry backoff.
+    Start times are jittered so users don't all wake together; fairness and global caps
+    are applied when workers lease.
+    Several schedulers may run at once: the queue coalesces their jobs per user.
+    """
+    def __init__(self, interval_seconds: int = None, jitter_seconds: int = None, tick_seconds: float = None):
+        self.interval = timedelta(seconds=interval_seconds or settings.SYNC_SCHEDULE_INTERVAL_SECONDS)
+        self.jitter_seconds = settings.SYNC_SCHEDULE_JITTER_SECONDS if jitter_seconds is None else jitter_seconds
+        self.tick_seconds = tick_seconds or settings.SYNC_SCHEDULER_TICK_SECONDS
+        # user_id -> seconds since last successful sync start (None: never synced), as of the last tick
+        self.lag: Dict[UUID, Optional[float]] = {}
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        # Spread the first tick too, in case many processes start together
+        delay = random.uniform(0, self.tick_seconds)
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Sync scheduler tick failed: {e}")
+            delay = self.tick_seconds
+
+    async def tick(self) -> int:
+        """Queue every due user. Returns how many were queued."""
+        now = utcnow()
+        async with AsyncSessionLocal() as db:
+            users = (await db.execute(select(User.id).where(User.gmail_credentials.is_not(None)))).scalars().all()
+            gmail_logs = SyncLog.trigger_source.notin_(NON_GMAIL_SOURCES)
+            last_success = dict((await db.execute(
+                select(SyncLog.user_id, func.max(SyncLog.start_time))
+                .where(SyncLog.status == "SUCCESS", gmail_logs)
+                .group_by(SyncLog.user_id)
+            )).all())
+            last_log = dict((await db.execute(
+                select(SyncLog.user_id, func.max(SyncLog.start_time)).where(gmail_logs).group_by(SyncLog.user_id)
+            )).all())
+            job_state = {row.user_id: row for row in (await db.execute(self._job_state())).all()}
+
+            jobs = SyncJobService(db)
+            queued = 0
+            self.lag = {}
+            for user_id in users:
+                last = last_success.get(user_id)
+                lag = seconds_since(last, now) if last else None
+                self.lag[user_id] = lag
+                state = job_state.get(user_id)
+                if state and state.active:
+                    continue
+                attempts = [as_utc(moment) for moment in (last_log.get(user_id), state and state.last_attempt) if moment]
+                if attempts and now < max(attempts) + self._wait(state.failed_attempts if state else 0):
+                    continue
+                run_after = now + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+                await jobs.enqueue(user_id, "SCHEDULED", run_after=run_after, lag_seconds=lag)
+                queued += 1
+
+        known = [lag for lag in self.lag.values() if lag is not None]
+        if known:
+            logger.info(
+                f"Sync scheduler: {len(users)} mailboxes, {queued} queued, "
+                f"lag p50 {statistics.median(known):.0f}s max {max(known):.0f}s, "
+                f"{len(self.lag) - len(known)} never synced"
+            )
+        return queued
+
+    def _job_state(self):
+        """Per user: whether a job is queued or running, when the last one ended, and failed attempts since the last success."""
+        last_done = (
+            select(SyncJob.user_id, func.max(SyncJob.id).label("id"))
+            .where(SyncJob.status == DONE)
+            .group_by(SyncJob.user_id)
+            .subquery()
+        )
+        return (
+            select(
+                SyncJob.user_id,
+                func.count().filter(SyncJob.status.in_((QUEUED, RUNNING))).label("active"),
+                func.max(func.coalesce(SyncJob.finished_at, SyncJob.created_at)).label("last_attempt"),
+                func.coalesce(func.sum(SyncJob.attempts).filter(
+                    SyncJob.status == FAILED, SyncJob.id > func.coalesce(last_done.c.id, 0)
+                ), 0).label("failed_attempts"),
+            )
+            .outerjoin(last_done, last_done.c.user_id == SyncJob.user_id)
+            .group_by(SyncJob.user_id)
+        )
+
+    def _wait(self, failed_attempts: int) -> timedelta:
+        if not failed_attempts:
+            return self.interval
+        # Far past the cap, the doubling would overflow timedelta
+        backoff = min(job_backoff(min(failed_attempts, 32)), timedelta(seconds=settings.SYNC_SCHEDULE_MAX_BACKOFF_SECONDS))
+        return self.interval + backoff
+
+async def get_sync_lag(db: AsyncSession, user_id: UUID) -> dict:
+    """Lag of a user's mailbox: time since the last successful sync started, plus any waiting job."""
+    last = await db.scalar(
+        select(func.max(SyncLog.start_time))
+        .where(SyncLog.user_id == user_id, SyncLog.status == "SUCCESS", SyncLog.trigger_source.notin_(NON_GMAIL_SOURCES))
+    )
+    jobs = await SyncJobService(db).get_recent_jobs(user_id, limit=1)
+    job = jobs[0] if jobs else None
+    return {
+        "last_success_at": last,
+        "lag_seconds": round(seconds_since(last, utcnow()), 1) if last else None,
+        "latest_job": {
+            "id": job.id,
+            "status": job.status,
+            "trigger_source": job.trigger_source,
+            "run_after": job.run_after,
+            "attempts": job.attempts,
+        } if job else None,
+    }
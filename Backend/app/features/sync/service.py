@@ -1,30 +1,216 @@
+import asyncio
 import hashlib
 import uuid
-import httpx
 import logging
 import json
-import base64
-from datetime import datetime
-from typing import Optional, List
+import re
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+from typing import Any, Callable, Optional, List, Dict, Tuple, AsyncIterator
 from sqlalchemy import select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
+from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request as GoogleRequest
 
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.config import get_settings
+from app.core.http_client import get_http_client
+from app.core.executor import run_blocking
+from app.core.pipeline import Pipeline
+from app.core.rate_limiter import get_groq_rate_limiter, backoff_delay
 from app.features.transactions.service import TransactionService
 from app.features.sanitizer.service import get_sanitizer_service
 from app.features.transactions.enums import Category, SubCategory, TransactionStatus, AccountType
 from app.features.sync.models import SyncLog
+from app.features.sync.cache import get_extraction_cache
+from app.features.sync.dedup import get_dedup_filter, new_dedup_stats
+from app.features.sync.mime import extract_gmail_body, body_text
+from app.features.sync.relevance import relevant_window, CATEGORY_CATALOG
+from app.features.templates.service import TemplateService
 from app.features.auth.models import User
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for sync stats."""
+    return len(text) // 4
+
+def new_llm_stats() -> dict:
+    return {
+        "requests": 0,
+        "rate_limited": 0,
+        "batches": 0,
+        "fallbacks": 0,
+        "prompt_tokens": 0,
+        "requests_saved": 0,
+        "tokens_saved": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "template_hits": 0,
+        "template_misses": 0,
+        # Estimated prompt tokens of the emails sent to the LLM, with the full body and
+        # both enum lists (before) vs the relevant window and compact catalog (after)
+        "llm_emails": 0,
+        "input_tokens_before": 0,
+        "input_tokens_after": 0
+    }
+
+# What the category and sub-category lists cost per prompt before the compact catalog
+VERBOSE_CATALOG_TOKENS = estimate_tokens(f"{[c.value for c in Category]}{[s.value for s in SubCategory]}")
+CATALOG_TOKENS = estimate_tokens(CATEGORY_CATALOG)
+
+def input_tokens_per_email(llm_stats: dict) -> dict:
+    emails = llm_stats["llm_emails"]
+    return {
+        "before": round(llm_stats["input_tokens_before"] / emails, 1) if emails else 0.0,
+        "after": round(llm_stats["input_tokens_after"] / emails, 1) if emails else 0.0,
+    }
+
+# Pipelines of syncs running in this process, for progress reporting
+_active_pipelines: Dict[uuid.UUID, Pipeline] = {}
+
+def get_sync_progress(user_id: uuid.UUID) -> Optional[dict]:
+    pipeline = _active_pipelines.get(user_id)
+    return pipeline.snapshot() if pipeline else None
+
+# Syncs of messages pushed to the ingest endpoint or imported from an archive;
+# they don't advance (or delay) the Gmail checkpoint
+PUSH_SOURCE = "PUSH"
+IMPORT_SOURCE = "IMPORT"
+NON_GMAIL_SOURCES = (PUSH_SOURCE, IMPORT_SOURCE)
+
+def message_hash(msg: dict) -> str:
+    """raw_content_hash of an email, the key every sync dedups on."""
+    return hashlib.sha256(f"{msg['id']}:{msg['internalDate']}".encode()).hexdigest()
+
+def parse_pushed_message(record: Any) -> Tuple[Optional[dict], Optional[str]]:
+    """Validate one pushed record ({id, internalDate, body}) into the message shape the pipeline uses."""
+    if not isinstance(record, dict):
+        return None, "Expected a JSON object"
+    msg_id, internal_date, body = record.get("id"), record.get("internalDate"), record.get("body")
+    if not isinstance(msg_id, str) or not msg_id:
+        return None, "Missing id"
+    if not str(internal_date).isdigit():
+        return None, "internalDate must be epoch milliseconds"
+    if not isinstance(body, str) or not body.strip():
+        return None, "Missing body"
+    return {"id": msg_id, "internalDate": str(internal_date), "snippet": "", "body": body_text(body)}, None
+
+GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+GMAIL_QUERY = "spent OR debited OR transaction OR alert OR paid"
+# history.list can't filter by query, so deltas are matched locally against the same words
+GMAIL_QUERY_WORDS = re.compile(r'\b(?:spent|debited|transaction|alert|paid)\b', re.IGNORECASE)
+GMAIL_SKIPPED_LABELS = {"SENT", "DRAFT", "SPAM", "TRASH"}
+
+def build_gmail_credentials(creds_data: dict) -> Credentials:
+    expiry = creds_data.get('expiry')
+    return Credentials(
+        token=creds_data.get('token'),
+        refresh_token=creds_data.get('refresh_token'),
+        token_uri=settings.GOOGLE_TOKEN_URI,
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        scopes=GMAIL_SCOPES,
+        # google-auth compares expiry against naive UTC
+        expiry=datetime.fromisoformat(expiry).replace(tzinfo=None) if expiry else None
+    )
+
+def serialize_gmail_credentials(creds: Credentials) -> dict:
+    return {
+        "token": creds.token,
+        "refresh_token": creds.refresh_token,
+        "expiry": creds.expiry.isoformat() if creds.expiry else None
+    }
+
+def build_gmail_service(creds: Credentials):
+    # Built per call: the underlying httplib2 transport is not thread-safe
+    return build(
+        'gmail', 'v1',
+        credentials=creds,
+        cache_discovery=False,
+        client_options={"api_endpoint": settings.GMAIL_API_URL}
+    )
+
+def get_history_id_blocking(service) -> str:
+    return service.users().getProfile(userId='me').execute()['historyId']
+
+def search_page_blocking(service, query: str, page_token: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+    """One page of a full keyword search. Runs on the executor."""
+    results = service.users().messages().list(
+        userId='me', q=query, maxResults=settings.GMAIL_PAGE_SIZE, pageToken=page_token
+    ).execute()
+    messages = batch_get_messages(service, [m['id'] for m in results.get('messages', [])])
+    return [parse_gmail_message(m) for m in messages], results.get('nextPageToken')
+
+def history_page_blocking(service, start_history_id: str, page_token: Optional[str]) -> Tuple[List[dict], Optional[str], str]:
+    """One page of messages added since start_history_id. Runs on the executor."""
+    results = service.users().history().list(
+        userId='me',
+        startHistoryId=start_history_id,
+        historyTypes=['messageAdded'],
+        maxResults=settings.GMAIL_PAGE_SIZE,
+        pageToken=page_token
+    ).execute()
+    message_ids = [
+        added['message']['id']
+        for record in results.get('history', [])
+        for added in record.get('messagesAdded', [])
+        if not GMAIL_SKIPPED_LABELS.intersection(added['message'].get('labelIds', []))
+    ]
+    messages = [parse_gmail_message(m) for m in batch_get_messages(service, message_ids)]
+    return [m for m in messages if matches_gmail_query(m)], results.get('nextPageToken'), results['historyId']
+
+def matches_gmail_query(parsed: dict) -> bool:
+    return bool(GMAIL_QUERY_WORDS.search(f"{parsed['subject']}\n{parsed['snippet']}\n{parsed['body']}"))
+
+def batch_get_messages(service, message_ids: List[str], **params) -> List[dict]:
+    """Fetch messages (full unless `params` say otherwise), GMAIL_BATCH_SIZE per HTTP round trip, retrying failed items once."""
+    fetched = {}
+    failed = []
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            failed.append(request_id)
+        else:
+            fetched[request_id] = response
+
+    pending = list(dict.fromkeys(message_ids))
+    for _ in range(2):
+        for start in range(0, len(pending), settings.GMAIL_BATCH_SIZE):
+            batch = BatchHttpRequest(callback=on_response, batch_uri=settings.GMAIL_BATCH_URL)
+            for msg_id in pending[start:start + settings.GMAIL_BATCH_SIZE]:
+                batch.add(service.users().messages().get(userId='me', id=msg_id, **params), request_id=msg_id)
+            batch.execute()
+        pending, failed = failed, []
+        if not pending:
+            break
+
+    if pending:
+        logger.warning(f"Gmail batch fetch failed for {len(pending)} messages")
+    return [fetched[msg_id] for msg_id in message_ids if msg_id in fetched]
+
+def get_internal_dates_blocking(service, message_ids: List[str]) -> Dict[str, str]:
+    """internalDate of the given messages, skipping ids no longer in the mailbox. Runs on the executor."""
+    messages = batch_get_messages(service, message_ids, format='minimal', fields='id,internalDate')
+    return {m['id']: m['internalDate'] for m in messages}
+
+def parse_gmail_message(msg: dict) -> dict:
+    """Decode a full Gmail message once, on the executor, into what the pipeline needs."""
+    headers = msg['payload'].get('headers', [])
+    return {
+        "id": msg['id'],
+        "internalDate": msg['internalDate'],
+        "subject": next((h['value'] for h in headers if h['name'].lower() == 'subject'), ""),
+        "snippet": msg['snippet'],
+        "body": extract_gmail_body(msg['payload'])
+    }
+
 class SyncService:
     def __init__(self, 
                  db: AsyncSession = Depends(get_db), 
@@ -32,18 +218,37 @@ class SyncService:
         self.db = db
         self.txn_service = transaction_service
         self.sanitizer = get_sanitizer_service()
+        self.cache = get_extraction_cache()
+        self.dedup = get_dedup_filter()
+        self.dedup_stats = new_dedup_stats()
+        self.persist_stats = {"inserted": 0, "skipped": 0}
+        self.templates = TemplateService(db)
+        self.llm_stats = new_llm_stats()
+        self.history_id: Optional[str] = None
+        self.template_hits = Counter()
+        self._matcher = None
+        # (user, credentials, Gmail service) for internalDate lookups during an import; False without Gmail access
+        self._gmail = None
+        # Told (content hashes, "stored" | "duplicate") as messages leave the pipeline, for push and import
+        self.on_settled: Optional[Callable[[List[str], str], None]] = None
+        # self.db is shared by the fetch and extract stages of a running sync
+        self.db_lock = asyncio.Lock()
+        # Groq requests in flight for this sync, batches and per-email fallbacks alike
+        self.llm_slots = asyncio.Semaphore(max(1, settings.EXTRACTION_CONCURRENCY))
 
-    async def _get_last_sync_time(self, user_id: uuid.UUID) -> Optional[datetime]:
+    async def _get_sync_checkpoint(self, user_id: uuid.UUID) -> Tuple[Optional[datetime], Optional[str]]:
+        """Start time and Gmail historyId of the last successful sync."""
         stmt = (
             select(SyncLog)
             .where(SyncLog.user_id == user_id)
             .where(SyncLog.status == "SUCCESS")
+            .where(SyncLog.trigger_source.notin_(NON_GMAIL_SOURCES))
             .order_by(desc(SyncLog.start_time))
             .limit(1)
         )
         result = await self.db.execute(stmt)
         log = result.scalar_one_or_none()
-        return log.start_time if log else None
+        return (log.start_time, log.history_id_used) if log else (None, None)
 
     async def _log_start(self, user_id: uuid.UUID, source: str) -> SyncLog:
         log = SyncLog(user_id=user_id, trigger_source=source, status="IN_PROGRESS")
@@ -52,29 +257,131 @@ class SyncService:
         await self.db.refresh(log)
         return log
 
-    async def _log_end(self, log: SyncLog, status: str, count: int = 0, error: str = None):
+    async def _log_end(self, log: SyncLog, status: str, count: int = 0, error: str = None,
+                       pipeline: Optional[Pipeline] = None):
         log.end_time = datetime.now()
         log.status = status
         log.records_processed = count
         log.error_message = error
+        self.llm_stats["input_tokens_per_email"] = input_tokens_per_email(self.llm_stats)
+        log.stats = {"llm": self.llm_stats, "dedup": self.dedup_stats, "persist": self.persist_stats}
+        if pipeline:
+            log.stats["pipeline"] = pipeline.snapshot()
         await self.db.commit()
 
+    async def extract_transactions(self, user_id: uuid.UUID, texts: List[str],
+                                   llm_texts: Optional[List[str]] = None) -> List[dict]:
+        """
+        Extract with the user's learned templates first; only unmatched texts go to the LLM,
+        as their llm_texts counterpart (the relevant window) when given.
+        """
+        results: List[Optional[dict]] = [None] * len(texts)
+        if settings.TEMPLATE_EXTRACTION_ENABLED:
+            async with self.db_lock:
+                if self._matcher is None:
+                    self._matcher = await self.templates.load_matcher(user_id)
+            for index, text in enumerate(texts):
+                found = self._matcher.match(text)
+                if found:
+                    self.template_hits[found[0]] += 1
+                    results[index] = {**found[1], "source": "template"}
+
+        llm_indexes = [index for index, extracted in enumerate(results) if extracted is None]
+        llm_texts = llm_texts or texts
+        per_prompt = max(1, settings.EXTRACTION_BATCH_SIZE)
+        for index in llm_indexes:
+            self.llm_stats["llm_emails"] += 1
+            self.llm_stats["input_tokens_before"] += estimate_tokens(texts[index]) + VERBOSE_CATALOG_TOKENS // per_prompt
+            self.llm_stats["input_tokens_after"] += estimate_tokens(llm_texts[index]) + CATALOG_TOKENS // per_prompt
+        extracted = await self.call_brain_api_batch([llm_texts[index] for index in llm_indexes])
+        for index, item in zip(llm_indexes, extracted):
+            results[index] = {**item, "source": "llm"}
+
+        self.llm_stats["template_hits"] += len(texts) - len(llm_indexes)
+        self.llm_stats["template_misses"] += len(llm_indexes)
+        return results
+
     async def call_brain_api(self, text: str) -> dict:
         """Extract transaction details using Groq LLM."""
         if not settings.GROQ_API_KEY:
             logger.warning("GROQ_API_KEY not set. Using fallback.")
             return self._fallback_txn()
 
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {settings.GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        categories = [c.value for c in Category]
-        sub_categories = [s.value for s in SubCategory]
-        
-        prompt = f"""
+        data = await self._post_completion(self._build_prompt(text))
+        try:
+            return self._parse_extraction(data)
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.error(f"Groq API Error: {e}")
+            return self._fallback_txn()
+
+    async def call_brain_api_batch(self, texts: List[str]) -> List[dict]:
+        """Extract transaction details for many texts, packing EXTRACTION_BATCH_SIZE emails per Groq request."""
+        if not settings.GROQ_API_KEY:
+            logger.warning("GROQ_API_KEY not set. Using fallback.")
+            return [self._fallback_txn() for _ in texts]
+
+        # Texts are already sanitized, so only post-sanitizer content ever reaches the cache.
+        # Identical texts, cached or repeated within this sync, skip the network entirely.
+        keys = [self.cache.key(text) for text in texts]
+        async with self.db_lock:
+            known = await self.cache.get_many(self.db, keys)
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in known:
+                todo.setdefault(key, text)
+        self.llm_stats["cache_hits"] += len(texts) - len(todo)
+        self.llm_stats["cache_misses"] += len(todo)
+
+        batch_size = max(1, settings.EXTRACTION_BATCH_SIZE)
+        # gather keeps input order within the chunk; the persist stage restores chunk order.
+        # Requests share self.llm_slots, however many chunks are being extracted at once.
+        pending = list(todo.values())
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        results = await asyncio.gather(*(self._extract_batch(batch) for batch in batches))
+        extracted = dict(zip(todo.keys(), (item for batch in results for item in batch)))
+
+        fallback = self._fallback_txn()
+        async with self.db_lock:
+            await self.cache.put_many(self.db, {key: item for key, item in extracted.items() if item != fallback})
+        known.update(extracted)
+        return [dict(known[key]) for key in keys]
+
+    async def _extract_batch(self, texts: List[str]) -> List[dict]:
+        if len(texts) == 1:
+            return [await self.call_brain_api(texts[0])]
+
+        prompt = self._build_batch_prompt(texts)
+        data = await self._post_completion(prompt)
+        items = data.get("transactions") if isinstance(data, dict) else None
+
+        # Validate items one by one so a single malformed entry doesn't sink the batch
+        parsed = {}
+        for item in items if isinstance(items, list) else []:
+            try:
+                index = int(item["index"])
+                if 0 <= index < len(texts) and index not in parsed:
+                    parsed[index] = self._parse_extraction(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        # Emails the batch answer left out are retried on their own, concurrently
+        missing = [index for index in range(len(texts)) if index not in parsed]
+        retried = await asyncio.gather(*(self.call_brain_api(texts[index]) for index in missing))
+        parsed.update(zip(missing, retried))
+        results = [parsed[index] for index in range(len(texts))]
+        fallback_tokens = sum(estimate_tokens(self._build_prompt(texts[index])) for index in missing)
+
+        # Savings are measured against sending every text on its own
+        fallbacks = len(missing)
+        single_tokens = sum(estimate_tokens(self._build_prompt(text)) for text in texts)
+        self.llm_stats["batches"] += 1
+        self.llm_stats["fallbacks"] += fallbacks
+        self.llm_stats["requests_saved"] += len(texts) - (1 + fallbacks)
+        self.llm_stats["tokens_saved"] += single_tokens - (estimate_tokens(prompt) + fallback_tokens)
+        return results
+
+    def _build_prompt(self, text: str) -> str:
+        return f"""
         Extract transaction details from the following text:
         Text: "{text}"
         
@@ -82,14 +389,42 @@ class SyncService:
         - amount: float
         - currency: string (3-letter code, default INR)
         - merchant_name: string (clean, title case)
-        - category: string (Must be one of: {categories})
-        - sub_category: string (Must be one of: {sub_categories})
+        - category: string (a category from the catalog below)
+        - sub_category: string (one of that category's sub-categories)
         - account_type: string (SAVINGS, CREDIT_CARD, or CASH)
         
+        Catalog (Category: Sub-category|...): {CATEGORY_CATALOG}
         If unsure about category, use "Uncategorized".
         If no transaction found, return null.
         """
 
+    def _build_batch_prompt(self, texts: List[str]) -> str:
+        messages = json.dumps([{"index": i, "text": text} for i, text in enumerate(texts)])
+
+        return f"""
+        Extract transaction details from each of the following messages:
+        Messages: {messages}
+        
+        Return ONLY a JSON object of the form {{"transactions": [...]}} with one item per message and these keys:
+        - index: integer (the index of the message)
+        - amount: float
+        - currency: string (3-letter code, default INR)
+        - merchant_name: string (clean, title case)
+        - category: string (a category from the catalog below)
+        - sub_category: string (one of that category's sub-categories)
+        - account_type: string (SAVINGS, CREDIT_CARD, or CASH)
+        
+        Catalog (Category: Sub-category|...): {CATEGORY_CATALOG}
+        If unsure about category, use "Uncategorized".
+        If a message has no transaction, return its item with amount 0.
+        """
+
+    async def _post_completion(self, prompt: str) -> Optional[dict]:
+        """Send a prompt to Groq and return the decoded JSON content, or None on failure."""
+        headers = {
+            "Authorization": f"Bearer {settings.GROQ_API_KEY}",
+            "Content-Type": "application/json"
+        }
         payload = {
             "model": settings.GROQ_MODEL,
             "messages": [{"role": "user", "content": prompt}],
@@ -97,26 +432,42 @@ class SyncService:
             "temperature": 0.1
         }
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, headers=headers, json=payload, timeout=20.0)
-                
-            if response.status_code == 200:
-                extracted = response.json()['choices'][0]['message']['content']
-                data = json.loads(extracted)
-                
-                return {
-                    "amount": float(data.get("amount", 0)),
-                    "currency": data.get("currency", "INR"),
-                    "merchant_name": data.get("merchant_name", "UNKNOWN"),
-                    "category": data.get("category", Category.UNCATEGORIZED),
-                    "sub_category": data.get("sub_category", SubCategory.UNCATEGORIZED),
-                    "account_type": data.get("account_type", AccountType.SAVINGS)
-                }
-        except Exception as e:
-            logger.error(f"Groq API Error: {e}")
-            
-        return self._fallback_txn()
+        limiter = get_groq_rate_limiter()
+        for attempt in range(settings.GROQ_MAX_RETRIES + 1):
+            await limiter.acquire(estimate_tokens(prompt))
+            try:
+                client = get_http_client()
+                async with self.llm_slots:
+                    response = await client.post(settings.GROQ_API_URL, headers=headers, json=payload)
+                self.llm_stats["requests"] += 1
+
+                if response.status_code in (429, 503) and attempt < settings.GROQ_MAX_RETRIES:
+                    delay = backoff_delay(attempt, response.headers.get("retry-after"))
+                    logger.warning(f"Groq API returned {response.status_code}, retrying in {delay:.1f}s")
+                    self.llm_stats["rate_limited"] += 1
+                    limiter.pause(delay)
+                    continue
+
+                if response.status_code == 200:
+                    body = response.json()
+                    self.llm_stats["prompt_tokens"] += body.get("usage", {}).get("prompt_tokens", 0)
+                    return json.loads(body['choices'][0]['message']['content'])
+                logger.warning(f"Groq API returned {response.status_code}")
+            except Exception as e:
+                logger.error(f"Groq API Error: {e}")
+            break
+
+        return None
+
+    def _parse_extraction(self, data: dict) -> dict:
+        return {
+            "amount": float(data.get("amount", 0)),
+            "currency": data.get("currency", "INR"),
+            "merchant_name": data.get("merchant_name", "UNKNOWN"),
+            "category": data.get("category", Category.UNCATEGORIZED),
+            "sub_category": data.get("sub_category", SubCategory.UNCATEGORIZED),
+            "account_type": data.get("account_type", AccountType.SAVINGS)
+        }
 
     def _fallback_txn(self) -> dict:
         return {
@@ -128,112 +479,329 @@ class SyncService:
             "account_type": AccountType.SAVINGS
         }
 
-    async def fetch_gmail_changes(self, user_id: uuid.UUID, start_time: datetime = None) -> List[dict]:
-        """Fetch banking emails from Gmail."""
+    async def fetch_gmail_changes(self, user_id: uuid.UUID, start_time: datetime = None,
+                                  history_id: str = None) -> AsyncIterator[List[dict]]:
+        """
+        Yield pages of new banking emails, fetched without blocking the event loop.
+        Reads history.list deltas since history_id, falling back to a full search when the
+        history is unknown or expired. self.history_id is where the next sync should start.
+        """
+        self.history_id = history_id
+        gmail = await self._open_gmail(user_id)
+        if not gmail:
+            return
+        user, creds, service = gmail
+        token = creds.token
+
+        if history_id:
+            page_token = None
+            try:
+                while True:
+                    messages, page_token, latest = await run_blocking(
+                        history_page_blocking, service, history_id, page_token
+                    )
+                    token = await self._save_gmail_credentials(user, creds, token)
+                    yield messages
+                    if not page_token:
+                        self.history_id = latest
+                        return
+            except HttpError as e:
+                # Gmail keeps about a week of history; older ids come back 404
+                if e.resp.status != 404 or page_token:
+                    raise
+                logger.info(f"Gmail history {history_id} expired for {user_id}, running full search")
+
+        # Record the mailbox position before searching so mail arriving meanwhile is picked up next time
+        latest = await run_blocking(get_history_id_blocking, service)
+        if not start_time:
+            start_time = datetime.now(timezone.utc) - timedelta(days=settings.GMAIL_FULL_SYNC_LOOKBACK_DAYS)
+        query = f"{GMAIL_QUERY} after:{int(start_time.timestamp())}"
+        page_token = None
+        while True:
+            messages, page_token = await run_blocking(search_page_blocking, service, query, page_token)
+            token = await self._save_gmail_credentials(user, creds, token)
+            yield messages
+            if not page_token:
+                self.history_id = latest
+                return
+
+    async def _open_gmail(self, user_id: uuid.UUID) -> Optional[Tuple[User, Credentials, Any]]:
+        """The user's Gmail client, with credentials refreshed (and saved) if expired; None without Gmail access."""
         result = await self.db.execute(select(User).where(User.id == user_id))
         user = result.scalar_one_or_none()
-        
         if not user or not user.gmail_credentials:
-            return []
+            return None
 
+        creds = build_gmail_credentials(user.gmail_credentials)
+        if creds.expired and creds.refresh_token:
+            token = creds.token
+            await run_blocking(creds.refresh, GoogleRequest())
+            await self._save_gmail_credentials(user, creds, token)
+        service = await run_blocking(build_gmail_service, creds)
+        return user, creds, service
+
+    async def gmail_internal_dates(self, user_id: uuid.UUID, message_ids: List[str]) -> Dict[str, str]:
+        """
+        Gmail's internalDate of archived messages still in the user's mailbox. Archive headers
+        only date a message to the second, and the dedup hash needs Gmail's exact value to
+        match a Gmail sync of the same message. Empty without Gmail access or on errors.
+        """
+        if not message_ids or not settings.IMPORT_GMAIL_DATES:
+            return {}
         try:
-            creds_data = user.gmail_credentials
-            creds = Credentials(
-                token=creds_data.get('token'),
-                refresh_token=creds_data.get('refresh_token'),
-                token_uri="https://oauth2.googleapis.com/token",
-                client_id=settings.GOOGLE_CLIENT_ID,
-                client_secret=settings.GOOGLE_CLIENT_SECRET,
-                scopes=["https://www.googleapis.com/auth/gmail.readonly"]
-            )
-
-            if creds.expired and creds.refresh_token:
-                creds.refresh(GoogleRequest())
-                user.gmail_credentials = {
-                    "token": creds.token,
-                    "refresh_token": creds.refresh_token,
-                    "expiry": creds.expiry.isoformat() if creds.expiry else None
-                }
+            if self._gmail is None:
+                self._gmail = await self._open_gmail(user_id) or False
+            if not self._gmail:
+                return {}
+            user, creds, service = self._gmail
+            token = creds.token
+            dates = await run_blocking(get_internal_dates_blocking, service, message_ids)
+            await self._save_gmail_credentials(user, creds, token)
+            return dates
+        except Exception as e:
+            logger.warning(f"Gmail internalDate lookup failed for {len(message_ids)} messages, keeping archive dates: {e}")
+            return {}
+
+    async def _save_gmail_credentials(self, user: User, creds: Credentials, token: Optional[str]) -> Optional[str]:
+        """Persist credentials the client refreshed along the way; returns the current token."""
+        if creds.token != token:
+            async with self.db_lock:
+                user.gmail_credentials = serialize_gmail_credentials(creds)
                 await self.db.commit()
+        return creds.token
 
-            service = build('gmail', 'v1', credentials=creds)
-            query = "spent OR debited OR transaction OR alert OR paid"
-            if start_time:
-                query += f" after:{int(start_time.timestamp())}"
-            
-            results = service.users().messages().list(userId='me', q=query, maxResults=20).execute()
-            messages = results.get('messages', [])
-            
-            detailed_messages = []
-            for msg_meta in messages:
-                msg = service.users().messages().get(userId='me', id=msg_meta['id']).execute()
-                
-                body = ""
-                parts = msg['payload'].get('parts', [])
-                for part in parts:
-                    if part['mimeType'] == 'text/plain':
-                        data = part['body'].get('data')
-                        if data:
-                            body = base64.urlsafe_b64decode(data).decode()
-                            break
-                if not body:
-                    data = msg['payload']['body'].get('data')
-                    if data:
-                        body = base64.urlsafe_b64decode(data).decode()
-
-                detailed_messages.append({
-                    "id": msg['id'],
-                    "internalDate": msg['internalDate'],
-                    "snippet": msg['snippet'],
-                    "body": body
-                })
-            
-            return detailed_messages
+    async def execute_sync(self, user_id: uuid.UUID, source: str) -> bool:
+        """Run one Gmail sync for the user and record it in sync_logs. Returns whether it succeeded."""
+        return await self._run_sync(user_id, source, self._gmail_pages(user_id))
 
-        except Exception as e:
-            logger.error(f"Gmail Sync Error: {e}")
-            return []
+    async def ingest_messages(self, user_id: uuid.UUID, records: AsyncIterator[Tuple[int, Any, Optional[str]]]) -> dict:
+        """
+        Run pushed messages ((line, record, parse error) from iter_ndjson) through the sync
+        pipeline as they arrive. Returns one ack per record read: stored, duplicate, invalid,
+        or failed when the sync broke before the record was stored (resending it is safe).
+        A broken sync stops reading the body, so lines past `received` get no ack.
+        """
+        acks: List[dict] = []
+        pending: Dict[str, dict] = {}
+
+        def settle(hashes: List[str], status: str):
+            for content_hash in hashes:
+                pending[content_hash]["status"] = status
+
+        self.on_settled = settle
+        try:
+            success = await self._run_sync(user_id, PUSH_SOURCE, self._push_pages(records, acks, pending))
+        finally:
+            self.on_settled = None
+        for ack in acks:
+            if ack["status"] == "pending":
+                ack["status"] = "failed"
+        counts = Counter(ack["status"] for ack in acks)
+        return {
+            "status": "success" if success else "failed",
+            "received": len(acks),
+            **{name: counts[name] for name in ("stored", "duplicate", "invalid", "failed")},
+            "acks": acks
+        }
 
-    async def execute_sync(self, user_id: uuid.UUID, source: str):
+    async def import_messages(self, user_id: uuid.UUID, pages: AsyncIterator[List[dict]],
+                              on_settled: Callable[[List[str], str], None]) -> bool:
+        """Run already parsed and sanitized archive messages (see importer.py) through the sync pipeline."""
+        self.on_settled = on_settled
+        try:
+            return await self._run_sync(user_id, IMPORT_SOURCE, pages)
+        finally:
+            self.on_settled = None
+
+    async def _run_sync(self, user_id: uuid.UUID, source: str, pages: AsyncIterator[List[dict]]) -> bool:
+        self.llm_stats = new_llm_stats()
+        self.dedup_stats = new_dedup_stats()
+        self.persist_stats = {"inserted": 0, "skipped": 0}
+        self.template_hits = Counter()
+        self._matcher = None
         log = await self._log_start(user_id, source)
+        pipeline = None
         try:
-            start_time = await self._get_last_sync_time(user_id)
-            messages = await self.fetch_gmail_changes(user_id, start_time)
-            
-            processed_count = 0
-            for msg in messages:
-                dedup_payload = f"{msg['id']}:{msg['internalDate']}"
-                content_hash = hashlib.sha256(dedup_payload.encode()).hexdigest()
-                
-                if await self.txn_service.get_transaction_by_hash(content_hash):
-                    continue
-                
-                clean_text = self.sanitizer.sanitize(msg['body'] or msg['snippet'])
-                extracted = await self.call_brain_api(clean_text)
-                
-                mapping = await self.txn_service.get_merchant_mapping(extracted["merchant_name"])
-                cat, sub = extracted["category"], extracted["sub_category"]
-                
-                if mapping:
-                    cat, sub = mapping.default_category, mapping.default_sub_category
-                
-                await self.txn_service.create_transaction({
-                    "id": uuid.uuid4(),
-                    "user_id": user_id,
-                    "raw_content_hash": content_hash,
-                    "amount": extracted["amount"],
-                    "currency": extracted["currency"],
-                    "merchant_name": extracted["merchant_name"],
-                    "category": cat,
-                    "sub_category": sub,
-                    "status": TransactionStatus.PENDING,
-                    "account_type": extracted["account_type"],
-                    "remarks": f"Synced via {source}"
-                })
-                processed_count += 1
+            await self.dedup.prepare(self.db, user_id)
+            pipeline = self._build_pipeline(user_id, source, pages)
+            _active_pipelines[user_id] = pipeline
+            await pipeline.run()
+            await self.templates.record_hits(self.template_hits)
             
-            await self._log_end(log, "SUCCESS", processed_count)
+            logger.info(f"Sync LLM stats for {user_id}: {self.llm_stats}")
+            log.history_id_used = self.history_id
+            await self._log_end(log, "SUCCESS", self.persist_stats["inserted"], pipeline=pipeline)
+            return True
             
         except Exception as e:
             logger.error(f"Sync execution failed: {e}")
-            await self._log_end(log, "FAILED", 0, str(e))
+            await self.db.rollback()
+            await self._log_end(log, "FAILED", 0, str(e), pipeline=pipeline)
+            return False
+        except asyncio.CancelledError:
+            # Worker shutdown or a dropped request: close the log, then let the cancellation through
+            logger.warning(f"Sync for {user_id} cancelled")
+            try:
+                await self.db.rollback()
+                await self._log_end(log, "FAILED", 0, "Sync cancelled", pipeline=pipeline)
+            except Exception as e:
+                logger.error(f"Could not record cancelled sync for {user_id}: {e}")
+            raise
+        finally:
+            if _active_pipelines.get(user_id) is pipeline:
+                del _active_pipelines[user_id]
+
+    def _build_pipeline(self, user_id: uuid.UUID, source: str, pages: AsyncIterator[List[dict]]) -> Pipeline:
+        """fetch -> dedup -> sanitize -> window -> extract -> categorize -> persist, one chunk of emails per item."""
+        queue_size = settings.SYNC_QUEUE_SIZE
+        # Chunks are numbered in fetch order; extraction finishes them out of order,
+        # so persist takes them back in sequence and stores transactions deterministically
+        order = {"page": 0, "chunk": 0, "turn": asyncio.Condition()}
+        return (
+            Pipeline(f"sync:{user_id}", self._wrap_pages(pages), weight=lambda chunk: len(chunk["messages"]))
+            .stage("dedup", lambda page: self._dedup_page(user_id, page, order), settings.SYNC_DEDUP_CONCURRENCY, queue_size, fan_out=True)
+            .stage("sanitize", self._sanitize_chunk, settings.SYNC_SANITIZE_CONCURRENCY, queue_size)
+            .stage("window", self._window_chunk, settings.SYNC_SANITIZE_CONCURRENCY, queue_size)
+            .stage("extract", lambda chunk: self._extract_chunk(user_id, chunk), settings.EXTRACTION_CONCURRENCY, queue_size)
+            .stage("categorize", self._categorize_chunk, settings.SYNC_CATEGORIZE_CONCURRENCY, queue_size)
+            .stage("persist", lambda chunk: self._persist_chunk(user_id, source, chunk), settings.SYNC_PERSIST_CONCURRENCY, queue_size,
+                   ordered_by=lambda chunk: chunk["seq"], window=settings.SYNC_REORDER_WINDOW, numbered_in="dedup")
+        )
+
+    async def _gmail_pages(self, user_id: uuid.UUID) -> AsyncIterator[List[dict]]:
+        async with self.db_lock:
+            start_time, history_id = await self._get_sync_checkpoint(user_id)
+        async for page in self.fetch_gmail_changes(user_id, start_time, history_id):
+            yield page
+
+    async def _push_pages(self, records: AsyncIterator[Tuple[int, Any, Optional[str]]],
+                          acks: List[dict], pending: Dict[str, dict]) -> AsyncIterator[List[dict]]:
+        """Validate pushed records, ack the rejects right away and page the rest into the pipeline."""
+        page = []
+        async for line, record, error in records:
+            msg = None
+            if not error:
+                msg, error = parse_pushed_message(record)
+            ack = {"line": line, "id": record.get("id") if isinstance(record, dict) else None}
+            acks.append(ack)
+            if error:
+                ack.update(status="invalid", error=error)
+                continue
+            content_hash = message_hash(msg)
+            if content_hash in pending:
+                ack["status"] = "duplicate"
+                continue
+            ack["status"] = "pending"
+            pending[content_hash] = ack
+            page.append(msg)
+            if len(page) >= settings.INGEST_PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _settle(self, hashes: List[str], status: str):
+        if self.on_settled and hashes:
+            self.on_settled(hashes, status)
+
+    async def _wrap_pages(self, pages: AsyncIterator[List[dict]]) -> AsyncIterator[dict]:
+        seq = 0
+        async for messages in pages:
+            if messages:
+                yield {"messages": messages, "seq": seq}
+                seq += 1
+
+    # Stages that only touch the database use a session of their own per chunk,
+    # so they run alongside extraction, which holds self.db for the cache.
+
+    async def _dedup_page(self, user_id: uuid.UUID, page: dict, order: dict) -> List[dict]:
+        """Drop already-stored emails from a whole page at once, then split it into numbered chunks."""
+        hashes = [message_hash(msg) for msg in page["messages"]]
+        async with AsyncSessionLocal() as db:
+            new = await self.dedup.new_hashes(db, user_id, hashes, self.dedup_stats)
+        self._settle([content_hash for content_hash in hashes if content_hash not in new], "duplicate")
+
+        kept = [(msg, content_hash) for msg, content_hash in zip(page["messages"], hashes) if content_hash in new]
+        # One chunk fills one Groq batch request
+        size = max(1, settings.EXTRACTION_BATCH_SIZE)
+        chunks = [
+            {"messages": [msg for msg, _ in kept[start:start + size]],
+             "hashes": [content_hash for _, content_hash in kept[start:start + size]]}
+            for start in range(0, len(kept), size)
+        ]
+        # Pages may finish dedup out of order; number their chunks in page order, without gaps
+        async with order["turn"]:
+            await order["turn"].wait_for(lambda: order["page"] == page["seq"])
+            for chunk in chunks:
+                chunk["seq"] = order["chunk"]
+                order["chunk"] += 1
+            order["page"] += 1
+            order["turn"].notify_all()
+        return chunks
+
+    async def _sanitize_chunk(self, chunk: dict) -> dict:
+        # Imported messages arrive sanitized already (done in the importer's process pool)
+        cleaned = iter(self.sanitizer.sanitize_many(
+            msg['body'] or msg['snippet'] for msg in chunk["messages"] if "clean_text" not in msg
+        ))
+        chunk["clean_texts"] = [
+            msg["clean_text"] if "clean_text" in msg else next(cleaned)
+            for msg in chunk["messages"]
+        ]
+        return chunk
+
+    async def _window_chunk(self, chunk: dict) -> dict:
+        # Templates still see the whole text; the LLM only gets the part that looks like the transaction
+        if settings.LLM_WINDOW_ENABLED:
+            chunk["llm_texts"] = [relevant_window(text) for text in chunk["clean_texts"]]
+        return chunk
+
+    async def _extract_chunk(self, user_id: uuid.UUID, chunk: dict) -> dict:
+        chunk["extracted"] = await self.extract_transactions(user_id, chunk["clean_texts"], chunk.get("llm_texts"))
+        return chunk
+
+    async def _categorize_chunk(self, chunk: dict) -> dict:
+        async with AsyncSessionLocal() as db:
+            txn_service = TransactionService(db)
+            mappings = await txn_service.match_merchant_mappings([extracted["merchant_name"] for extracted in chunk["extracted"]])
+            for extracted in chunk["extracted"]:
+                mapping = mappings.get(extracted["merchant_name"])
+                if mapping:
+                    extracted["category"] = mapping.default_category
+                    extracted["sub_category"] = mapping.default_sub_category
+        return chunk
+
+    async def _persist_chunk(self, user_id: uuid.UUID, source: str, chunk: dict) -> dict:
+        """Store a chunk with one multi-row insert and one commit."""
+        rows, samples = [], []
+        for content_hash, clean_text, extracted in zip(chunk["hashes"], chunk["clean_texts"], chunk["extracted"]):
+            txn_id = uuid.uuid4()
+            rows.append({
+                "id": txn_id,
+                "user_id": user_id,
+                "raw_content_hash": content_hash,
+                "amount": extracted["amount"],
+                "currency": extracted["currency"],
+                "merchant_name": extracted["merchant_name"],
+                "category": extracted["category"],
+                "sub_category": extracted["sub_category"],
+                "status": TransactionStatus.PENDING,
+                "account_type": extracted["account_type"],
+                "remarks": f"Synced via {source}"
+            })
+            if extracted["source"] == "llm":
+                samples.append({"transaction_id": txn_id, "user_id": user_id, "clean_text": clean_text})
+
+        async with AsyncSessionLocal() as db:
+            inserted = await TransactionService(db).create_transactions_bulk(rows, commit=False)
+            # Rows that lost the race to a concurrent sync have no transaction to attach a sample to
+            await TemplateService(db).add_samples([sample for sample in samples if sample["transaction_id"] in inserted])
+            await db.commit()
+
+        inserted_hashes = {row["raw_content_hash"] for row in rows if row["id"] in inserted}
+        self._settle(list(inserted_hashes), "stored")
+        self._settle([content_hash for content_hash in chunk["hashes"] if content_hash not in inserted_hashes], "duplicate")
+        self.persist_stats["inserted"] += len(inserted)
+        self.persist_stats["skipped"] += len(rows) - len(inserted)
+        self.dedup.add(user_id, chunk["hashes"])
+        return chunk
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Optional, Set
+
+from app.core.database import AsyncSessionLocal
+from app.core.config import get_settings
+from app.core.http_client import close_http_client
+from app.core.executor import shutdown_executor
+from app.features.sync.jobs import SyncJobService
+from app.features.sync.scheduler import SyncScheduler
+from app.features.sync.models import SyncJob
+from app.features.sync.service import SyncService
+from app.features.transactions.service import TransactionService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class SyncWorker:
+    """Leases jobs from sync_jobs and runs up to `concurrency` syncs at a time."""
+    def __init__(self, concurrency: int = None, poll_seconds: float = None):
+        self.concurrency = max(1, concurrency or settings.SYNC_WORKER_CONCURRENCY)
+        self.poll_seconds = poll_seconds or settings.SYNC_WORKER_POLL_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: Set[asyncio.Task] = set()
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        logger.info(f"Sync worker {self.worker_id} started (concurrency {self.concurrency})")
+        try:
+            while not stop.is_set():
+                job = None
+                if len(self._running) < self.concurrency:
+                    try:
+                        async with AsyncSessionLocal() as db:
+                            jobs = SyncJobService(db)
+                            await jobs.requeue_expired()
+                            job = await jobs.lease(self.worker_id)
+                    except Exception as e:
+                        logger.error(f"Sync worker failed to lease a job: {e}")
+                if job:
+                    task = asyncio.create_task(self._run_job(job))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+                    continue
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Unfinished jobs keep their lease and are requeued once it expires
+            for task in self._running:
+                task.cancel()
+            await asyncio.gather(*self._running, return_exceptions=True)
+            logger.info(f"Sync worker {self.worker_id} stopped")
+
+    async def _run_job(self, job: SyncJob):
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        success, error, tokens = False, None, None
+        try:
+            async with AsyncSessionLocal() as db:
+                service = SyncService(db=db, transaction_service=TransactionService(db))
+                success = await service.execute_sync(job.user_id, job.trigger_source)
+                tokens = service.llm_stats["prompt_tokens"]
+            if not success:
+                error = "Sync failed, see sync_logs"
+        except Exception as e:
+            logger.error(f"Sync job {job.id} crashed: {e}")
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+
+        async with AsyncSessionLocal() as db:
+            await SyncJobService(db).complete(job, success, error, tokens)
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(settings.SYNC_JOB_LEASE_SECONDS / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await SyncJobService(db).heartbeat(job_id, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat for sync job {job_id} failed: {e}")
+
+async def run_worker():
+    """Standalone entry point: `uv run worker.py`."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    tasks = [SyncWorker().run(stop)]
+    if settings.SYNC_SCHEDULER_ENABLED:
+        tasks.append(SyncScheduler().run(stop))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await close_http_client()
+        shutdown_executor()
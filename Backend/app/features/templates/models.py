@@ -0,0 +1,31 @@
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, UniqueConstraint, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ExtractionTemplate(Base):
+    __tablename__ = "extraction_templates"
+    __table_args__ = (UniqueConstraint("user_id", "pattern"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), index=True)
+    pattern: Mapped[str] = mapped_column(Text) # Regex with named groups: amount, merchant
+    anchor: Mapped[str] = mapped_column(String) # Literal that must appear in the text, checked before the regex
+    account_type: Mapped[str] = mapped_column(String)
+    confirmations: Mapped[int] = mapped_column(Integer, default=1)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+class TemplateSample(Base):
+    __tablename__ = "template_samples"
+    __table_args__ = (Index("ix_template_samples_user_created", "user_id", "created_at"),)
+
+    # Sanitized text of an LLM-extracted transaction, kept until the user verifies or rejects it
+    # (or it ages out: TEMPLATE_SAMPLES_PER_USER, TEMPLATE_SAMPLE_TTL_DAYS)
+    transaction_id: Mapped[UUID] = mapped_column(ForeignKey("transactions.id"), primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    clean_text: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
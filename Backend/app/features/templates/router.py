@@ -0,0 +1,27 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.core.config import get_settings
+from app.features.auth.deps import get_current_user
+from app.features.auth.models import User
+from app.features.templates.service import TemplateService
+
+settings = get_settings()
+router = APIRouter()
+
+@router.get("/stats")
+async def get_template_stats(
+    current_user: Annotated[User, Depends(get_current_user)],
+    service: Annotated[TemplateService, Depends()]
+):
+    """Coverage of learned extraction templates over recent syncs, and per-template hit rates."""
+    return await service.get_stats(current_user.id)
+
+@router.get("/stats/global")
+async def get_global_template_stats(
+    service: Annotated[TemplateService, Depends()],
+    x_pfie_secret: Annotated[str | None, Header()] = None
+):
+    """Operators only (X-PFIE-Secret): template counts and coverage across all users."""
+    if not settings.PFIE_SECRET or x_pfie_secret != settings.PFIE_SECRET:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return await service.get_global_stats()
@@ -0,0 +1,328 @@
+import re
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
+
+from app.core.database import get_db
+from app.core.config import get_settings
+from app.features.templates.models import ExtractionTemplate, TemplateSample
+from app.features.transactions.enums import Category, SubCategory
+from app.features.sync.models import SyncLog
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+LITERAL_SPLIT = re.compile(r'(\d[\d,.]*|\s+)')
+MONTHS = {"jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+          "january", "february", "march", "april", "june", "july", "august", "september",
+          "october", "november", "december"}
+WORD = re.compile(r'([A-Za-z]+)')
+
+AMOUNT_GROUP = r'(?P<amount>\d[\d,]*(?:\.\d+)?)'
+MERCHANT_GROUP = r'(?P<merchant>[^\n]{1,80}?)'
+# A merchant at the very end of the window runs to the end of its line
+MERCHANT_LAST = r'(?P<merchant>[^\n]{1,80}?)(?=[.,;]?[ \t]*(?:\n|$))'
+CONTEXT_CHARS = 60
+MIN_ANCHOR_LENGTH = 4
+
+def _generalize(literal: str) -> Tuple[str, List[str]]:
+    """Escape literal text, letting digits, whitespace and month names vary between emails."""
+    pattern, words = [], []
+    for part in LITERAL_SPLIT.split(literal):
+        if not part:
+            continue
+        if part[0].isdigit():
+            pattern.append(r'[\d,.]+')
+        elif part.isspace():
+            pattern.append(r'\s+')
+        else:
+            for word in WORD.split(part):
+                if not word:
+                    continue
+                if word.lower() in MONTHS:
+                    pattern.append(r'[A-Za-z]{3,9}')
+                else:
+                    pattern.append(re.escape(word))
+                    words.append(word)
+    return "".join(pattern), words
+
+def _find_amount(text: str, amount: Decimal) -> Optional[Tuple[int, int]]:
+    for match in NUMBER.finditer(text):
+        try:
+            if Decimal(match.group().replace(",", "")) == amount:
+                return match.span()
+        except InvalidOperation:
+            continue
+    return None
+
+def _find_merchant(text: str, names: Iterable[Optional[str]], avoid: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    lowered = text.lower()
+    for name in names:
+        if not name or len(name.strip()) < 2:
+            continue
+        start = lowered.find(name.strip().lower())
+        while start != -1:
+            end = start + len(name.strip())
+            if end <= avoid[0] or start >= avoid[1]:
+                return start, end
+            start = lowered.find(name.strip().lower(), start + 1)
+    return None
+
+def build_template(clean_text: str, amount: Decimal, merchant_names: Iterable[Optional[str]]) -> Optional[Tuple[str, str]]:
+    """
+    Learn a (pattern, anchor) pair from a sanitized email whose amount and merchant were confirmed.
+    Returns None when the fields can't be located or the surrounding wording is too generic.
+    """
+    amount_span = _find_amount(clean_text, Decimal(str(amount)))
+    if not amount_span:
+        return None
+    merchant_span = _find_merchant(clean_text, merchant_names, amount_span)
+    if not merchant_span:
+        return None
+
+    first, second = sorted([(amount_span, "amount"), (merchant_span, "merchant")])
+    start, end = first[0][0], second[0][1]
+
+    # Keep a little context around the fields, cut at line and word boundaries
+    left = max(clean_text.rfind("\n", 0, start) + 1, start - CONTEXT_CHARS)
+    while left < start and left > 0 and not clean_text[left - 1].isspace():
+        left += 1
+    right = clean_text.find("\n", end)
+    right = min(len(clean_text) if right == -1 else right, end + CONTEXT_CHARS)
+    while right > end and right < len(clean_text) and not clean_text[right].isspace():
+        right -= 1
+
+    pieces = [
+        clean_text[left:first[0][0]],
+        first[1],
+        clean_text[first[0][1]:second[0][0]],
+        second[1],
+        clean_text[second[0][1]:right],
+    ]
+    pattern, words = [], []
+    for index, piece in enumerate(pieces):
+        if piece == "amount":
+            pattern.append(AMOUNT_GROUP)
+        elif piece == "merchant":
+            pattern.append(MERCHANT_LAST if index == 3 and not pieces[4].strip() else MERCHANT_GROUP)
+        else:
+            literal, literal_words = _generalize(piece)
+            pattern.append(literal)
+            words.extend(literal_words)
+
+    anchor = max(words, key=len, default="")
+    if len(anchor) < MIN_ANCHOR_LENGTH:
+        return None
+
+    pattern = "".join(pattern)
+    # The template has to reproduce the confirmed fields on its own sample
+    extracted = TemplateMatcher([(0, anchor, pattern, "")]).match(clean_text)
+    if not extracted or Decimal(str(extracted[1]["amount"])) != Decimal(str(amount)):
+        return None
+    return pattern, anchor
+
+class TemplateMatcher:
+    """In-process matcher over a user's templates; cheap anchor checks run before any regex."""
+    def __init__(self, templates: Iterable[Tuple[int, str, str, str]]):
+        self.templates = [
+            (template_id, anchor, re.compile(pattern), account_type)
+            for template_id, anchor, pattern, account_type in templates
+        ]
+
+    def match(self, text: str) -> Optional[Tuple[int, dict]]:
+        for template_id, anchor, regex, account_type in self.templates:
+            if anchor not in text:
+                continue
+            found = regex.search(text)
+            if not found:
+                continue
+            try:
+                amount = float(found.group("amount").replace(",", ""))
+            except ValueError:
+                continue
+            merchant = found.group("merchant").strip()
+            if amount <= 0 or not merchant:
+                continue
+            return template_id, {
+                "amount": amount,
+                "currency": "INR",
+                "merchant_name": merchant,
+                "category": Category.UNCATEGORIZED,
+                "sub_category": SubCategory.UNCATEGORIZED,
+                "account_type": account_type
+            }
+        return None
+
+class TemplateService:
+    def __init__(self, db: AsyncSession = Depends(get_db)):
+        self.db = db
+
+    async def load_matcher(self, user_id: UUID) -> TemplateMatcher:
+        stmt = (
+            select(ExtractionTemplate)
+            .where(ExtractionTemplate.user_id == user_id)
+            # A template learned from a single email may have caught wording specific to it
+            .where(ExtractionTemplate.confirmations >= settings.TEMPLATE_MIN_CONFIRMATIONS)
+            .order_by(ExtractionTemplate.hits.desc(), ExtractionTemplate.confirmations.desc())
+        )
+        result = await self.db.execute(stmt)
+        return TemplateMatcher(
+            (t.id, t.anchor, t.pattern, t.account_type) for t in result.scalars().all()
+        )
+
+    async def record_hits(self, hits: Counter):
+        if not hits:
+            return
+        now = datetime.now(timezone.utc)
+        for template_id, count in hits.items():
+            await self.db.execute(
+                update(ExtractionTemplate)
+                .where(ExtractionTemplate.id == template_id)
+                .values(hits=ExtractionTemplate.hits + count, last_hit_at=now)
+            )
+        await self.db.commit()
+
+    async def add_samples(self, samples: List[dict]):
+        """Keep sanitized texts of LLM-extracted transactions so verification can learn from them. The caller commits."""
+        if not samples:
+            return
+        await self.db.execute(insert(TemplateSample).values(samples).on_conflict_do_nothing())
+        for user_id in {sample["user_id"] for sample in samples}:
+            await self._trim_samples(user_id)
+
+    async def _trim_samples(self, user_id: UUID):
+        # Drop samples past the TTL and beyond the newest TEMPLATE_SAMPLES_PER_USER
+        created_at = TemplateSample.created_at
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.TEMPLATE_SAMPLE_TTL_DAYS)
+        oldest_kept = await self.db.scalar(
+            select(created_at)
+            .where(TemplateSample.user_id == user_id)
+            .order_by(created_at.desc())
+            .offset(settings.TEMPLATE_SAMPLES_PER_USER - 1)
+            .limit(1)
+        )
+        if oldest_kept is not None:
+            cutoff = max(cutoff, oldest_kept)
+        await self.db.execute(
+            delete(TemplateSample).where(TemplateSample.user_id == user_id, created_at < cutoff)
+        )
+
+    async def learn(self, txn, raw_merchant: Optional[str]):
+        """Turn a verified transaction's sample into a template. The caller commits."""
+        sample = await self.db.get(TemplateSample, txn.id)
+        if not sample:
+            return
+        await self.db.delete(sample)
+
+        count = await self.db.scalar(
+            select(func.count()).select_from(ExtractionTemplate).where(ExtractionTemplate.user_id == txn.user_id)
+        )
+        if count >= settings.TEMPLATE_MAX_PER_USER:
+            return
+
+        built = build_template(sample.clean_text, txn.amount, [raw_merchant, txn.merchant_name])
+        if not built:
+            return
+        pattern, anchor = built
+        stmt = insert(ExtractionTemplate).values(
+            user_id=txn.user_id,
+            pattern=pattern,
+            anchor=anchor,
+            account_type=txn.account_type
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ExtractionTemplate.user_id, ExtractionTemplate.pattern],
+            set_={
+                "confirmations": ExtractionTemplate.confirmations + 1,
+                "account_type": stmt.excluded.account_type
+            }
+        )
+        await self.db.execute(stmt)
+        logger.info(f"Learned extraction template for user {txn.user_id}")
+
+    async def discard_sample(self, transaction_id: UUID):
+        sample = await self.db.get(TemplateSample, transaction_id)
+        if sample:
+            await self.db.delete(sample)
+
+    async def get_stats(self, user_id: UUID, recent_syncs: int = 50) -> dict:
+        result = await self.db.execute(
+            select(ExtractionTemplate)
+            .where(ExtractionTemplate.user_id == user_id)
+            .order_by(ExtractionTemplate.hits.desc())
+        )
+        templates = result.scalars().all()
+        total_hits = sum(t.hits for t in templates)
+
+        matched, missed = await self._recent_coverage(recent_syncs, SyncLog.user_id == user_id)
+
+        return {
+            "template_count": len(templates),
+            "coverage": round(matched / (matched + missed), 4) if matched + missed else 0.0,
+            "recent_emails": matched + missed,
+            "templates": [
+                {
+                    "id": t.id,
+                    "account_type": t.account_type,
+                    "confirmations": t.confirmations,
+                    "active": t.confirmations >= settings.TEMPLATE_MIN_CONFIRMATIONS,
+                    "hits": t.hits,
+                    "hit_share": round(t.hits / total_hits, 4) if total_hits else 0.0,
+                    "last_hit_at": t.last_hit_at,
+                }
+                for t in templates
+            ]
+        }
+
+    async def get_global_stats(self, recent_syncs: int = 500) -> dict:
+        """Template counts and coverage across all users; no patterns, they are learned from users' emails."""
+        active = ExtractionTemplate.confirmations >= settings.TEMPLATE_MIN_CONFIRMATIONS
+        result = await self.db.execute(
+            select(
+                ExtractionTemplate.account_type,
+                func.count(),
+                func.count().filter(active),
+                func.coalesce(func.sum(ExtractionTemplate.hits), 0),
+            )
+            .group_by(ExtractionTemplate.account_type)
+            .order_by(ExtractionTemplate.account_type)
+        )
+        by_account_type = [
+            {"account_type": account_type, "templates": count, "active": active_count, "hits": hits}
+            for account_type, count, active_count, hits in result.all()
+        ]
+        users = await self.db.scalar(select(func.count(func.distinct(ExtractionTemplate.user_id))))
+        matched, missed = await self._recent_coverage(recent_syncs)
+
+        return {
+            "template_count": sum(row["templates"] for row in by_account_type),
+            "active_count": sum(row["active"] for row in by_account_type),
+            "users_with_templates": users,
+            "hits": sum(row["hits"] for row in by_account_type),
+            "coverage": round(matched / (matched + missed), 4) if matched + missed else 0.0,
+            "recent_emails": matched + missed,
+            "by_account_type": by_account_type,
+        }
+
+    async def _recent_coverage(self, recent_syncs: int, *conditions) -> Tuple[int, int]:
+        """Emails matched and missed by templates over the most recent successful syncs."""
+        logs = await self.db.execute(
+            select(SyncLog.stats)
+            .where(SyncLog.status == "SUCCESS", *conditions)
+            .order_by(SyncLog.start_time.desc())
+            .limit(recent_syncs)
+        )
+        matched = missed = 0
+        for stats in logs.scalars().all():
+            llm = (stats or {}).get("llm", {})
+            matched += llm.get("template_hits", 0)
+            missed += llm.get("template_misses", 0)
+        return matched, missed
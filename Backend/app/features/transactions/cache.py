@@ -0,0 +1,122 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.features.transactions.models import MerchantMapping, CacheVersion
+from app.features.transactions.merchants import MerchantIndex
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = "merchant_mappings"
+
+class MerchantMappingCache:
+    """
+    Read-through LRU/TTL cache of merchant_mappings rows, including misses.
+    Writers bump a row in cache_versions; every worker compares it against the
+    version it loaded from (at most every MERCHANT_CACHE_VERSION_CHECK_SECONDS)
+    and drops everything when another worker has written.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: int, version_check_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        # name -> (expires_at, detached MerchantMapping or None when there is no mapping)
+        self._entries: OrderedDict[str, tuple[float, Optional[MerchantMapping]]] = OrderedDict()
+        self._index: Optional[MerchantIndex] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    async def get_many(self, db: AsyncSession, names: Iterable[str]) -> Dict[str, MerchantMapping]:
+        await self._check_version(db)
+        found = {}
+        missing = []
+        now = time.monotonic()
+        for name in set(n for n in names if n):
+            entry = self._entries.get(name)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(name)
+                if entry[1] is not None:
+                    found[name] = entry[1]
+                self.stats["hits"] += 1
+            else:
+                missing.append(name)
+
+        if missing:
+            result = await db.execute(select(MerchantMapping).where(MerchantMapping.raw_merchant.in_(missing)))
+            rows = {row.raw_merchant: row for row in result.scalars().all()}
+            for name in missing:
+                row = rows.get(name)
+                if row is not None:
+                    db.expunge(row)
+                    found[name] = row
+                self._remember(name, row)
+            self.stats["misses"] += len(missing)
+
+        return found
+
+    async def get_index(self, db: AsyncSession) -> MerchantIndex:
+        """Trigram index over every known raw_merchant, rebuilt whenever the version moves."""
+        await self._check_version(db)
+        if self._index is None:
+            result = await db.execute(select(MerchantMapping.raw_merchant))
+            self._index = MerchantIndex(result.scalars().all())
+        return self._index
+
+    def _remember(self, name: str, mapping: Optional[MerchantMapping]):
+        self._entries[name] = (time.monotonic() + self.ttl_seconds, mapping)
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _check_version(self, db: AsyncSession):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.version_check_seconds:
+            return
+        version = await db.scalar(select(CacheVersion.version).where(CacheVersion.name == VERSION_NAME)) or 0
+        if version != self._version:
+            self._entries.clear()
+            self._index = None
+            self._version = version
+        self._checked_at = now
+
+    async def bump_version(self, db: AsyncSession) -> int:
+        """Mark mappings as changed for every worker. Runs inside the writer's transaction."""
+        stmt = insert(CacheVersion).values(name=VERSION_NAME, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CacheVersion.name],
+            set_={"version": CacheVersion.version + 1}
+        ).returning(CacheVersion.version)
+        return await db.scalar(stmt)
+
+    def invalidate(self, names: Iterable[str], version: int):
+        """Write-through after a committed change; keep the rest if ours was the only write since loading."""
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+            for name in names:
+                self._entries.pop(name, None)
+                if self._index is not None:
+                    self._index.add(name)
+        else:
+            self._entries.clear()
+            self._index = None
+            self._version = None
+        self.stats["invalidations"] += 1
+
+_merchant_cache = None
+
+def get_merchant_mapping_cache() -> MerchantMappingCache:
+    global _merchant_cache
+    if _merchant_cache is None:
+        _merchant_cache = MerchantMappingCache(
+            max_entries=settings.MERCHANT_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.MERCHANT_CACHE_TTL_SECONDS,
+            version_check_seconds=settings.MERCHANT_CACHE_VERSION_CHECK_SECONDS,
+        )
+    return _merchant_cache
@@ -0,0 +1,80 @@
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NON_WORD = re.compile(r'[^a-z0-9]+')
+# Legal/corporate noise LLMs tack on to merchant names ("SWIGGY LTD", "Zomato Pvt. Ltd.")
+SUFFIXES = {
+    "ltd", "limited", "pvt", "private", "inc", "llp", "llc", "co", "corp", "corporation",
+    "company", "india", "in", "the", "technologies", "tech", "services", "retail", "online", "www", "com",
+}
+
+def normalize_merchant(name: Optional[str]) -> str:
+    """Canonical key for a merchant name: lowercase words without punctuation or corporate suffixes."""
+    if not name:
+        return ""
+    words = NON_WORD.sub(" ", name.lower()).split()
+    kept = [word for word in words if word not in SUFFIXES]
+    # A name made only of suffix words ("The Company") keeps them rather than becoming empty
+    return " ".join(kept or words)
+
+def trigrams(key: str) -> Set[str]:
+    """Word-padded character trigrams, as pg_trgm builds them."""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class MerchantIndex:
+    """
+    Nearest-match lookup over known raw_merchant values: exact canonical key first,
+    then Dice similarity on trigrams via an inverted index, so only merchants sharing
+    at least one trigram with the query are ever scored.
+    """
+    def __init__(self, names: Iterable[str] = ()):
+        self._by_key: Dict[str, str] = {}
+        self._keys: List[str] = []
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, raw_merchant: str):
+        key = normalize_merchant(raw_merchant)
+        if not key or key in self._by_key:
+            return
+        self._by_key[key] = raw_merchant
+        key_id = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings[gram].append(key_id)
+
+    def lookup(self, name: str, threshold: float) -> Optional[Tuple[str, float]]:
+        """Best (raw_merchant, score) with score >= threshold, or None."""
+        key = normalize_merchant(name)
+        if not key:
+            return None
+        if key in self._by_key:
+            return self._by_key[key], 1.0
+
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        if not shared:
+            return None
+
+        best_id, best_score = None, 0.0
+        for key_id, count in shared.items():
+            score = 2 * count / (len(grams) + self._sizes[key_id])
+            if score > best_score:
+                best_id, best_score = key_id, score
+        if best_score < threshold:
+            return None
+        return self._by_key[self._keys[best_id]], round(best_score, 4)
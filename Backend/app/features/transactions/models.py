@@ -1,7 +1,7 @@
 import uuid
 from decimal import Decimal
 from typing import List, Optional
-from sqlalchemy import String, ForeignKey, Numeric, ARRAY, Text, DateTime
+from sqlalchemy import String, ForeignKey, Numeric, ARRAY, Text, DateTime, BigInteger, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -27,6 +27,17 @@ class Transaction(Base):
 
     user: Mapped["User"] = relationship()
 
+    # Keep in sync with migrations/versions (production doesn't run create_all)
+    __table_args__ = (
+        # Per-user time ranges (dedup top-ups, rollup rebuilds, analytics); the hash rides along for index-only dedup loads
+        Index("ix_transactions_user_created", "user_id", "created_at", postgresql_include=["raw_content_hash"]),
+        # The review queue is a small, hot slice of the table
+        Index(
+            "ix_transactions_pending_user_created", "user_id", text("created_at DESC"),
+            postgresql_where=text("status = 'PENDING'"), sqlite_where=text("status = 'PENDING'")
+        ),
+    )
+
 class MerchantMapping(Base):
     __tablename__ = "merchant_mappings"
 
@@ -34,3 +45,10 @@ class MerchantMapping(Base):
     display_name: Mapped[str] = mapped_column(String)
     default_category: Mapped[Category] = mapped_column(String)
     default_sub_category: Mapped[SubCategory] = mapped_column(String)
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    # Bumped on every write to a cached table so other workers drop stale entries
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
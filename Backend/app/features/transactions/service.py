@@ -1,25 +1,36 @@
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from fastapi import HTTPException
 from fastapi import Depends
 from app.features.transactions.models import Transaction, MerchantMapping
 from app.features.transactions import schemas
 from app.features.transactions.enums import TransactionStatus
+from app.features.templates.service import TemplateService
+from app.features.transactions.cache import get_merchant_mapping_cache
+from app.features.dashboard.rollups import apply_to_rollups
+from app.features.dashboard.cache import get_dashboard_cache
 from app.core.database import get_db
+from app.core.config import get_settings
 import logging
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
 class TransactionService:
     def __init__(self, db: AsyncSession = Depends(get_db)):
         self.db = db
+        self.templates = TemplateService(db)
+        self.mapping_cache = get_merchant_mapping_cache()
+        self.dashboard_cache = get_dashboard_cache()
 
     async def get_pending_transactions(self, user_id: UUID, skip: int = 0, limit: int = 100) -> List[Transaction]:
         stmt = (
             select(Transaction)
             .where(Transaction.user_id == user_id)
             .where(Transaction.status == TransactionStatus.PENDING)
+            .order_by(Transaction.created_at.desc())
             .offset(skip)
             .limit(limit)
         )
@@ -36,10 +47,18 @@ class TransactionService:
 
         if not verification.approved:
             txn.status = TransactionStatus.REJECTED
+            await self.templates.discard_sample(txn.id)
         else:
+            recategorized = (txn.category, txn.sub_category) != (verification.category, verification.sub_category)
+            if recategorized:
+                await apply_to_rollups(self.db, [txn.id], sign=-1)
             txn.status = TransactionStatus.VERIFIED
             txn.category = verification.category
             txn.sub_category = verification.sub_category
+            if recategorized:
+                await self.db.flush()
+                await apply_to_rollups(self.db, [txn.id])
+                await self.dashboard_cache.bump(self.db, [user_id])
             
             raw_merchant_key = txn.merchant_name 
             txn.merchant_name = verification.merchant_name
@@ -59,27 +78,88 @@ class TransactionService:
                      default_category=verification.category,
                      default_sub_category=verification.sub_category
                  ))
+            
+            mapping_version = await self.mapping_cache.bump_version(self.db)
+            
+            # The confirmed fields teach a template for this email's wording
+            await self.templates.learn(txn, raw_merchant_key)
                  
         await self.db.commit()
+        if verification.approved:
+            self.mapping_cache.invalidate([raw_merchant_key or "UNKNOWN"], mapping_version)
         await self.db.refresh(txn)
         return txn
 
     async def get_merchant_mapping(self, raw_merchant: str) -> Optional[MerchantMapping]:
-        stmt = select(MerchantMapping).where(MerchantMapping.raw_merchant == raw_merchant)
-        result = await self.db.execute(stmt)
-        return result.scalar_one_or_none()
+        mappings = await self.get_merchant_mappings([raw_merchant])
+        return mappings.get(raw_merchant)
+
+    async def get_merchant_mappings(self, raw_merchants: List[str]) -> Dict[str, MerchantMapping]:
+        """Mappings for many merchants at once, served from the process cache where possible."""
+        return await self.mapping_cache.get_many(self.db, raw_merchants)
+
+    async def match_merchant_mappings(self, raw_merchants: List[str]) -> Dict[str, MerchantMapping]:
+        """Exact mappings first; the rest take the nearest known merchant by normalized name."""
+        found = await self.get_merchant_mappings(raw_merchants)
+        unmatched = {name for name in raw_merchants if name and name not in found}
+        if not unmatched:
+            return found
+
+        index = await self.mapping_cache.get_index(self.db)
+        nearest = {}
+        for name in unmatched:
+            match = index.lookup(name, settings.MERCHANT_MATCH_THRESHOLD)
+            if match:
+                nearest[name] = match[0]
+        if nearest:
+            mappings = await self.get_merchant_mappings(list(nearest.values()))
+            for name, raw_merchant in nearest.items():
+                if raw_merchant in mappings:
+                    found[name] = mappings[raw_merchant]
+        return found
 
     async def get_transaction_by_hash(self, content_hash: str) -> Optional[Transaction]:
         stmt = select(Transaction).where(Transaction.raw_content_hash == content_hash)
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def get_existing_hashes(self, content_hashes: List[str]) -> Set[str]:
+        """Which of the given raw_content_hash values are already stored, in one query."""
+        stmt = select(Transaction.raw_content_hash).where(Transaction.raw_content_hash.in_(content_hashes))
+        result = await self.db.execute(stmt)
+        return set(result.scalars().all())
+
     async def create_transaction(self, txn_data: dict) -> Transaction:
         txn = Transaction(**txn_data)
         self.db.add(txn)
+        await self.db.flush()
+        await apply_to_rollups(self.db, [txn.id])
+        await self.dashboard_cache.bump(self.db, [txn.user_id])
         await self.db.commit()
         return txn
 
+    async def create_transactions_bulk(self, rows: List[dict], commit: bool = True) -> Set[UUID]:
+        """
+        Insert many transactions in one statement, skipping hashes that already exist
+        (e.g. stored by a concurrent sync). Returns the ids actually inserted.
+        """
+        if not rows:
+            return set()
+        stmt = (
+            insert(Transaction)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[Transaction.raw_content_hash])
+            .returning(Transaction.id)
+        )
+        result = await self.db.execute(stmt)
+        inserted = set(result.scalars().all())
+        await apply_to_rollups(self.db, inserted)
+        if inserted:
+            await self.dashboard_cache.bump(self.db, {row["user_id"] for row in rows})
+        if commit:
+            await self.db.commit()
+        return inserted
+
     async def create_manual_transaction(self, user_id: UUID, data: schemas.ManualTransactionCreate) -> Transaction:
         import hashlib
         import time
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,6 +6,8 @@ import logging
 
 from app.core.config import get_settings
 from app.core.database import engine, Base
+from app.core.http_client import get_http_client, close_http_client
+from app.core.executor import shutdown_executor
 from app.core.logging_config import setup_logging
 from app.core.middleware import AuthenticationMiddleware
 
@@ -12,7 +15,10 @@ from app.features.auth.router import router as auth_router
 from app.features.transactions.router import router as transactions_router
 from app.features.sync.router import router as sync_router
 from app.features.dashboard.router import router as dashboard_router
+from app.features.templates.router import router as templates_router
 from app.features.sync.models import SyncLog 
+from app.features.sync.worker import SyncWorker
+from app.features.sync.scheduler import SyncScheduler
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -26,7 +32,19 @@ async def lifespan(app: FastAPI):
             await conn.run_sync(Base.metadata.create_all)
     else:
         logger.info(f"Environment: {settings.ENVIRONMENT}. Skipping table creation.")
+    get_http_client()
+
+    worker_stop = asyncio.Event()
+    worker_tasks = []
+    if settings.SYNC_WORKER_IN_PROCESS:
+        worker_tasks.append(asyncio.create_task(SyncWorker().run(worker_stop)))
+        if settings.SYNC_SCHEDULER_ENABLED:
+            worker_tasks.append(asyncio.create_task(SyncScheduler().run(worker_stop)))
     yield
+    worker_stop.set()
+    await asyncio.gather(*worker_tasks)
+    await close_http_client()
+    shutdown_executor()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -47,6 +65,7 @@ app.include_router(auth_router, prefix=f"{settings.API_V1_STR}/auth", tags=["aut
 app.include_router(transactions_router, prefix=f"{settings.API_V1_STR}/transactions", tags=["transactions"])
 app.include_router(sync_router, prefix=f"{settings.API_V1_STR}/sync", tags=["sync"])
 app.include_router(dashboard_router, prefix=f"{settings.API_V1_STR}/dashboard", tags=["dashboard"])
+app.include_router(templates_router, prefix=f"{settings.API_V1_STR}/templates", tags=["templates"])
 
 @app.get("/")
 async def root():
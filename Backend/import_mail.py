@@ -0,0 +1,16 @@
+import argparse
+import asyncio
+from app.core.logging_config import setup_logging
+from app.features.sync.importer import run_import
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a Google Takeout mbox or a directory of .eml files for one user.")
+    parser.add_argument("email", help="Email address of the user to import into")
+    parser.add_argument("source", help="Path to an .mbox file or a directory of .eml files")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <source>.import-checkpoint.json)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: IMPORT_WORKERS or all cores)")
+    args = parser.parse_args()
+
+    setup_logging()
+    success = asyncio.run(run_import(args.email, args.source, args.checkpoint, args.workers))
+    raise SystemExit(0 if success else 1)
@@ -0,0 +1,49 @@
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import get_settings
+from app.core.database import Base
+# Register every table on Base.metadata for autogenerate
+from app.features.auth import models as auth_models  # noqa: F401
+from app.features.dashboard import models as dashboard_models  # noqa: F401
+from app.features.sync import models as sync_models  # noqa: F401
+from app.features.templates import models as templates_models  # noqa: F401
+from app.features.transactions import models as transactions_models  # noqa: F401
+
+settings = get_settings()
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    context.configure(
+        url=settings.ASYNC_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+async def run_migrations_online():
+    connectable = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        connect_args={"statement_cache_size": 0} if settings.ASYNC_DATABASE_URL.startswith("postgresql+asyncpg") else {}
+    )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await connectable.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,32 @@
+"""Composite and partial indexes on transactions
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps syncs writing while the indexes build; it can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transactions_user_created", "transactions", ["user_id", "created_at"],
+            postgresql_include=["raw_content_hash"], postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            "ix_transactions_pending_user_created", "transactions", ["user_id", sa.text("created_at DESC")],
+            postgresql_where=sa.text("status = 'PENDING'"), postgresql_concurrently=True, if_not_exists=True
+        )
+    op.execute("ANALYZE transactions")
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_transactions_pending_user_created", "transactions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_transactions_user_created", "transactions", postgresql_concurrently=True, if_exists=True)
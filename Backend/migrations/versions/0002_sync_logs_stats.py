@@ -0,0 +1,21 @@
+"""Per-run counters on sync_logs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Nullable with no default: a metadata-only change, existing rows read as NULL
+    op.add_column("sync_logs", sa.Column("stats", sa.JSON(), nullable=True), if_not_exists=True)
+
+def downgrade() -> None:
+    op.drop_column("sync_logs", "stats", if_exists=True)
@@ -0,0 +1,101 @@
+"""Tables added since the initial schema: caches, sync jobs, templates, rollups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# IF NOT EXISTS throughout: local databases already got these tables from create_all
+
+def upgrade() -> None:
+    op.create_table(
+        "extraction_cache",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        if_not_exists=True
+    )
+    op.create_index("ix_extraction_cache_created_at", "extraction_cache", ["created_at"], if_not_exists=True)
+
+    op.create_table(
+        "cache_versions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        if_not_exists=True
+    )
+
+    op.create_table(
+        "sync_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("trigger_source", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("run_after", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("leased_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("virtual_finish", sa.Float(), nullable=False),
+        sa.Column("llm_tokens", sa.Integer(), nullable=True),
+        sa.Column("lag_seconds", sa.Float(), nullable=True),
+        if_not_exists=True
+    )
+    op.create_index("uq_sync_jobs_user_queued", "sync_jobs", ["user_id"], unique=True,
+                    postgresql_where=sa.text("status = 'QUEUED'"), if_not_exists=True)
+    op.create_index("uq_sync_jobs_user_running", "sync_jobs", ["user_id"], unique=True,
+                    postgresql_where=sa.text("status = 'RUNNING'"), if_not_exists=True)
+    op.create_index("ix_sync_jobs_status_run_after", "sync_jobs", ["status", "run_after"], if_not_exists=True)
+    op.create_index("ix_sync_jobs_user_id", "sync_jobs", ["user_id"], if_not_exists=True)
+    op.create_index("ix_sync_jobs_virtual_finish", "sync_jobs", ["virtual_finish"], if_not_exists=True)
+
+    op.create_table(
+        "extraction_templates",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("pattern", sa.Text(), nullable=False),
+        sa.Column("anchor", sa.String(), nullable=False),
+        sa.Column("account_type", sa.String(), nullable=False),
+        sa.Column("confirmations", sa.Integer(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("last_hit_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("user_id", "pattern"),
+        if_not_exists=True
+    )
+    op.create_index("ix_extraction_templates_user_id", "extraction_templates", ["user_id"], if_not_exists=True)
+
+    op.create_table(
+        "template_samples",
+        sa.Column("transaction_id", sa.Uuid(), sa.ForeignKey("transactions.id"), primary_key=True),
+        sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("clean_text", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        if_not_exists=True
+    )
+
+    op.create_table(
+        "daily_user_rollups",
+        sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("category", sa.String(), primary_key=True),
+        sa.Column("sub_category", sa.String(), primary_key=True),
+        sa.Column("account_type", sa.String(), primary_key=True),
+        sa.Column("total", sa.Numeric(14, 2), nullable=False),
+        sa.Column("txn_count", sa.Integer(), nullable=False),
+        if_not_exists=True
+    )
+
+def downgrade() -> None:
+    for table in ("daily_user_rollups", "template_samples", "extraction_templates", "sync_jobs",
+                  "cache_versions", "extraction_cache"):
+        op.drop_table(table, if_exists=True)
@@ -0,0 +1,19 @@
+"""Index template_samples by user and age for trimming
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_index("ix_template_samples_user_created", "template_samples", ["user_id", "created_at"], if_not_exists=True)
+
+def downgrade() -> None:
+    op.drop_index("ix_template_samples_user_created", "template_samples", if_exists=True)
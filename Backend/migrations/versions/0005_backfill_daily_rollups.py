@@ -0,0 +1,34 @@
+"""Backfill daily_user_rollups from existing transactions
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Same grouping as app/features/dashboard/rollups.py; a full rebuild, so rerunning is harmless
+    op.execute("LOCK TABLE daily_user_rollups IN EXCLUSIVE MODE")
+    op.execute("DELETE FROM daily_user_rollups")
+    op.execute("""
+        INSERT INTO daily_user_rollups (user_id, day, category, sub_category, account_type, total, txn_count)
+        SELECT user_id, CAST(created_at AS DATE), category, sub_category, account_type, sum(amount), count(*)
+        FROM transactions
+        GROUP BY user_id, CAST(created_at AS DATE), category, sub_category, account_type
+    """)
+    # Dashboards cached while the rollups were still empty must not outlive the backfill
+    op.execute("""
+        INSERT INTO cache_versions (name, version)
+        SELECT 'dashboard:' || user_id, 1 FROM transactions GROUP BY user_id
+        ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1
+    """)
+
+def downgrade() -> None:
+    # Rollups are derived data; 0003's downgrade drops the table
+    pass
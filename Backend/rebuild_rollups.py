@@ -0,0 +1,27 @@
+import argparse
+import asyncio
+from sqlalchemy import select
+from app.core.logging_config import setup_logging
+from app.core.database import AsyncSessionLocal
+from app.features.auth.models import User
+from app.features.dashboard.rollups import rebuild_rollups
+
+async def main(email: str = None) -> bool:
+    async with AsyncSessionLocal() as db:
+        user_id = None
+        if email:
+            user_id = await db.scalar(select(User.id).where(User.email == email))
+            if user_id is None:
+                print(f"No user with email {email}")
+                return False
+        rows = await rebuild_rollups(db, user_id)
+    print(f"Rebuilt {rows} daily rollup rows")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute daily_user_rollups from transactions (after a backfill or manual SQL).")
+    parser.add_argument("--email", help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    setup_logging()
+    raise SystemExit(0 if asyncio.run(main(args.email)) else 1)
@@ -0,0 +1,102 @@
+"""
+Liquidity dashboard cost on ~1M seeded transactions: the original five SUM(amount) queries over
+transactions, against get_liquidity() (one conditional aggregation over daily_user_rollups).
+
+Needs a throwaway database (its tables are dropped and recreated):
+    TEST_DATABASE_URL=postgresql://postgres@localhost/pfie_test uv run python tests/bench_dashboard.py
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    sys.exit("TEST_DATABASE_URL is not set")
+os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+
+from sqlalchemy import func, select, text  # noqa: E402
+
+import app.main  # noqa: E402,F401  (registers every model)
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.features.dashboard.rollups import rebuild_rollups  # noqa: E402
+from app.features.dashboard.service import BILL_SUB_CATEGORIES, get_liquidity  # noqa: E402
+from app.features.transactions.enums import AccountType, Category, SubCategory  # noqa: E402
+from app.features.transactions.models import Transaction  # noqa: E402
+
+USERS = 20
+TRANSACTIONS = 1_000_000
+REPEAT = 20
+
+async def seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (id, email, hashed_password, is_active) "
+            "SELECT gen_random_uuid(), 'user' || g || '@example.com', 'x', true FROM generate_series(1, :users) g"
+        ), {"users": USERS})
+        await conn.execute(text("""
+            INSERT INTO transactions (id, user_id, raw_content_hash, amount, currency, category, sub_category,
+                                      status, account_type, created_at)
+            SELECT gen_random_uuid(), (SELECT array_agg(id ORDER BY email) FROM users)[1 + g % :users], md5(g::text),
+                   (g % 5000) / 3.0, 'INR',
+                   (ARRAY['Income', 'Food & Dining', 'Investment', 'Housing', 'Bills & Utilities'])[1 + g % 5],
+                   (ARRAY['Salary', 'Delivery', 'SIP', 'Rent', 'Electricity', 'P2P Receive'])[1 + g % 6],
+                   CASE WHEN g % 50 = 0 THEN 'PENDING' ELSE 'VERIFIED' END,
+                   (ARRAY['SAVINGS', 'CREDIT_CARD', 'CASH'])[1 + g % 3], now() - (g % 730) * interval '1 day'
+            FROM generate_series(1, :transactions) g
+        """), {"users": USERS, "transactions": TRANSACTIONS})
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+    async with engine.connect() as conn:
+        await (await conn.execution_options(isolation_level="AUTOCOMMIT")).execute(text("VACUUM ANALYZE"))
+        return (await conn.execute(text("SELECT id FROM users ORDER BY email LIMIT 1"))).scalar_one()
+
+async def five_queries(db, user_id) -> dict:
+    """The /liquidity route before get_liquidity(), with today's bill sub-categories."""
+    async def total(*conditions):
+        stmt = select(func.sum(Transaction.amount)).where(Transaction.user_id == user_id, *conditions)
+        return (await db.execute(stmt)).scalar() or 0
+
+    p2p_in = await total(Transaction.category == Category.INCOME, Transaction.sub_category == SubCategory.P2P_RECEIVE)
+    income = await total(Transaction.category == Category.INCOME)
+    non_cc_expenses = await total(
+        Transaction.category.not_in([Category.INCOME, Category.INVESTMENT]),
+        Transaction.account_type.in_([AccountType.CASH, AccountType.SAVINGS])
+    )
+    unbilled_cc = await total(Transaction.category != Category.INCOME, Transaction.account_type == AccountType.CREDIT_CARD)
+    bills = await total(Transaction.sub_category.in_(BILL_SUB_CATEGORIES))
+
+    balance = income - non_cc_expenses
+    return {
+        "liquidity": (balance + p2p_in) - (unbilled_cc + bills),
+        "breakdown": {"balance": balance, "p2p_in": p2p_in, "unbilled_cc": unbilled_cc, "bills": bills}
+    }
+
+async def timed(fn, user_id) -> float:
+    runs = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            await fn(db, user_id)
+            runs.append(time.perf_counter() - start)
+    return statistics.median(runs) * 1000
+
+async def main():
+    # Statement logging (the engine echoes, app logging_config sets INFO) would dominate the timings
+    engine.sync_engine.echo = False
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    user_id = await seed()
+    async with AsyncSessionLocal() as db:
+        assert await five_queries(db, user_id) == await get_liquidity(db, user_id)
+    old, new = await timed(five_queries, user_id), await timed(get_liquidity, user_id)
+    print(f"liquidity {TRANSACTIONS // 1000}k rows  five queries: {old:8.2f} ms  get_liquidity: {new:8.2f} ms  ({old / new:.2f}x)")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Dedup cost for 20k incoming messages (pages of 100, a tenth already stored) against a user with
+100k stored transactions: every hash checked in Postgres, against DedupFilter's warmed Bloom filter.
+
+Needs a throwaway database (its tables are dropped and recreated):
+    TEST_DATABASE_URL=postgresql://postgres@localhost/pfie_test uv run python tests/bench_dedup.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    sys.exit("TEST_DATABASE_URL is not set")
+os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+
+from sqlalchemy import text  # noqa: E402
+
+import app.main  # noqa: E402,F401  (registers every model)
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.features.sync.dedup import DedupFilter, new_dedup_stats  # noqa: E402
+
+STORED = 100_000
+INCOMING = 20_000
+PAGE = 100
+
+async def seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (id, email, hashed_password, is_active) VALUES (gen_random_uuid(), 'dedup@example.com', 'x', true)"
+        ))
+        await conn.execute(text("""
+            INSERT INTO transactions (id, user_id, raw_content_hash, amount, currency, category, sub_category,
+                                      status, account_type, created_at)
+            SELECT gen_random_uuid(), (SELECT id FROM users), encode(sha256(g::text::bytea), 'hex'), 1, 'INR',
+                   'Food & Dining', 'Delivery', 'VERIFIED', 'SAVINGS', now() - g * interval '1 minute'
+            FROM generate_series(1, :stored) g
+        """), {"stored": STORED})
+    async with engine.connect() as conn:
+        await (await conn.execution_options(isolation_level="AUTOCOMMIT")).execute(text("VACUUM ANALYZE"))
+        return (await conn.execute(text("SELECT id FROM users"))).scalar_one()
+
+async def incoming() -> list:
+    # Every tenth message is one already stored, the rest are new
+    async with engine.connect() as conn:
+        return (await conn.execute(text("""
+            SELECT encode(sha256((CASE WHEN g % 10 = 0 THEN g ELSE :stored + g END)::text::bytea), 'hex')
+            FROM generate_series(1, :incoming) g
+        """), {"stored": STORED, "incoming": INCOMING})).scalars().all()
+
+async def run(dedup: DedupFilter, user_id, hashes) -> tuple:
+    stats = new_dedup_stats()
+    new = set()
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for page in range(0, len(hashes), PAGE):
+            new |= await dedup.new_hashes(db, user_id, hashes[page:page + PAGE], stats)
+    return new, stats, (time.perf_counter() - start) * 1000
+
+async def main():
+    # Statement logging (the engine echoes, app logging_config sets INFO) would dominate the timings
+    engine.sync_engine.echo = False
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    user_id = await seed()
+    hashes = await incoming()
+
+    # Never prepared: no filter for the user, so every hash goes to Postgres
+    old_new, old_stats, old = await run(DedupFilter(max_users=1), user_id, hashes)
+
+    dedup = DedupFilter(max_users=1)
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await dedup.prepare(db, user_id)
+    warm = (time.perf_counter() - start) * 1000
+    new_new, new_stats, new = await run(dedup, user_id, hashes)
+
+    assert old_new == new_new and len(new_new) == INCOMING - INCOMING // 10
+    print(f"dedup {INCOMING // 1000}k messages vs {STORED // 1000}k stored")
+    print(f"  db only: {old:8.2f} ms  db_checked: {old_stats['db_checked']}")
+    print(f"  bloom:   {new:8.2f} ms  db_checked: {new_stats['db_checked']}  (warm-up {warm:.2f} ms, {old / new:.2f}x)")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+"""
+Tests that need Postgres use the `loop` fixture and skip unless TEST_DATABASE_URL points at a
+throwaway database (their tables are dropped and recreated):
+    TEST_DATABASE_URL=postgresql://postgres@localhost/pfie_test uv run --with pytest pytest
+"""
+import asyncio
+import os
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # Before any test module creates the engine
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+else:
+    # Importing the sync modules creates the engine; it only connects when a test uses it
+    os.environ.setdefault("DATABASE_URL", "postgresql://localhost/pfie_test")
+
+@pytest.fixture(scope="module")
+def loop():
+    # One loop per module: pooled asyncpg connections are bound to the loop that opened them
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.core.database import engine
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(engine.dispose())
+    loop.close()
@@ -0,0 +1,91 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+
+import pytest
+
+from app.features.sync.archive import iter_archive, prepare_archive_batch
+from app.features.sync.importer import MailImporter
+from app.features.sync.service import message_hash
+
+THREAD_ID = 1790000000000000001
+MESSAGE_IDS = [1790000000000000001, 1790000000000123456]
+RECEIVED = ["Mon, 6 Jan 2025 10:00:07 +0530", "Mon, 6 Jan 2025 10:42:51 +0530"]
+
+def takeout_message(gm_msgid, received, subject, body, gmail_headers=True):
+    headers = [f"From {THREAD_ID}@xxx Mon Jan 06 04:30:07 +0000 2025"]
+    if gmail_headers:
+        headers += [f"X-GM-THRID: {THREAD_ID}", f"X-GM-MSGID: {gm_msgid}", "X-Gmail-Labels: Inbox,Category Updates"]
+    headers += [
+        f"Received: by 2002:a05:6a10:1::1 with SMTP id x; {received}",
+        "Received: from mail.bank.example (mail.bank.example [203.0.113.7]) by mx.google.com; Mon, 6 Jan 2025 09:00:00 +0530",
+        f"Message-ID: <{gm_msgid}@bank.example>",
+        f"Subject: {subject}",
+        "Date: Mon, 6 Jan 2025 09:59:00 +0530",
+        "Content-Type: text/plain; charset=utf-8",
+    ]
+    return "\n".join(headers) + f"\n\n{body}\n"
+
+def write_thread(tmp_path, gmail_headers=True):
+    # A reply in the same thread: Takeout puts the thread id, not the message id, on both envelope lines
+    path = tmp_path / "All mail.mbox"
+    path.write_text(
+        takeout_message(MESSAGE_IDS[0], RECEIVED[0], "Transaction alert", "Rs 500.00 debited at Swiggy.", gmail_headers)
+        + "\n"
+        + takeout_message(MESSAGE_IDS[1], RECEIVED[1], "Re: Transaction alert", ">From your bank: Rs 20.00 paid.", gmail_headers)
+    )
+    return str(path)
+
+def parse(path, start=0):
+    messages, unreadable = prepare_archive_batch([raw for _, raw in iter_archive(path, start)])
+    assert unreadable == 0
+    return messages
+
+def test_thread_messages_keep_their_own_gmail_ids(tmp_path):
+    messages = parse(write_thread(tmp_path))
+    assert [msg["id"] for msg in messages] == [format(gm_msgid, "x") for gm_msgid in MESSAGE_IDS]
+    assert all(msg["gmail"] for msg in messages)
+    assert len({message_hash(msg) for msg in messages}) == 2
+
+def test_internal_date_comes_from_the_newest_received_hop(tmp_path):
+    messages = parse(write_thread(tmp_path))
+    assert [msg["internalDate"] for msg in messages] == [
+        str(int(parsedate_to_datetime(received).timestamp()) * 1000) for received in RECEIVED
+    ]
+
+def test_message_id_without_gmail_headers(tmp_path):
+    messages = parse(write_thread(tmp_path, gmail_headers=False))
+    assert [msg["id"] for msg in messages] == [f"{gm_msgid}@bank.example" for gm_msgid in MESSAGE_IDS]
+    assert not any(msg["gmail"] for msg in messages)
+
+def test_resumes_after_the_first_message(tmp_path):
+    path = write_thread(tmp_path)
+    position, _ = next(iter_archive(path))
+    [reply] = parse(path, position)
+    assert reply["id"] == format(MESSAGE_IDS[1], "x")
+
+class FakeGmail:
+    def __init__(self, dates):
+        self.dates = dates
+        self.asked = []
+
+    async def gmail_internal_dates(self, user_id, message_ids):
+        self.asked.append(message_ids)
+        return {msg_id: date for msg_id, date in self.dates.items() if msg_id in message_ids}
+
+@pytest.mark.parametrize("gmail_headers", [True, False])
+def test_importer_takes_exact_dates_from_gmail(tmp_path, gmail_headers):
+    path = write_thread(tmp_path, gmail_headers)
+    messages = parse(path)
+    archived = [msg["internalDate"] for msg in messages]
+    # Only the first message is still in the mailbox
+    gmail = FakeGmail({format(MESSAGE_IDS[0], "x"): "1736137807123"})
+    importer = MailImporter(path)
+    asyncio.run(importer._use_gmail_dates(gmail, None, messages))
+
+    if gmail_headers:
+        assert gmail.asked == [[msg["id"] for msg in messages]]
+        assert [msg["internalDate"] for msg in messages] == ["1736137807123", archived[1]]
+        assert importer.stats["gmail_dates"] == 1
+    else:
+        assert gmail.asked == [[]]
+        assert [msg["internalDate"] for msg in messages] == archived
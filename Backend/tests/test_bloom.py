@@ -0,0 +1,35 @@
+import hashlib
+
+import pytest
+
+from app.core.bloom import BloomFilter
+
+def hashes(start, count):
+    # Shaped like raw_content_hash values
+    return [hashlib.sha256(str(number).encode()).hexdigest() for number in range(start, start + count)]
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter(10_000)
+    added = hashes(0, 10_000)
+    bloom.update(added)
+    assert all(item in bloom for item in added)
+    assert bloom.count == 10_000
+
+@pytest.mark.parametrize("error_rate", [0.01, 0.001])
+def test_false_positive_rate_stays_near_the_configured_rate(error_rate):
+    bloom = BloomFilter(20_000, error_rate)
+    bloom.update(hashes(0, 20_000))
+    probes = hashes(1_000_000, 200_000)
+    false_positives = sum(item in bloom for item in probes)
+    assert false_positives / len(probes) <= error_rate * 1.5
+
+def test_empty_filter_finds_nothing():
+    bloom = BloomFilter(100)
+    assert not any(item in bloom for item in hashes(0, 1000))
+
+def test_full_once_capacity_is_reached():
+    bloom = BloomFilter(100)
+    bloom.update(hashes(0, 99))
+    assert not bloom.full
+    bloom.add(hashes(99, 1)[0])
+    assert bloom.full
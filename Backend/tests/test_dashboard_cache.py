@@ -0,0 +1,81 @@
+"""
+DashboardCache versions against Postgres: a bump is picked up by this process when the
+writer commits, not before. Needs a throwaway database, see conftest.py.
+"""
+import os
+import uuid
+
+import pytest
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+import app.main  # noqa: E402,F401  (registers every model)
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.features.dashboard.cache import BUMPED, DashboardCache  # noqa: E402
+
+@pytest.fixture(scope="module")
+def run(loop):
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    try:
+        loop.run_until_complete(create())
+    except OSError as exc:
+        pytest.skip(f"Postgres is not available: {exc}")
+    return loop.run_until_complete
+
+def new_cache() -> DashboardCache:
+    # Versions are only re-read when a commit of this process asks for it
+    return DashboardCache(max_users=10, version_check_seconds=3600)
+
+def test_bump_is_picked_up_on_commit_not_before(run):
+    async def scenario():
+        cache, user_id = new_cache(), uuid.uuid4()
+        seen = []
+        async with AsyncSessionLocal() as reader, AsyncSessionLocal() as writer:
+            seen.append(await cache.get_version(reader, user_id))
+            await cache.bump(writer, [user_id])
+            # A request between the bump and the commit keeps the committed version
+            seen.append(await cache.get_version(reader, user_id))
+            await writer.commit()
+            seen.append(await cache.get_version(reader, user_id))
+            assert BUMPED not in writer.info
+        return seen
+
+    assert run(scenario()) == [0, 0, 1]
+
+def test_rolled_back_bump_is_forgotten(run):
+    async def scenario():
+        cache, user_id = new_cache(), uuid.uuid4()
+        async with AsyncSessionLocal() as db:
+            await cache.get_version(db, user_id)
+            await cache.bump(db, [user_id])
+            await db.rollback()
+            assert BUMPED not in db.info
+            # A later, unrelated commit on the same session doesn't drop the cached version
+            await db.commit()
+            return cache._users[user_id]["version"], await cache.get_version(db, user_id)
+
+    assert run(scenario()) == (0, 0)
+
+def test_one_commit_covers_every_bump_of_the_transaction(run):
+    async def scenario():
+        cache, other_cache = new_cache(), new_cache()
+        users = [uuid.uuid4() for _ in range(3)]
+        async with AsyncSessionLocal() as db:
+            for user_id in users:
+                await cache.get_version(db, user_id)
+                await other_cache.get_version(db, user_id)
+            await cache.bump(db, users[:2])
+            await cache.bump(db, users[1:2])
+            await other_cache.bump(db, users[2:])
+            await db.commit()
+            return (
+                [cache._users[user_id]["version"] for user_id in users],
+                [other_cache._users[user_id]["version"] for user_id in users],
+                [await cache.get_version(db, user_id) for user_id in users],
+            )
+
+    # The third user's row moved too, but only other_cache was told; cache re-reads it on its interval
+    assert run(scenario()) == ([None, None, 0], [0, 0, None], [1, 2, 0])
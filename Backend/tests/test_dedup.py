@@ -0,0 +1,92 @@
+"""
+DedupFilter against a seeded Postgres: Bloom-cleared hashes, and top-ups from the watermark.
+Needs a throwaway database, see conftest.py.
+"""
+import os
+from datetime import timedelta
+
+import pytest
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import text  # noqa: E402
+
+import app.main  # noqa: E402,F401  (registers every model)
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.features.sync.dedup import WATERMARK_OVERLAP, DedupFilter, new_dedup_stats  # noqa: E402
+
+STORED = 2000
+
+async def seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (id, email, hashed_password, is_active) VALUES (gen_random_uuid(), 'dedup@example.com', 'x', true)"
+        ))
+        user_id = (await conn.execute(text("SELECT id FROM users"))).scalar_one()
+        await insert(conn, user_id, "stored", STORED, "now() - (g + 1) * interval '1 hour'")
+        return user_id
+
+async def insert(conn, user_id, prefix, count, created_at):
+    await conn.execute(text(f"""
+        INSERT INTO transactions (id, user_id, raw_content_hash, amount, currency, category, sub_category,
+                                  status, account_type, created_at)
+        SELECT gen_random_uuid(), :user_id, :prefix || g, 1, 'INR', 'Food & Dining', 'Delivery',
+               'VERIFIED', 'SAVINGS', {created_at}
+        FROM generate_series(1, :count) g
+    """), {"user_id": user_id, "prefix": prefix, "count": count})
+
+@pytest.fixture(scope="module")
+def user_id(loop):
+    try:
+        return loop.run_until_complete(seed())
+    except OSError as exc:
+        pytest.skip(f"Postgres is not available: {exc}")
+
+async def prepared(user_id) -> DedupFilter:
+    dedup = DedupFilter(max_users=10)
+    async with AsyncSessionLocal() as db:
+        await dedup.prepare(db, user_id)
+    return dedup
+
+def test_stored_hashes_are_never_new(loop, user_id):
+    async def run():
+        dedup = await prepared(user_id)
+        stored = [f"stored{g}" for g in range(1, STORED + 1)]
+        unknown = [f"unknown{g}" for g in range(STORED)]
+        stats = new_dedup_stats()
+        async with AsyncSessionLocal() as db:
+            new = await dedup.new_hashes(db, user_id, stored + unknown, stats)
+        return new, unknown, stats
+
+    new, unknown, stats = loop.run_until_complete(run())
+    assert new == set(unknown)
+    assert stats["duplicates"] == STORED
+    # Most unknown hashes are cleared by the filter without a lookup
+    assert stats["bloom_new"] >= len(unknown) * 0.95
+
+def test_top_up_loads_only_rows_past_the_watermark(loop, user_id):
+    async def run():
+        dedup = await prepared(user_id)
+        entry = dedup._filters[user_id]
+        warmed, watermark = entry.bloom.count, entry.watermark
+        async with engine.begin() as conn:
+            await insert(conn, user_id, "fresh", 50, "now()")
+            # Committed late, but within the overlap of the old watermark
+            await insert(conn, user_id, "late", 1, f"'{(watermark - WATERMARK_OVERLAP / 2).isoformat()}'")
+            # Older than the overlap: a top-up doesn't rescan that far back
+            await insert(conn, user_id, "old", 1, f"'{(watermark - timedelta(hours=1)).isoformat()}'")
+        async with AsyncSessionLocal() as db:
+            await dedup.prepare(db, user_id)
+        return dedup, entry, warmed, watermark
+
+    dedup, entry, warmed, watermark = loop.run_until_complete(run())
+    assert dedup.stats == {"warmed": 1, "topped_up": 1}
+    assert dedup._filters[user_id] is entry
+    # The 50 fresh rows, the late one and the row at the old watermark itself
+    assert entry.bloom.count - warmed == 52
+    assert all(f"fresh{g}" in entry.bloom for g in range(1, 51))
+    assert "late1" in entry.bloom
+    assert entry.watermark > watermark
@@ -0,0 +1,198 @@
+"""
+SyncJobService against Postgres: coalescing through the partial unique indexes, SKIP LOCKED
+leasing, weighted fair queuing order and the requeue of expired leases.
+Needs a throwaway database, see conftest.py.
+"""
+import asyncio
+import os
+from datetime import timedelta
+
+import pytest
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import func, select, text, update  # noqa: E402
+
+import app.main  # noqa: E402,F401  (registers every model)
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.features.sync import jobs as sync_jobs  # noqa: E402
+from app.features.sync.jobs import FAILED, QUEUED, RUNNING, SyncJobService, utcnow  # noqa: E402
+from app.features.sync.models import SyncJob  # noqa: E402
+
+settings = sync_jobs.settings
+USERS = 6
+
+async def seed() -> list:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (id, email, hashed_password, is_active) "
+            "SELECT gen_random_uuid(), 'jobs' || g || '@example.com', 'x', true FROM generate_series(1, :users) g"
+        ), {"users": USERS})
+        return (await conn.execute(text("SELECT id FROM users ORDER BY email"))).scalars().all()
+
+@pytest.fixture(scope="module")
+def users(loop):
+    try:
+        return loop.run_until_complete(seed())
+    except OSError as exc:
+        pytest.skip(f"Postgres is not available: {exc}")
+
+@pytest.fixture
+def run(loop, users):
+    """Run a coroutine on the module loop, against an empty sync_jobs table."""
+    async def clear():
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM sync_jobs"))
+    loop.run_until_complete(clear())
+    return loop.run_until_complete
+
+async def enqueue(user_id, source="WEBHOOK", **kwargs) -> int:
+    async with AsyncSessionLocal() as db:
+        return await SyncJobService(db).enqueue(user_id, source, **kwargs)
+
+async def lease(worker_id="w1"):
+    async with AsyncSessionLocal() as db:
+        return await SyncJobService(db).lease(worker_id)
+
+async def jobs(user_id=None) -> list:
+    async with AsyncSessionLocal() as db:
+        stmt = select(SyncJob).order_by(SyncJob.id)
+        if user_id:
+            stmt = stmt.where(SyncJob.user_id == user_id)
+        return (await db.scalars(stmt)).all()
+
+def test_enqueue_coalesces_into_the_waiting_job(run, users):
+    async def scenario():
+        later = utcnow() + timedelta(minutes=10)
+        first = await enqueue(users[0], run_after=later)
+        tag = (await jobs(users[0]))[0].virtual_finish
+        # A burst of pings, one with an earlier start and a cheaper (manual) tag
+        again = [await enqueue(users[0]) for _ in range(3)] + [await enqueue(users[0], "MANUAL")]
+        other = await enqueue(users[1])
+        return first, tag, again, other, await jobs(users[0])
+
+    first, tag, again, other, queued = run(scenario())
+    assert again == [first] * 4
+    assert other != first
+    [job] = queued
+    assert job.status == QUEUED
+    assert job.run_after <= utcnow()
+    assert job.virtual_finish < tag
+
+def test_one_queued_and_one_running_job_per_user(run, users):
+    async def scenario():
+        first = await enqueue(users[0])
+        leased = await lease()
+        second = await enqueue(users[0])
+        # The user already has a sync running: their queued job waits
+        blocked = await lease("w2")
+        return first, leased, second, blocked, await jobs(users[0])
+
+    first, leased, second, blocked, user_jobs = run(scenario())
+    assert leased.id == first and leased.status == RUNNING and leased.locked_by == "w1"
+    assert second != first
+    assert blocked is None
+    assert [job.status for job in user_jobs] == [RUNNING, QUEUED]
+
+def test_lease_skips_rows_locked_by_another_worker(run, users):
+    async def scenario():
+        ids = [await enqueue(user_id) for user_id in users[:2]]
+        async with AsyncSessionLocal() as holder:
+            # Another worker is between its SELECT ... FOR UPDATE and its claim
+            await holder.execute(select(SyncJob).where(SyncJob.id == ids[0]).with_for_update())
+            skipped = await lease("w2")
+            await holder.rollback()
+        return ids, skipped, await lease("w3")
+
+    ids, skipped, after = run(scenario())
+    assert skipped.id == ids[1]
+    assert after.id == ids[0]
+
+def test_concurrent_workers_lease_distinct_jobs(run, users):
+    async def scenario():
+        ids = {await enqueue(user_id) for user_id in users}
+        leased = await asyncio.gather(*(lease(f"w{n}") for n in range(USERS + 2)))
+        return ids, [job.id for job in leased if job]
+
+    ids, leased = run(scenario())
+    assert sorted(leased) == sorted(ids)
+
+def test_fair_queuing_leases_by_finish_tag(run, users, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_MAX_RUNNING_JOBS", 100)
+    heavy, light, fresh, manual = users[:4]
+
+    async def scenario():
+        # Past syncs: heavy spends 20k LLM tokens each, light 500
+        async with engine.begin() as conn:
+            await conn.execute(SyncJob.__table__.insert(), [
+                {"user_id": user_id, "status": "DONE", "trigger_source": "WEBHOOK", "attempts": 1,
+                 "run_after": utcnow(), "virtual_finish": 0.0, "llm_tokens": tokens}
+                for user_id, tokens in [(heavy, 20_000), (light, 500)] for _ in range(3)
+            ])
+        # Queued in this order; tags: 20000, 500, 2000 (no history), 2000 / 4 (manual)
+        for user_id, source in [(heavy, "WEBHOOK"), (light, "WEBHOOK"), (fresh, "WEBHOOK"), (manual, "MANUAL")]:
+            await enqueue(user_id, source)
+        tags = {job.user_id: job.virtual_finish for job in await jobs() if job.status == QUEUED}
+        order = [(await lease()).user_id for _ in range(4)]
+        # Started tags move virtual time on: a heavy user's next job queues behind it
+        again = await enqueue(heavy)
+        return tags, order, [job for job in await jobs() if job.id == again][0].virtual_finish
+
+    tags, order, next_tag = run(scenario())
+    assert tags == {heavy: 20_000.0, light: 500.0, fresh: 2000.0, manual: 500.0}
+    assert order == [light, manual, fresh, heavy]
+    assert next_tag == 40_000.0
+
+def test_expired_leases_are_requeued(run, users):
+    async def scenario():
+        first = await enqueue(users[0])
+        await lease("dead-worker")
+        async with engine.begin() as conn:
+            await conn.execute(update(SyncJob).values(leased_until=utcnow() - timedelta(seconds=1)))
+        async with AsyncSessionLocal() as db:
+            requeued = await SyncJobService(db).requeue_expired()
+            stale_heartbeat = await SyncJobService(db).heartbeat(first, "dead-worker")
+        again = await lease("w2")
+        return first, requeued, stale_heartbeat, again
+
+    first, requeued, stale_heartbeat, again = run(scenario())
+    assert requeued == 1
+    assert stale_heartbeat is False
+    assert again.id == first and again.attempts == 2 and again.locked_by == "w2"
+
+def test_live_leases_and_exhausted_jobs_are_not_requeued(run, users):
+    async def scenario():
+        live = await enqueue(users[0])
+        exhausted = await enqueue(users[1])
+        covered = await enqueue(users[2])
+        for worker in ("w1", "w2", "w3"):
+            await lease(worker)
+        async with engine.begin() as conn:
+            past = utcnow() - timedelta(seconds=1)
+            await conn.execute(update(SyncJob).where(SyncJob.id.in_([exhausted, covered])).values(leased_until=past))
+            await conn.execute(update(SyncJob).where(SyncJob.id == exhausted).values(attempts=settings.SYNC_JOB_MAX_ATTEMPTS))
+        # A webhook queued a new job for the third user meanwhile
+        newer = await enqueue(users[2])
+        async with AsyncSessionLocal() as db:
+            requeued = await SyncJobService(db).requeue_expired()
+            alive = await SyncJobService(db).heartbeat(live, "w1")
+        statuses = {job.id: (job.status, job.last_error) for job in await jobs()}
+        counts = await count_by_status()
+        return live, exhausted, covered, newer, requeued, alive, statuses, counts
+
+    live, exhausted, covered, newer, requeued, alive, statuses, counts = run(scenario())
+    assert requeued == 0
+    assert alive is True
+    assert statuses[live] == (RUNNING, None)
+    assert statuses[exhausted] == (FAILED, "Lease expired")
+    assert statuses[covered] == (FAILED, "Lease expired")
+    assert statuses[newer] == (QUEUED, None)
+    assert counts == {RUNNING: 1, FAILED: 2, QUEUED: 1}
+
+async def count_by_status() -> dict:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(SyncJob.status, func.count()).group_by(SyncJob.status))
+        return dict(result.all())
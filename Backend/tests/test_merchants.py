@@ -0,0 +1,79 @@
+import pytest
+
+from app.core.config import get_settings
+from app.features.transactions.merchants import MerchantIndex, normalize_merchant, trigrams
+
+THRESHOLD = get_settings().MERCHANT_MATCH_THRESHOLD
+
+KNOWN = ["SWIGGY", "Zomato Ltd", "Amazon Pay India Pvt Ltd", "Uber India Systems", "Big Basket",
+         "Starbucks Coffee", "IRCTC", "Netflix.com", "Apollo Pharmacy", "Ola"]
+
+@pytest.mark.parametrize("name, key", [
+    ("SWIGGY", "swiggy"),
+    ("Zomato Pvt. Ltd.", "zomato"),
+    ("  Amazon   Pay (India) Private Limited ", "amazon pay"),
+    ("www.netflix.com", "netflix"),
+    ("IRCTC E-TICKET", "irctc e ticket"),
+    ("7-Eleven Inc", "7 eleven"),
+    # Only suffix words: kept rather than emptied
+    ("The Company", "the company"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize(name, key):
+    assert normalize_merchant(name) == key
+
+def test_trigrams_are_word_padded():
+    assert trigrams("ola cab") == {"  o", " ol", "ola", "la ", "  c", " ca", "cab", "ab "}
+
+@pytest.mark.parametrize("query, expected", [
+    # Same canonical key: exact hit
+    ("Zomato Pvt. Ltd.", "Zomato Ltd"),
+    ("AMAZON PAY", "Amazon Pay India Pvt Ltd"),
+    ("NETFLIX", "Netflix.com"),
+    ("Starbucks Coffee India", "Starbucks Coffee"),
+    # Near misses: spacing, plurals, extra words and abbreviations
+    ("BigBasket", "Big Basket"),
+    ("Bigbasket.com", "Big Basket"),
+    ("Apollo Pharmacies", "Apollo Pharmacy"),
+    ("Starbucks", "Starbucks Coffee"),
+    ("SWIGGY*ORDER", "SWIGGY"),
+    ("Swiggy Instamart", "SWIGGY"),
+    ("zomato online order", "Zomato Ltd"),
+    ("UBER INDIA", "Uber India Systems"),
+    ("IRCTC E-TICKET", "IRCTC"),
+    ("Amzn Pay", "Amazon Pay India Pvt Ltd"),
+    ("Ola Cabs", "Ola"),
+    # Should not match: other merchants, or too little of the name in common
+    ("Myntra", None),
+    ("Zepto", None),
+    ("Oyo Rooms", None),
+    ("Uber *Trip", None),
+    ("Apollo Hospitals", None),
+    ("Pvt Ltd", None),
+    ("", None),
+])
+def test_lookup(query, expected):
+    match = MerchantIndex(KNOWN).lookup(query, THRESHOLD)
+    assert (match[0] if match else None) == expected
+    if match:
+        assert THRESHOLD <= match[1] <= 1.0
+
+def test_exact_key_scores_one():
+    assert MerchantIndex(KNOWN).lookup("zomato", THRESHOLD) == ("Zomato Ltd", 1.0)
+
+def test_threshold_is_inclusive():
+    # "ola" and "olx" share 2 of 4 trigrams each: Dice is exactly 0.5
+    index = MerchantIndex(["Ola"])
+    assert index.lookup("Olx", 0.5) == ("Ola", 0.5)
+    assert index.lookup("Olx", 0.51) is None
+
+def test_first_spelling_of_a_key_wins():
+    index = MerchantIndex(["Zomato Ltd", "ZOMATO PVT LTD"])
+    assert len(index) == 1
+    assert index.lookup("Zomato", THRESHOLD) == ("Zomato Ltd", 1.0)
+
+def test_best_of_several_candidates():
+    index = MerchantIndex(["Apollo Pharmacy", "Apollo Tyres"])
+    assert index.lookup("Apollo Pharma", THRESHOLD)[0] == "Apollo Pharmacy"
+    assert index.lookup("Apollo Tyre", THRESHOLD)[0] == "Apollo Tyres"
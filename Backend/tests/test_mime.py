@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from app.features.sync.mime import body_text, clip_text, html_to_text
+
+ALERT_HTML = """<html><head><title>Alert</title><style>td { color: red }</style></head><body>
+<div>Dear Customer,</div><table><tr><td>Amount</td><td>Rs.&nbsp;1,250.00</td></tr>
+<tr><th>Merchant</th><td>SWIGGY&amp;CO</td></tr></table><!-- tracking <td>x</td> -->
+<p>Thank you<br/>for banking with us</p><script>var a = "<p>no</p>";</script></body></html>"""
+
+def test_html_to_text_golden():
+    assert html_to_text(ALERT_HTML) == (
+        "Dear Customer,\n"
+        "Amount Rs. 1,250.00\n"
+        "Merchant SWIGGY&CO\n"
+        "Thank you\n"
+        "for banking with us"
+    )
+
+@pytest.mark.parametrize("html, text", [
+    # Unterminated tag, comment and skipped element: the rest is dropped, not rescanned
+    ("Rs 500 paid <div class='x", "Rs 500 paid"),
+    ("Rs 500 paid <!-- never closed <p>hidden</p>", "Rs 500 paid"),
+    ("Rs 500 paid <style>p { color: red }", "Rs 500 paid"),
+    # A self-closing skipped tag doesn't swallow what follows
+    ("<script/>Rs 500 paid", "Rs 500 paid"),
+    ("a < b and c > d", "a d"),
+    ("<TD>Rs</TD><Td>500</tD>", "Rs 500"),
+])
+def test_html_to_text_malformed(html, text):
+    assert html_to_text(html) == text
+
+def test_html_to_text_stops_at_max_chars():
+    html = "<p>Rs 500 paid</p>" + "<p>footer text</p>" * 1000
+    assert len(html_to_text(html, max_chars=100)) < 120
+
+def timed(fn, arg) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+@pytest.mark.parametrize("build", [
+    lambda n: "<div>" * n + "Rs 500 paid" + "</div>" * n,
+    lambda n: "<" * n + "Rs 500 paid",
+    lambda n: "<!--" * n,
+    lambda n: "<script>" + "<p>" * n,
+])
+def test_html_to_text_is_linear_on_pathological_input(build):
+    small, large = build(5_000), build(40_000)
+    # 8x the input: linear stays near 8x, quadratic would be ~64x
+    assert timed(html_to_text, large) < 24 * timed(html_to_text, small) + 0.01
+
+def test_deeply_nested_tags_keep_their_text():
+    assert html_to_text("<div>" * 50_000 + "Rs 500 paid" + "</div>" * 50_000) == "Rs 500 paid"
+
+CARD_TEXT = "Spent on card 4111 1111 1111 1111 at Swiggy"
+
+def test_clip_text_leaves_short_text_alone():
+    assert clip_text(CARD_TEXT, len(CARD_TEXT)) == CARD_TEXT
+
+@pytest.mark.parametrize("max_chars", range(14, 37))
+def test_clip_text_never_cuts_inside_a_card_number(max_chars):
+    # The last safe cut before the number is between "on" and "card"
+    assert clip_text(CARD_TEXT, max_chars) == "Spent on"
+
+@pytest.mark.parametrize("text, max_chars, clipped", [
+    # Between two letters
+    ("Paid Rs 500.00 to Swiggy today", 20, "Paid Rs 500.00 to"),
+    # At punctuation, which is never inside a mask
+    ("Rs 500.00 paid; ref 4111111111111111", 30, "Rs 500.00 paid"),
+    # No safe cut in the last 512 characters: a hard cut
+    ("x" * 600 + " 4111111111111111", 610, "x" * 600 + " 411111111"),
+])
+def test_clip_text_at_safe_cut(text, max_chars, clipped):
+    assert clip_text(text, max_chars) == clipped
+
+def test_body_text_converts_html_only():
+    assert body_text(ALERT_HTML).startswith("Dear Customer,\nAmount Rs. 1,250.00")
+    assert body_text("Rs 500 < Rs 600 paid") == "Rs 500 < Rs 600 paid"
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from app.core.ndjson import iter_ndjson
+from app.features.sync.service import SyncService, message_hash
+
+RECORDS = [{"id": "m1", "internalDate": "1736137807123", "body": "Rs 500 debited"},
+           {"id": "m2", "internalDate": "1736137807456", "body": "Paid Rs 20 to Swiggy—thanks"}]
+BODY = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in RECORDS).encode()
+
+async def chunked(data: bytes, *cuts: int):
+    bounds = [0, *cuts, len(data)]
+    for start, end in zip(bounds, bounds[1:]):
+        yield data[start:end]
+
+def parse(data: bytes, *cuts: int, max_line_bytes: int = 1000) -> list:
+    async def collect():
+        return [parsed async for parsed in iter_ndjson(chunked(data, *cuts), max_line_bytes)]
+    return asyncio.run(collect())
+
+def test_records_split_across_chunks():
+    expected = [(1, RECORDS[0], None), (2, RECORDS[1], None)]
+    assert parse(BODY) == expected
+    # Every split point, including inside the multi-byte em dash and right at the newline
+    for cut in range(1, len(BODY)):
+        assert parse(BODY, cut) == expected
+    assert parse(BODY, *range(1, len(BODY))) == expected
+
+def test_crlf_line_endings():
+    body = BODY.replace(b"\n", b"\r\n")
+    expected = [(1, RECORDS[0], None), (2, RECORDS[1], None)]
+    assert parse(body) == expected
+    # "\r" and "\n" in different chunks
+    assert parse(body, body.index(b"\r") + 1) == expected
+
+def test_trailing_record_without_newline():
+    body = BODY.rstrip(b"\n")
+    assert parse(body) == [(1, RECORDS[0], None), (2, RECORDS[1], None)]
+    assert parse(body, len(body) - 1) == [(1, RECORDS[0], None), (2, RECORDS[1], None)]
+
+def test_blank_lines_are_skipped_but_numbered():
+    body = b"\n" + BODY.replace(b"\n", b"\n  \n", 1)
+    assert parse(body) == [(2, RECORDS[0], None), (4, RECORDS[1], None)]
+
+def test_invalid_line_is_reported_and_the_stream_goes_on():
+    lines = BODY.split(b"\n")
+    body = b"\n".join([lines[0], b'{"id": "m9", "body": ', lines[1]])
+    parsed = parse(body, len(lines[0]) + 5)
+    assert [(line, value) for line, value, _ in parsed] == [(1, RECORDS[0]), (2, None), (3, RECORDS[1])]
+    assert parsed[1][2].startswith("Invalid JSON")
+    assert sum(error is not None for _, _, error in parsed) == 1
+
+def test_long_line_is_reported_without_being_buffered():
+    long_line = json.dumps({"id": "m3", "body": "x" * 5000}).encode()
+    body = BODY + long_line + b"\n" + BODY
+    parsed = parse(body, *range(100, len(body), 100), max_line_bytes=1000)
+    assert [line for line, _, _ in parsed] == [1, 2, 3, 4, 5]
+    assert parsed[2] == (3, None, "Line exceeds 1000 bytes")
+    assert [value for _, value, _ in parsed[3:]] == RECORDS
+    # ... also when it is the last line and has no newline
+    assert parse(BODY + long_line, max_line_bytes=1000)[-1] == (3, None, "Line exceeds 1000 bytes")
+
+def test_ingest_counts_invalid_lines_and_stores_the_rest():
+    service = SyncService(db=None, transaction_service=None)
+    consumed = []
+
+    async def run_sync(user_id, source, pages):
+        # Stands in for the pipeline: every page is stored
+        async for page in pages:
+            consumed.append([msg["id"] for msg in page])
+            service.on_settled([message_hash(msg) for msg in page], "stored")
+        return True
+
+    service._run_sync = run_sync
+    lines = BODY.split(b"\n")
+    body = b"\n".join([lines[0], b"not json", b'{"id": "m8", "body": "Rs 5 paid"}', lines[1], lines[0]])
+    records = iter_ndjson(chunked(body, 7, 50), 1000)
+    result = asyncio.run(service.ingest_messages(None, records))
+
+    assert consumed == [["m1", "m2"]]
+    assert {name: result[name] for name in ("received", "stored", "duplicate", "invalid", "failed")} == \
+        {"received": 5, "stored": 2, "duplicate": 1, "invalid": 2, "failed": 0}
+    assert [(ack["line"], ack["status"]) for ack in result["acks"]] == \
+        [(1, "stored"), (2, "invalid"), (3, "invalid"), (4, "stored"), (5, "duplicate")]
+    assert result["acks"][2]["error"] == "internalDate must be epoch milliseconds"
@@ -0,0 +1,91 @@
+import asyncio
+import random
+
+from app.core.pipeline import Pipeline
+
+async def numbers(count):
+    for number in range(count):
+        yield number
+
+def run_ordered(count, seed, drop=()):
+    rng = random.Random(seed)
+    persisted = []
+
+    async def extract(item):
+        # Concurrent workers finish in random order
+        await asyncio.sleep(rng.random() / 1000)
+        return None if item in drop else item
+
+    async def persist(item):
+        persisted.append(item)
+        return item
+
+    pipeline = (
+        Pipeline("ordered", numbers(count))
+        .stage("extract", extract, concurrency=4, queue_size=2)
+        .stage("persist", persist, concurrency=4, queue_size=2, ordered_by=lambda item: item)
+    )
+    asyncio.run(pipeline.run())
+    return pipeline, persisted
+
+def test_ordered_stage_restores_sequence():
+    for seed in range(5):
+        pipeline, persisted = run_ordered(200, seed)
+        assert persisted == list(range(200))
+        persist = pipeline.snapshot()["stages"][1]
+        assert persist["concurrency"] == 1
+        assert persist["held"] == 0
+
+def test_ordered_stage_flushes_past_dropped_items():
+    _, persisted = run_ordered(50, 0, drop={3, 17})
+    assert persisted == [item for item in range(50) if item not in (3, 17)]
+
+def test_window_bounds_items_ahead_of_the_next_key():
+    window = 5
+    persisted = []
+    ahead = []
+
+    async def extract(item):
+        # Keys let in but not yet persisted, this one included
+        ahead.append(item - persist_stage.next_key + 1)
+        # Every tenth item is slow, so the ones after it pile up behind it
+        await asyncio.sleep(0.01 if item % 10 == 0 else 0)
+        return item
+
+    async def persist(item):
+        persisted.append(item)
+        return item
+
+    pipeline = (
+        Pipeline("window", numbers(100))
+        .stage("extract", extract, concurrency=8, queue_size=8)
+        .stage("persist", persist, queue_size=8, ordered_by=lambda item: item, window=window)
+    )
+    persist_stage = pipeline.stages[-1]
+    asyncio.run(pipeline.run())
+    assert persisted == list(range(100))
+    assert max(ahead) == window
+    assert persist_stage.snapshot(1.0)["window"] == window
+
+def test_window_skips_items_dropped_after_numbering():
+    async def split(item):
+        # Numbers come out of this stage; 3 and 4 never reach persist
+        return [item * 2, item * 2 + 1]
+
+    async def drop(item):
+        return None if item in (3, 4) else item
+
+    persisted = []
+
+    async def persist(item):
+        persisted.append(item)
+        return item
+
+    pipeline = (
+        Pipeline("skip", numbers(20))
+        .stage("split", split, fan_out=True)
+        .stage("drop", drop, concurrency=3)
+        .stage("persist", persist, ordered_by=lambda item: item, window=2, numbered_in="split")
+    )
+    asyncio.run(pipeline.run())
+    assert persisted == [item for item in range(40) if item not in (3, 4)]
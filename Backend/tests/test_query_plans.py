@@ -0,0 +1,119 @@
+"""
+EXPLAIN the hot transaction and dashboard queries on a seeded Postgres and fail if any of
+them can only be answered by a sequential scan. Sequential scans are disabled for the
+check, so a "Seq Scan" in a plan means no index can serve the query.
+
+Needs a throwaway database, see conftest.py.
+"""
+import os
+from datetime import date, timedelta
+from uuid import UUID
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import event, select, text  # noqa: E402
+
+import app.main  # noqa: E402,F401  (registers every model)
+from app.core.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.features.dashboard import service as dashboard  # noqa: E402
+from app.features.dashboard.rollups import apply_to_rollups, rebuild_rollups  # noqa: E402
+from app.features.dashboard.schemas import Bucket, Dimension  # noqa: E402
+from app.features.sync.dedup import DedupFilter  # noqa: E402
+from app.features.transactions.models import Transaction  # noqa: E402
+from app.features.transactions.service import TransactionService  # noqa: E402
+
+USERS = 50
+TRANSACTIONS = 50_000
+
+async def seed() -> UUID:
+    engine.echo = False
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (id, email, hashed_password, is_active) "
+            "SELECT gen_random_uuid(), 'user' || g || '@example.com', 'x', true FROM generate_series(1, :users) g"
+        ), {"users": USERS})
+        await conn.execute(text("""
+            INSERT INTO transactions (id, user_id, raw_content_hash, amount, currency, category, sub_category,
+                                      status, account_type, created_at)
+            SELECT gen_random_uuid(), (SELECT array_agg(id ORDER BY email) FROM users)[1 + g % :users], md5(g::text),
+                   (g % 5000) / 3.0, 'INR',
+                   (ARRAY['Income', 'Food & Dining', 'Investment', 'Housing', 'Bills & Utilities'])[1 + g % 5],
+                   (ARRAY['Salary', 'Delivery', 'SIP', 'Rent', 'Electricity', 'P2P Receive'])[1 + g % 6],
+                   CASE WHEN g % 50 = 0 THEN 'PENDING' ELSE 'VERIFIED' END,
+                   (ARRAY['SAVINGS', 'CREDIT_CARD', 'CASH'])[1 + g % 3], now() - (g % 730) * interval '1 day'
+            FROM generate_series(1, :transactions) g
+        """), {"users": USERS, "transactions": TRANSACTIONS})
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+    async with engine.connect() as conn:
+        await (await conn.execution_options(isolation_level="AUTOCOMMIT")).execute(text("VACUUM ANALYZE"))
+        return (await conn.execute(text("SELECT id FROM users ORDER BY email LIMIT 1"))).scalar_one()
+
+async def explain(run) -> list:
+    """Run `run(db)`, then EXPLAIN every query it sent, with the same parameters."""
+    sent = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            sent.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSessionLocal() as db:
+            await run(db)
+            await db.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with engine.connect() as conn:
+        await conn.execute(text("SET enable_seqscan = off"))
+        for statement, parameters in sent:
+            rows = await conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+            plans.append((statement, "\n".join(row[0] for row in rows)))
+    assert plans, "no queries were captured"
+    return plans
+
+@pytest.fixture(scope="module")
+def user_id(loop):
+    try:
+        return loop.run_until_complete(seed())
+    except OSError as exc:
+        pytest.skip(f"Postgres is not available: {exc}")
+
+async def pending_queue(db, user_id):
+    await TransactionService(db).get_pending_transactions(user_id)
+
+async def dedup_warm_up(db, user_id):
+    dedup = DedupFilter(max_users=10)
+    await dedup.prepare(db, user_id)
+    # Second call tops the filter up from the watermark
+    await dedup.prepare(db, user_id)
+
+async def existing_hashes(db, user_id):
+    await TransactionService(db).get_existing_hashes(["c4ca4238a0b923820dcc509a6f75849b", "missing"])
+
+async def rollup_apply(db, user_id):
+    ids = (await db.execute(select(Transaction.id).where(Transaction.user_id == user_id).limit(5))).scalars().all()
+    await apply_to_rollups(db, ids)
+
+async def dashboards(db, user_id):
+    await dashboard.get_liquidity(db, user_id)
+    await dashboard.get_investments(db, user_id)
+    await dashboard.get_daily_expenses(db, user_id)
+
+async def analytics(db, user_id):
+    end = date.today()
+    async for _ in dashboard.iter_analytics(db, user_id, end - timedelta(days=365), end, Bucket.WEEK, [Dimension.CATEGORY]):
+        pass
+
+@pytest.mark.parametrize("hot_query", [pending_queue, dedup_warm_up, existing_hashes, rollup_apply, dashboards, analytics])
+def test_hot_query_uses_an_index(loop, user_id, hot_query):
+    plans = loop.run_until_complete(explain(lambda db: hot_query(db, user_id)))
+    for statement, plan in plans:
+        assert "Seq Scan" not in plan, f"{statement}\n{plan}"
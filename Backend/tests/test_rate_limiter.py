@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core import rate_limiter
+from app.core.rate_limiter import GroqRateLimiter, TokenBucket, backoff_delay
+from app.features.sync import service as sync_service
+from app.features.sync.service import SyncService
+
+real_sleep = asyncio.sleep
+
+class FakeClock:
+    """time.monotonic and asyncio.sleep for the limiter: sleeping advances the clock instead of waiting."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+        await real_sleep(0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", clock.sleep)
+    # No jitter unless a test asks for it
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: low)
+    monkeypatch.setattr(rate_limiter.settings, "GROQ_BACKOFF_SECONDS", 1.0)
+    return clock
+
+def test_bucket_starts_full_then_waits_for_refill(clock):
+    async def run():
+        bucket = TokenBucket(capacity=10, rate=2)
+        for _ in range(10):
+            await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+        await bucket.acquire(3)
+    asyncio.run(run())
+    # One token at 2/s, then three more
+    assert clock.sleeps == [0.5, 1.5]
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    async def run():
+        bucket = TokenBucket(capacity=10, rate=2)
+        await bucket.acquire(10)
+        clock.now += 3600
+        await bucket.acquire(10)
+        assert clock.sleeps == []
+        await bucket.acquire(1)
+    asyncio.run(run())
+    assert clock.sleeps == [0.5]
+
+def test_oversized_request_drains_the_bucket_instead_of_waiting_forever(clock):
+    async def run():
+        bucket = TokenBucket(capacity=10, rate=2)
+        await bucket.acquire(25)
+        await bucket.acquire(25)
+    asyncio.run(run())
+    assert clock.sleeps == [5.0]
+
+def test_concurrent_acquirers_queue_behind_each_other(clock):
+    async def run():
+        bucket = TokenBucket(capacity=1, rate=1)
+        await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+    asyncio.run(run())
+    assert clock.sleeps == [1.0, 1.0, 1.0]
+    assert clock.now == 1003.0
+
+def test_limiter_spends_from_both_quotas(clock):
+    async def run():
+        limiter = GroqRateLimiter(requests_per_minute=60, tokens_per_minute=600)
+        await limiter.acquire(600)
+        # A request is available, the tokens refill at 10/s
+        await limiter.acquire(50)
+    asyncio.run(run())
+    assert clock.sleeps == [5.0]
+
+def test_pause_holds_back_the_next_acquire(clock):
+    async def run():
+        limiter = GroqRateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+        limiter.pause(5)
+        # A shorter pause doesn't cut the longer one short
+        limiter.pause(2)
+        await limiter.acquire(1)
+        clock.sleeps.clear()
+        # Once the pause is over, callers go straight through
+        await limiter.acquire(1)
+    asyncio.run(run())
+    assert clock.sleeps == []
+    assert clock.now == 1005.0
+
+def test_pause_extends_to_the_latest_deadline(clock):
+    limiter = GroqRateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    limiter.pause(2)
+    clock.now += 1
+    limiter.pause(4)
+    asyncio.run(limiter.acquire(1))
+    assert clock.sleeps == [4.0]
+
+@pytest.mark.parametrize("attempt, retry_after, delay", [
+    (0, None, 1.0),
+    (1, None, 2.0),
+    (3, None, 8.0),
+    # Retry-After wins over the exponential step, even when shorter
+    (3, "2", 2.0),
+    (0, "7.5", 7.5),
+    # An HTTP-date or garbage Retry-After falls back to the exponential step
+    (2, "Wed, 21 Oct 2026 07:28:00 GMT", 4.0),
+    (1, "", 2.0),
+])
+def test_backoff_delay(clock, attempt, retry_after, delay):
+    assert backoff_delay(attempt, retry_after) == delay
+
+def test_backoff_jitter_is_bounded_by_the_base_step(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    assert backoff_delay(2) == 5.0
+    assert backoff_delay(0, "3") == 4.0
+
+def completion(content: dict, prompt_tokens: int = 42) -> httpx.Response:
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": json.dumps(content)}}],
+        "usage": {"prompt_tokens": prompt_tokens}
+    })
+
+def post_completion(clock, monkeypatch, responses):
+    """Run SyncService._post_completion against a Groq stand-in answering with `responses` in turn."""
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return responses[len(requests) - 1]
+
+    limiter = GroqRateLimiter(requests_per_minute=600, tokens_per_minute=600_000)
+    monkeypatch.setattr(sync_service, "get_groq_rate_limiter", lambda: limiter)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setattr(sync_service, "get_http_client", lambda: client)
+            service = SyncService(db=None, transaction_service=None)
+            return await service._post_completion("Rs 500 debited at Swiggy"), service.llm_stats
+
+    result, stats = asyncio.run(run())
+    return result, stats, requests
+
+def test_post_completion_retries_429_and_503(clock, monkeypatch):
+    monkeypatch.setattr(sync_service.settings, "GROQ_MAX_RETRIES", 3)
+    result, stats, requests = post_completion(clock, monkeypatch, [
+        httpx.Response(429, headers={"retry-after": "2"}),
+        httpx.Response(503),
+        completion({"amount": 500, "merchant_name": "Swiggy"}),
+    ])
+    assert result == {"amount": 500, "merchant_name": "Swiggy"}
+    assert len(requests) == 3
+    assert requests[0]["messages"][0]["content"] == "Rs 500 debited at Swiggy"
+    assert (stats["requests"], stats["rate_limited"], stats["prompt_tokens"]) == (3, 2, 42)
+    # Retry-After of the 429, then the second exponential step for the 503
+    assert clock.sleeps == [2.0, 2.0]
+
+def test_post_completion_gives_up_after_max_retries(clock, monkeypatch):
+    monkeypatch.setattr(sync_service.settings, "GROQ_MAX_RETRIES", 2)
+    result, stats, requests = post_completion(clock, monkeypatch, [httpx.Response(429)] * 3)
+    assert result is None
+    assert len(requests) == 3
+    # The last 429 isn't retried, and doesn't pause the limiter
+    assert (stats["requests"], stats["rate_limited"]) == (3, 2)
+    assert clock.sleeps == [1.0, 2.0]
+
+def test_post_completion_does_not_retry_other_errors(clock, monkeypatch):
+    result, stats, requests = post_completion(clock, monkeypatch, [httpx.Response(400), completion({})])
+    assert result is None
+    assert len(requests) == 1
+    assert stats["rate_limited"] == 0
@@ -0,0 +1,71 @@
+import pytest
+
+from app.features.sync.relevance import relevant_window, score_segment
+
+@pytest.mark.parametrize("segment, score", [
+    # Currency, amount, transaction word and merchant cue
+    ("Rs 500.00 debited at Swiggy", 7),
+    ("INR 1,250 spent", 6),
+    # A transaction word alone doesn't anchor a window
+    ("Your a/c XX1234 was debited", 2),
+    ("Ref no 1234", 1),
+    ("Dear Customer", 0),
+    # Boilerplate outweighs its own cues
+    ("Click here to download the app and get Rs 100.00 cashback", 2),
+    ("Unsubscribe from these alerts", -2),
+])
+def test_score_segment(segment, score):
+    assert score_segment(segment) == score
+
+EMAIL = "\n".join([
+    "Dear Customer,",
+    "Greetings from Example Bank!",
+    "We wish to inform you that your account was used for a transaction.",
+    "Rs. 1,250.00 was debited from your a/c XX1234 on 06-01-25.",
+    "Info: UPI/P2M/501234567890/SWIGGY",
+    "If this was not you, call us immediately.",
+    "Available balance: Rs. 10,000.00",
+    *["This e-mail is confidential and intended for the named recipient only. Unsubscribe here."] * 8,
+    "Never share your OTP or PIN with anyone. Click here to download our app from the App Store.",
+])
+
+def test_window_keeps_the_transaction_lines_with_context():
+    assert relevant_window(EMAIL, 300) == (
+        "Greetings from Example Bank!\n"
+        "We wish to inform you that your account was used for a transaction.\n"
+        "Rs. 1,250.00 was debited from your a/c XX1234 on 06-01-25.\n"
+        "Info: UPI/P2M/501234567890/SWIGGY\n"
+        "If this was not you, call us immediately.\n"
+        "Available balance: Rs. 10,000.00"
+    )
+
+def test_window_without_context():
+    assert relevant_window(EMAIL, 300, context=0) == (
+        "We wish to inform you that your account was used for a transaction.\n"
+        "Rs. 1,250.00 was debited from your a/c XX1234 on 06-01-25.\n"
+        "Available balance: Rs. 10,000.00"
+    )
+
+def test_context_never_crowds_out_the_best_segment():
+    # Only one neighbour fits next to the transaction line
+    assert relevant_window(EMAIL, 120) == (
+        "Rs. 1,250.00 was debited from your a/c XX1234 on 06-01-25.\n"
+        "Info: UPI/P2M/501234567890/SWIGGY"
+    )
+
+def test_one_line_alert_is_split_into_sentences():
+    alert = ("Dear Customer. Your a/c XX1234 is debited by Rs. 500.00 on 06-Jan. Info: UPI/SWIGGY. "
+             "Call 1800 if not you. " + "Please read our terms and conditions carefully before using the app. " * 10)
+    # "Rs. 500.00" is not a sentence break
+    assert relevant_window(alert, 150) == (
+        "Dear Customer.\n"
+        "Your a/c XX1234 is debited by Rs. 500.00 on 06-Jan.\n"
+        "Info: UPI/SWIGGY."
+    )
+
+def test_falls_back_to_the_head_without_transaction_cues():
+    assert relevant_window("Our monthly newsletter. " * 50, 100) == \
+        "Our monthly newsletter. Our monthly newsletter. Our monthly newsletter. Our monthly newsletter"
+
+def test_short_text_is_sent_whole():
+    assert relevant_window("Dear Customer,\nRs 5 paid", 100) == "Dear Customer,\nRs 5 paid"
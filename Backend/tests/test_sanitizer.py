@@ -0,0 +1,101 @@
+import random
+import re
+
+import pytest
+
+from app.features.sanitizer import service
+from app.features.sanitizer.service import SMALL_TEXT_LENGTH, SanitizerService
+
+# The original sanitizer, frozen: every pattern applied to the whole body in label order.
+GOLDEN_PATTERNS = [
+    ('PHONE', r'\b(?:\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4,}\b'),
+    ('UPI', r'[a-zA-Z0-9.\-_]{2,256}@[a-zA-Z]{2,64}'),
+    ('EMAIL', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+    ('CARD', r'\b(?:\d[ -]*?){13,16}\b'),
+    ('IP', r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'),
+    ('PAN', r'\b[A-Z]{5}[0-9]{4}[A-Z]{1}\b'),
+    ('AADHAAR', r'\b\d{4}\s\d{4}\s\d{4}\b'),
+]
+
+def golden(text):
+    for label, pattern in GOLDEN_PATTERNS:
+        text = re.sub(pattern, f'<{label}>', text)
+    return text
+
+TOKENS = [
+    'Rs.', '1,234.00', 'debited', 'a/c', 'XX1234', 'john.doe@okaxis', 'user@gmail.com', '9876543210',
+    '+91 98765 43210', '4111 1111 1111 1111', '4111-1111-1111-1111', '192.168.1.1', 'ABCDE1234F',
+    '1234 5678 9012', '123456789012', '12-05-24', '.', ',', '@', 'abc', '(022) 555-1234', '1800-123-4567',
+    'é', '<b>', '|', ':', '1', '  ', '٣٤٥', 'ab@', '<td style="padding:4px">', '&nbsp;',
+]
+SEPARATORS = [' ', '', ' ', '\n', '.', '. ', ', ', '-', '\t', '(', ')', '/', '.\n', '@']
+
+def corpus(seed, count, max_tokens):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(TOKENS) + rng.choice(SEPARATORS) for _ in range(rng.randint(1, max_tokens)))
+
+HANDPICKED = [
+    "",
+    "Rs. 500.00 debited from a/c XX1234 to swiggy@okaxis on 12-05-24. Call 1800-123-4567.",
+    "Your card 4111 1111 1111 1111 was used. Aadhaar 1234 5678 9012, PAN ABCDE1234F, IP 10.0.0.1",
+    "Mail us at care.team@hdfcbank.co.in or +91 98765 43210",
+    "<html><body>" + "<p>Nothing to see here</p>" * 200 + "<p>paid 9876543210@ybl</p></body></html>",
+    "Statement\n" + "Rs 1,234.00 credited, ref 123456789012, card 4111-1111-1111-1111\n" * 100,
+]
+
+@pytest.fixture(scope="module")
+def sanitizer():
+    return SanitizerService()
+
+@pytest.mark.parametrize("text", HANDPICKED)
+def test_matches_golden_on_handpicked_bodies(sanitizer, text):
+    assert sanitizer.sanitize(text) == golden(text)
+
+def test_matches_golden_on_short_bodies(sanitizer):
+    for text in corpus(seed=1, count=5000, max_tokens=14):
+        assert sanitizer.sanitize(text) == golden(text), text
+
+def test_matches_golden_on_long_bodies(sanitizer):
+    for text in corpus(seed=2, count=300, max_tokens=600):
+        assert sanitizer.sanitize(text) == golden(text), text
+
+def test_windowed_path_matches_golden_on_dense_bodies(sanitizer, monkeypatch):
+    # Dense bodies normally skip the windows; force them through to check the window splitting
+    monkeypatch.setattr(service, "DENSE_FRACTION", 1.0)
+    for text in corpus(seed=4, count=300, max_tokens=600):
+        if len(text) >= SMALL_TEXT_LENGTH:
+            assert not sanitizer._is_dense(text)
+            assert sanitizer.sanitize(text) == golden(text), text
+
+def test_matches_golden_on_sparse_long_bodies(sanitizer):
+    filler = "Thank you for banking with us. Please review the details below and contact support.\n"
+    for text in corpus(seed=3, count=300, max_tokens=12):
+        body = filler * 20 + text + filler * 20
+        assert sanitizer.sanitize(body) == golden(body), text
+
+@pytest.mark.parametrize("text", [
+    "PAN ABCDE1234F on file",
+    "Your card 4111 1111 1111 1111 was used",
+    "Mail us at care.team@hdfcbank.co.in today",
+])
+def test_stream_masks_pii_split_across_two_chunks(sanitizer, text):
+    for cut in range(1, len(text)):
+        chunks = [text[:cut], text[cut:]]
+        assert ''.join(sanitizer.sanitize_stream(chunks)) == sanitizer.sanitize(text), chunks
+
+def test_stream_matches_sanitize_on_random_chunks(sanitizer):
+    rng = random.Random(5)
+    for text in corpus(seed=5, count=300, max_tokens=80):
+        cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 8)))) if len(text) > 1 else []
+        chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        assert ''.join(sanitizer.sanitize_stream(chunks)) == sanitizer.sanitize(text), chunks
+
+def test_stream_holds_back_a_bounded_tail(sanitizer):
+    stream = service.StreamingSanitizer(sanitizer, max_buffer=64)
+    # Nothing is safe to cut before the full stop: the space after "Card" precedes a digit
+    released = [stream.feed("Card 4111 1111 "), stream.feed("1111 1111 used. Thanks")]
+    assert released == ["", "Card <CARD> used."]
+    assert stream.flush() == " Thanks"
+    # Without any safe cut, text past max_buffer is released at the last whitespace
+    assert stream.feed("a1" * 20 + " " + "b2" * 20) == "a1" * 20 + " "
@@ -0,0 +1,7 @@
+import asyncio
+from app.core.logging_config import setup_logging
+from app.features.sync.worker import run_worker
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(run_worker())